@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+
+doc_str = """
+ Benchmark of solve_lp and solve_ilp over the solver options, on seeded random instances :
+   lp      : dictionaries of m rows and n = m * ratio columns, of each -kinds :
+             feasible   : a known point x_N >= 0 satisfies every row, and a row with all its
+                          coefficients negative bounds the x_N. About half of the b_values are
+                          negative, so the solves go through the initialization phase.
+             infeasible : a feasible one, with a second row that asks for the opposite of the first.
+             unbounded  : a feasible one without the bounding row, and with a column that only
+                          raises the rows and the objective.
+   ilp     : feasible lp dictionaries, solved as ILPs.
+   sudoku  : puzzles of size sN (N = sN^2), a random solved grid with a fraction -clues of the
+             cells kept, solved as solve_sudoku.py does.
+ The instances are generated in the text format of the dictionary files and parsed from it, and
+ -write puts them in a directory instead, next to the sudoku puzzles in the format of solve_sudoku.py.
+ Each instance is solved with the default options, and with each other value of each option
+ (-sweep one), or with every combination of them (-sweep all) : use_fractions, use_dual_for_ilp,
+ use_dual_simplex, e_selector and l_selector (the pricing of each dictionary), the storage, lp_method
+ and ilp_method, see -axes. Every solve has a -time_limit, and stops with status LIMIT at it.
+ One JSON line per solve is printed (or written to -out) : the instance, the options, the status,
+ objective, seconds and lp_stats, and the commit, so that the results of two commits can be put
+ side by side with -compare. Solves of one instance that disagree on the result are listed at the end.
+"""
+
+import sys, os
+import json
+import math
+import time
+import random
+import argparse
+import traceback
+import itertools
+import subprocess
+from   numbers import Number
+import lpdict as lpdict_module
+import pricing
+from   lpdict import new_lpdict, storage_backends, stats_default
+from   solve_sudoku import sudoku
+
+kinds = ["feasible", "infeasible", "unbounded"]
+
+# The options that the benchmark sweeps : (name, values), the default first. The ILP ones are not swept for an LP.
+axes = [("use_fractions"   , [False, True]),
+        ("use_dual_for_ilp", [True, False]),
+        ("use_dual_simplex", [True, False]),
+        ("e_selector"      , pricing.rules),
+        ("l_selector"      , pricing.l_rules),
+        ("storage"         , storage_backends),
+        ("lp_method"       , lpdict_module.lp_methods),
+        ("ilp_method"      , lpdict_module.ilp_methods)]
+ilp_axes = ["use_dual_for_ilp", "use_dual_simplex", "ilp_method"]
+
+# -compare : slower than this (new seconds / old seconds) is a regression, for solves of at least min_seconds.
+slowdown    = 1.25
+min_seconds = 0.01
+
+# Generators.
+
+def dot (a, x):
+  return sum(aj * xj for aj, xj in zip(a, x))
+
+def dict_text (b, A, z):
+  """ The dictionary file format for x_B = b + A x_N, z = z[0] + z[1:] x_N, with x_N = 1..n and x_B = n+1..n+m. """
+  m = len(b) ; n = len(z) - 1
+  join = lambda values: " ".join(str(x) for x in values)
+  lines = ["%d %d" % (m, n), join(range(n+1, n+m+1)), join(range(1, n+1)), join(b)]
+  lines += [join(row) for row in A]
+  lines.append(join(z))
+  return "\n".join(lines) + "\n"
+
+def random_lp (rng, m, n, kind, density):
+  """ The dictionary text of a random LP of kind (see doc_str), with integer data. """
+  assert kind in kinds, "Unknown kind " + str(kind)
+  assert m >= 3 and n >= 1, "too small"
+  x = [rng.randint(0, 3) for j in range(n)] # the feasible point.
+  A = [[rng.randint(-9, 9) if rng.random() < density else 0 for j in range(n)] for i in range(m)]
+  z = [0] + [rng.randint(-9, 9) for j in range(n)]
+  if kind == "unbounded" :
+    j = rng.randrange(n)
+    for row in A:
+      row[j] = abs(row[j])
+    z[j+1] = rng.randint(1, 9)
+  else :
+    A[0] = [-rng.randint(1, 9) for j in range(n)]
+  b = [-dot(row, x) + rng.randint(0, 9) for row in A]
+  if kind == "infeasible" : # row 2 : -b_1 - k - A_1 x_N >= 0, i.e. row 1 < 0.
+    A[2] = [-a for a in A[1]]
+    b[2] = -b[1] - rng.randint(1, 9)
+  return dict_text(b, A, z)
+
+def random_sudoku (rng, sN, clues):
+  """ A puzzle of size sN : a random solved grid, with the fraction clues of its cells kept and 0 for the others. """
+  N = sN * sN
+  grid = [[(sN * (r % sN) + r // sN + c) % N + 1 for c in range(N)] for r in range(N)] # a solved grid.
+  def order ():
+    bands = range(sN) ; rng.shuffle(bands)
+    rows  = []
+    for band in bands:
+      within = range(sN) ; rng.shuffle(within)
+      rows += [band * sN + r for r in within]
+    return rows
+  rows = order() ; cols = order()
+  digits = range(1, N+1) ; rng.shuffle(digits)
+  return [[digits[grid[r][c] - 1] if rng.random() < clues else 0 for c in cols] for r in rows]
+
+def sudoku_text (sarray):
+  """ Format 1 of solve_sudoku.py. """
+  return "".join(" ".join(str(x) for x in row) + "\n" for row in sarray)
+
+def instances (args):
+  """ (name, problem, size, payload) of each instance : payload is the dictionary text, or the sudoku array.
+      Each one has its own random generator, so that it does not depend on the others that are asked for. """
+  seeded = lambda *key: random.Random("-".join(str(k) for k in (args.seed,) + key))
+  for kind in args.kinds.split(','):
+    for m in sizes(args.sizes):
+      n = max(1, int(m * args.ratio))
+      yield ("lp_%s_%dx%d_s%d" % (kind, m, n, args.seed), "lp", (m, n), random_lp(seeded("lp", kind, m), m, n, kind, args.density))
+  for m in sizes(args.ilp_sizes):
+    n = max(1, int(m * args.ratio))
+    yield ("ilp_%dx%d_s%d" % (m, n, args.seed), "ilp", (m, n), random_lp(seeded("ilp", m), m, n, "feasible", args.density))
+  for sN in sizes(args.sudoku):
+    yield ("sudoku%d_s%d" % (sN, args.seed), "sudoku", (sN, sN), random_sudoku(seeded("sudoku", sN), sN, args.clues))
+
+def sizes (spec):
+  return [int(s) for s in spec.split(',') if s]
+
+def write_instances (args):
+  if not os.path.isdir(args.write) :
+    os.makedirs(args.write)
+  for name, problem, size, payload in instances(args):
+    with open(os.path.join(args.write, name), 'w') as f:
+      f.write(sudoku_text(payload) if problem == "sudoku" else payload)
+    print os.path.join(args.write, name)
+  return 0
+
+# Configurations.
+
+# The options of lpdict.py as they are when this is imported, for default_config.
+module_defaults = dict((name, getattr(lpdict_module, name)) for name in
+                       ["use_fractions", "use_dual_for_ilp", "use_dual_simplex", "e_selector", "l_selector", "lp_method", "ilp_method"])
+
+def default_config ():
+  return dict((name, module_defaults.get(name, values[0])) for name, values in axes)
+
+def usable (config):
+  """ use_fractions is for the list storage, and the revised simplex does not do fractions. """
+  return not config["use_fractions"] or (config["storage"] == "list" and config["lp_method"] == "dictionary")
+
+def configs (problem, sweep, names):
+  """ The option settings to solve a problem ("lp", "ilp" or "sudoku") with, the default first. """
+  swept = [(name, values) for name, values in axes if name in names and (problem != "lp" or name not in ilp_axes)]
+  base  = default_config()
+  rv    = [base]
+  if sweep == "one" :
+    for name, values in swept:
+      rv += [dict(base, **{name : value}) for value in values if value != base[name]]
+  else :
+    for combo in itertools.product(*[values for name, values in swept]):
+      config = dict(base, **dict(zip([name for name, values in swept], combo)))
+      if config != base :
+        rv.append(config)
+  return [config for config in rv if usable(config)]
+
+def label (config):
+  """ The options of config that are not the default. """
+  base = default_config()
+  return ",".join("%s=%s" % (name, config[name]) for name, values in axes if config[name] != base[name]) or "default"
+
+def set_config (config):
+  lpdict_module.set_use_fractions(config["use_fractions"])
+  for name in ["use_dual_for_ilp", "use_dual_simplex", "lp_method", "ilp_method"]:
+    setattr(lpdict_module, name, config[name])
+
+# Runs.
+
+def solve (problem, payload, config, time_limit):
+  """ One timed solve. Returns (status, objective, seconds, lpd). The parsing is not timed. """
+  set_config(config)
+  try :
+    lpd = new_lpdict(config["storage"])
+    lpd.pricing = pricing.new_pricing(config["e_selector"], config["l_selector"])
+    if problem == "sudoku" :
+      puzzle = sudoku(int(round(len(payload) ** 0.5)))
+      puzzle.sarray = [list(row) for row in payload]
+      puzzle.init_lpdict(lpd)
+    else :
+      lpd.init_from_string(payload)
+    deadline = time.time() + time_limit
+    t0 = time.time()
+    z  = lpd.solve_lp(deadline=deadline) if problem == "lp" else lpd.solve_ilp(deadline=deadline)
+    seconds = time.time() - t0
+  finally :
+    set_config(default_config())
+  status = "OPTIMAL" if isinstance(z, Number) else str(z).upper()
+  objective = float(z) if isinstance(z, Number) else None
+  if problem == "sudoku" and status == "OPTIMAL" :
+    puzzle.lpsoln_to_sudoku_format(lpd)
+    if not puzzle.is_solved() :
+      status = "WRONG"
+  return status, objective, seconds, lpd
+
+def close (a, b):
+  return abs(a - b) <= 1e-6 * (1 + abs(b))
+
+def agrees (rv, ref):
+  """ Whether the result rv of a solve agrees with ref, the first complete one of its instance. """
+  if rv["status"] != ref["status"] :
+    return False
+  return rv["objective"] is None or close(rv["objective"], ref["objective"])
+
+def commit_id ():
+  """ The commit of the tree this runs from, if it is a git work tree. """
+  try :
+    with open(os.devnull, 'w') as devnull:
+      return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=devnull,
+                                     cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+  except (OSError, subprocess.CalledProcessError) :
+    return None
+
+def run (args):
+  out     = open(args.out, 'w') if args.out else sys.stdout
+  commit  = commit_id()
+  names   = args.axes.split(',')
+  totals  = {} # label -> [solves, seconds, limits]
+  differ  = []
+  for name, problem, (m, n), payload in instances(args):
+    ref = None
+    for config in configs(problem, args.sweep, names):
+      best = None
+      for k in range(args.repeat):
+        try :
+          status, objective, seconds, lpd = solve(problem, payload, config, args.time_limit)
+          lp_stats = dict(lpd.lp_stats)
+        except Exception :
+          print >> sys.stderr, name, label(config)
+          print >> sys.stderr, traceback.format_exc()
+          status, objective, seconds, lp_stats = "ERROR", None, 0.0, None
+        if best is None or seconds < best[2] :
+          best = (status, objective, seconds, lp_stats)
+      status, objective, seconds, lp_stats = best
+      rv = { "instance" : name, "problem" : problem, "m" : m, "n" : n, "config" : config, "label" : label(config),
+             "status" : status, "objective" : objective, "seconds" : round(seconds, 6), "lp_stats" : lp_stats,
+             "commit" : commit }
+      print >> out, json.dumps(rv, sort_keys=True, default=stats_default)
+      out.flush()
+      total = totals.setdefault(rv["label"], [0, 0.0, 0])
+      total[0] += 1 ; total[1] += seconds ; total[2] += status == "LIMIT"
+      if status in ["LIMIT", "ERROR"] :
+        if status == "ERROR" :
+          differ.append((name, rv["label"], status, None))
+        continue
+      if ref is None :
+        ref = rv
+      elif not agrees(rv, ref) or status == "WRONG" :
+        differ.append((name, rv["label"], status, objective))
+  if args.out :
+    out.close()
+
+  print >> sys.stderr, "%-60s %8s %12s %8s" % ("options", "solves", "seconds", "limits")
+  for key in sorted(totals, key=lambda key: (key != "default", key)):
+    solves, seconds, limits = totals[key]
+    print >> sys.stderr, "%-60s %8d %12.3f %8d" % (key[:60], solves, seconds, limits)
+  for name, key, status, objective in differ:
+    print >> sys.stderr, "%s %s : %s %s differs" % (name, key, status, objective)
+  return 1 if differ else 0
+
+def read_results (fname):
+  """ -compare : (instance, label) -> the result line of a run. """
+  with open(fname) as f:
+    return dict(((rv["instance"], rv["label"]), rv) for rv in (json.loads(line) for line in f if line.strip()))
+
+def compare (args):
+  """ The solves in both result files, side by side : the speedup of each, their geometric mean, and the
+      regressions, i.e. solves that got slower than slowdown or that changed their result. """
+  old = read_results(args.compare[0])
+  new = read_results(args.compare[1])
+  keys = sorted(set(old) & set(new))
+  print "%-32s %-40s %10s %10s %8s" % ("instance", "options", "old s", "new s", "speedup")
+  log_sum = 0.0 ; timed = 0 ; regressions = []
+  for key in keys:
+    a = old[key] ; b = new[key]
+    if "LIMIT" in [a["status"], b["status"]] :
+      print "%-32s %-40s %10s %10s" % (key[0][-32:], key[1][:40], a["status"], b["status"])
+      continue
+    speedup = a["seconds"] / b["seconds"] if b["seconds"] > 0 else float("inf")
+    print "%-32s %-40s %10.4f %10.4f %8.2f" % (key[0][-32:], key[1][:40], a["seconds"], b["seconds"], speedup)
+    if not agrees(b, a) :
+      regressions.append((key, "result %s %s, was %s %s" % (b["status"], b["objective"], a["status"], a["objective"])))
+    if max(a["seconds"], b["seconds"]) >= min_seconds and b["seconds"] > 0 and a["seconds"] > 0 :
+      log_sum += math.log(speedup) ; timed += 1
+      if 1 / speedup > slowdown :
+        regressions.append((key, "%.2fx slower" % (1 / speedup)))
+  if timed :
+    print "geometric mean speedup %.3f over %d solves of at least %g s" % (math.exp(log_sum / timed), timed, min_seconds)
+  print "%d solves only in %s, %d only in %s" % (len(set(old) - set(new)), args.compare[0], len(set(new) - set(old)), args.compare[1])
+  for key, what in regressions:
+    print "regression : %s %s : %s" % (key[0], key[1], what)
+  return 1 if regressions else 0
+
+def main(argv=None):
+  if argv is None:
+    argv = sys.argv
+
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('-sizes'     , default='10,30,100', help='comma separated rows of the lp instances, e.g. 10,100,1000,3000')
+  input_parser.add_argument('-kinds'     , default=",".join(kinds), help='comma separated kinds of the lp instances')
+  input_parser.add_argument('-ilp_sizes' , default='5,10', help='comma separated rows of the ilp instances')
+  input_parser.add_argument('-sudoku'    , default='2', help='comma separated sN of the sudoku instances')
+  input_parser.add_argument('-ratio'     , default=0.5, type=float, help='columns per row')
+  input_parser.add_argument('-density'   , default=0.5, type=float, help='fraction of nonzero coefficients')
+  input_parser.add_argument('-clues'     , default=0.5, type=float, help='fraction of the sudoku cells given')
+  input_parser.add_argument('-seed'      , default=0, type=int, help='random seed of the instances')
+  input_parser.add_argument('-sweep'     , default='one', choices=['one', 'all'], help='each option on its own, or all combinations')
+  input_parser.add_argument('-axes'      , default=",".join(name for name, values in axes), help='comma separated options to sweep')
+  input_parser.add_argument('-time_limit', default=10, type=float, help='seconds for each solve')
+  input_parser.add_argument('-repeat'    , default=1, type=int, help='solve each this many times, and keep the fastest')
+  input_parser.add_argument('-out'       , help='write the JSON lines to this file instead of stdout')
+  input_parser.add_argument('-write'     , help='only write the instances, as files in this directory')
+  input_parser.add_argument('-compare'   , nargs=2, metavar=('OLD', 'NEW'), help='compare two result files instead, and list the regressions')
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+
+  if args.compare :
+    return compare(args)
+  if args.write :
+    return write_instances(args)
+  return run(args)
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+doc_str = """
+ A binary file format for dictionaries, for the big ones that take longer to parse than to pivot.
+ After the header, the arrays follow each other, little endian, with nothing in between :
+   header           : the magic "LPDICTB1", then int64 m, n, flags (1 : there are upper bounds), 0
+   basic_indices    : int64[m]
+   nonbasic_indices : int64[n]
+   T                : float64[m+2][n+1], the tableau of dense_lpdict : a row of b_i A_i for each
+                      basic variable, then z_coeffs, then zeros (the shdw_z_coeffs)
+   upper            : float64[m+n], with flags 1 : the upper bounds of the basic and then the
+                      nonbasic variables, inf for none, as in the text format
+ With the numpy storage, T is memory mapped copy-on-write from the file, so that loading does no
+ parsing or copying : the pages are read as the pivots get to them, and written to private copies.
+ The other storages get lists of floats from it, so integers of the text format become floats.
+ lpdict.init_from_file and init_from_string tell the two formats apart by the magic, so pivot.py,
+ -batch and solver_daemon.py take either. Run as a script, this converts text dictionaries.
+"""
+
+import sys
+import mmap
+import struct
+import argparse
+import numpy as np
+from   lpdict import new_lpdict, binary_magic
+
+header = struct.Struct("<8sqqqq")
+has_upper = 1
+
+def write (lpd, fname):
+  """ Write a dictionary as it was read, i.e. before any pivots, in the binary format. """
+  assert not lpd.complemented, "only a dictionary as it was read can be written"
+  m = lpd.m ; n = lpd.n
+  T = np.zeros((m+2, n+1), dtype='<f8')
+  for i in range(m):
+    T[i,0] = lpd.b_values[i]
+    for j, a in lpd.row_entries(i):
+      T[i,j+1] = a
+  T[m] = [float(c) for c in lpd.z_coeffs]
+  variables = list(lpd.basic_indices) + list(lpd.nonbasic_indices)
+  with open(fname, 'wb') as f:
+    f.write(header.pack(binary_magic, m, n, has_upper if lpd.upper else 0, 0))
+    f.write(np.array(variables, dtype='<i8').tobytes())
+    f.write(T.tobytes())
+    if lpd.upper :
+      f.write(np.array([float(lpd.upper.get(var, float("inf"))) for var in variables], dtype='<f8').tobytes())
+
+def read (lpd, buf):
+  """ Initialize lpd from the binary format in buf, a string or an mmap. """
+  magic, m, n, flags, unused = header.unpack_from(buf)
+  assert magic == binary_magic, "not a binary dictionary"
+  offset = header.size
+  variables = np.frombuffer(buf, '<i8', m + n, offset).tolist()
+  offset += 8 * (m + n)
+  T = np.frombuffer(buf, '<f8', (m+2) * (n+1), offset).reshape(m+2, n+1)
+  offset += 8 * (m+2) * (n+1)
+  upper = None
+  if flags & has_upper :
+    upper = dict(zip(variables, np.frombuffer(buf, '<f8', m + n, offset).tolist()))
+  basic_indices = variables[:m] ; nonbasic_indices = variables[m:]
+  if lpd.storage == "numpy" :
+    if not T.flags.writeable : # from a string, not a copy-on-write mmap.
+      T = T.copy()
+    lpd.init_tableau(m, n, basic_indices, nonbasic_indices, T, upper)
+  else :
+    lpd.init_fn(m, n, basic_indices, nonbasic_indices, T[:m,0].tolist(), T[:m,1:].tolist(), T[m].tolist(), upper)
+
+def load (lpd, fname):
+  """ read, from the file fname memory mapped copy-on-write. The mapping lives as long as the arrays on it. """
+  with open(fname, 'rb') as f:
+    buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+  read(lpd, buf)
+
+def main(argv=None):
+  if argv is None:
+    argv = sys.argv
+
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('lpdicts', nargs='+', help='text lpdictionary files')
+  input_parser.add_argument('-suffix', default='.bdict', help='the binary file of each is written next to it, with this suffix')
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+
+  for fname in args.lpdicts:
+    lpd = new_lpdict("list")
+    lpd.init_from_file(fname)
+    write(lpd, fname + args.suffix)
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+
+doc_str = """
+ This file implements a branch-and-bound ILP solver on top of the lpdict class.
+ Each node is a solved dictionary. A child is a copy of its parent's final dictionary with
+ one extra row, x <= floor(b) or x >= ceil(b) for a fractional basic variable x = b.
+ The parent dictionary is still dual feasible, so the child is re-optimized with the dual simplex method.
+ For branch-and-cut, rounds of Gomory cuts (add_all_ilp_cuts) are added at the root before branching.
+ A solve limit (see lpdict.limited) stops the search with status limit. The root lpdict then holds the
+ best integral dictionary found, if any, and ilp_stats the incumbent, best bound and gap.
+"""
+
+import heapq
+from   numbers import Number
+from   lpdict import eps_cmp_le, eps_cmp_gt, is_integer, frac
+
+# Order in which open nodes are explored.
+# best_bound  : the node with the largest LP bound first.
+# depth_first : the most recent node first, which finds incumbents quickly.
+node_selection  = "best_bound"
+node_selections = ["best_bound", "depth_first"]
+
+# How the variable to branch on is picked.
+# most_fractional : fractional part closest to 0.5.
+# pseudo_cost     : largest product of the estimated down and up objective degradations.
+branching  = "most_fractional"
+branchings = ["most_fractional", "pseudo_cost"]
+
+# Rounds of Gomory cuts at the root node, for branch-and-cut.
+bc_cut_rounds = 5
+
+# Branching alone need not terminate when the LP relaxation is unbounded and has no integral points
+# (e.g. ilpTest10). After this many nodes, give up on the tree and run Gomory cuts from the root instead.
+max_nodes = 2000
+
+def add_branch_row (lpd, row, is_up):
+  """ For the basic variable x = b of row, add x >= ceil(b) if is_up, else x <= floor(b). """
+  b     = lpd.b_values[row]
+  A_row = [0]*lpd.n
+  for j, a in lpd.row_entries(row):
+    A_row[j] = a
+  if is_up : # s = x - ceil(b)  >= 0
+    lpd.add_row(frac(b) - 1, A_row)
+  else :     # s = floor(b) - x >= 0
+    lpd.add_row(-frac(b), [-a for a in A_row])
+
+def branch_order (b):
+  """ Nearer rounding of b last, so that depth_first pops it first. """
+  return [False, True] if frac(b) >= 0.5 else [True, False]
+
+class bb_node:
+  def __init__ (self, lpd, bound, depth):
+    self.lpd   = lpd
+    self.bound = bound # LP objective, an upper bound for the subtree.
+    self.depth = depth
+
+class branch_and_bound:
+  def __init__ (self, lpd, cut_rounds=0):
+    self.root        = lpd
+    self.cut_rounds  = cut_rounds
+    self.incumbent   = None # dictionary of the best integral solution found so far.
+    self.incumbent_z = None
+    self.new_incumbent = False # since the last report.
+    self.open        = []   # heap or stack of open nodes, depending on node_selection.
+    self.node_count  = 0    # for a deterministic order among equal bounds.
+    self.pc          = {}   # (var, is_up) -> [sum of degradation per unit, count], for pseudo costs.
+    self.stats       = { "nodes" : 0, "pruned" : 0, "infeasible" : 0, "integral" : 0,
+                         "max_depth" : 0, "cut_rounds" : 0, "fallback" : False, "root_bound" : None,
+                         "limit" : False }
+
+  def push (self, node):
+    self.node_count += 1
+    if node_selection == "depth_first":
+      self.open.append(node)
+    else :
+      heapq.heappush(self.open, (-node.bound, self.node_count, node))
+
+  def pop (self):
+    if node_selection == "depth_first":
+      return self.open.pop()
+    return heapq.heappop(self.open)[2]
+
+  def can_prune (self, bound):
+    return self.incumbent_z is not None and eps_cmp_le(bound, self.incumbent_z)
+
+  def evaluate (self, lpd, lps, depth, integral=None):
+    """ Book keeping for a freshly solved node. Returns the open node to push, if any. """
+    self.stats["nodes"]    += 1
+    self.stats["max_depth"] = max(self.stats["max_depth"], depth)
+    if not isinstance(lps, Number) :
+      self.stats["infeasible"] += 1
+    elif self.can_prune(lps) :
+      self.stats["pruned"] += 1
+    elif integral if integral is not None else lpd.is_integral() :
+      self.stats["integral"] += 1
+      self.incumbent   = lpd
+      self.incumbent_z = lps
+      self.new_incumbent = True
+    else :
+      return bb_node(lpd, lps, depth)
+    return None
+
+  def pseudo_cost (self, var, is_up):
+    if (var, is_up) in self.pc :
+      s, c = self.pc[(var, is_up)]
+      return s / c
+    known = [s / c for (s, c) in self.pc.values()]
+    return sum(known) / len(known) if known else 1.0
+
+  def select_branch (self, lpd):
+    """ Row of the basic variable to branch on. Ties go to the smallest variable index. """
+    best_row   = None
+    best_score = None
+    best_var   = None
+    for i, b in enumerate(lpd.b_values):
+      if is_integer(b):
+        continue
+      f   = float(frac(b))
+      var = lpd.basic_indices[i]
+      if branching == "pseudo_cost":
+        score = max(self.pseudo_cost(var, False) * f, 1e-6) * max(self.pseudo_cost(var, True) * (1 - f), 1e-6)
+      else : # most_fractional
+        score = min(f, 1 - f)
+      if best_score == None or eps_cmp_gt(score, best_score) or (not eps_cmp_gt(best_score, score) and var < best_var):
+        best_row   = i
+        best_score = score
+        best_var   = var
+    return best_row
+
+  def make_child (self, node, row, is_up):
+    """ Copy of the parent with the branch row added, re-optimized by dual simplex """
+    lpd = node.lpd.copy()
+    b   = lpd.b_values[row]
+    add_branch_row(lpd, row, is_up)
+    lps = lpd.run_dual_simplex()
+    self.update_pseudo_cost(node.bound, node.lpd.basic_indices[row], b, is_up, lps)
+    return lpd, lps
+
+  def update_pseudo_cost (self, parent_bound, var, b, is_up, lps):
+    """ Record the objective degradation per unit of change, for branching on var = b. """
+    if not isinstance(lps, Number) :
+      return
+    f    = float(frac(b))
+    unit = (1 - f) if is_up else f
+    key  = (var, is_up)
+    s, c = self.pc.get(key, [0.0, 0])
+    self.pc[key] = [s + float(parent_bound - lps) / unit, c + 1]
+
+  def fallback (self, lpd):
+    """ Gomory cutting planes from the solved root dictionary lpd, till it is integral or infeasible. """
+    self.stats["fallback"] = True
+    if lpd.cut_pool is not None :
+      self.stats["cut_pool"] = lpd.cut_pool.history
+    self.open = []
+    lps = lpd.z_coeffs[0]
+    while isinstance(lps, Number) and not lpd.is_integral() :
+      if lpd.add_all_ilp_cuts() == 0 :
+        if lpd.cut_pool is None or not lpd.cut_pool.stalled :
+          break
+        # The pool gave up (see cutpool.py) : plain Gomory rounds, from the root before any cut.
+        lpd = self.root_start
+        lpd.cut_pool = None
+        lps = lpd.z_coeffs[0]
+        continue
+      self.stats["cut_rounds"] += 1
+      lpd.lp_stats["cut_rounds"] += 1
+      lps = lpd.run_dual_simplex()
+    if lps == "LIMIT" :
+      self.stats["limit"] = True
+    if isinstance(lps, Number) and (self.incumbent_z is None or eps_cmp_gt(lps, self.incumbent_z)) :
+      self.incumbent   = lpd
+      self.incumbent_z = lps
+      self.new_incumbent = True
+
+  def best_bound (self):
+    bounds = [x.bound for x in self.open] if node_selection == "depth_first" else [-x[0] for x in self.open]
+    if self.incumbent_z is not None :
+      bounds.append(self.incumbent_z)
+    return max(bounds) if bounds else None
+
+  def incumbent_lpdict (self):
+    return self.incumbent
+
+  def report (self):
+    """ Progress to the callback of the solve limit, if any. Only between nodes, when the open nodes and the
+        incumbent cover the whole tree, so that best_bound is a bound. """
+    if self.root.limit is None or self.root.limit.callback is None :
+      return
+    self.root.report_progress(self.best_bound(), self.incumbent_z, self.incumbent_lpdict() if self.new_incumbent else None)
+    self.new_incumbent = False
+
+  def solve (self):
+    """ Same return values as lpdict.solve_ilp. The root lpdict ends up holding the best integral dictionary. """
+    lps = self.solve_root()
+    if not isinstance(lps, Number) :
+      self.finish()
+      return lps.lower()
+    self.search()
+    return self.result()
+
+  def solve_root (self):
+    """ Solve the root LP, with cut rounds for branch-and-cut, and make it the first open node. """
+    root = self.root
+    lps  = root.solve_lp()
+    if isinstance(lps, Number) and root.cut_pool is not None :
+      self.root_start = root.copy() # for the fallback, should the pool give up.
+    if isinstance(lps, Number) :
+      for r in range(self.cut_rounds):
+        if root.is_integral() or root.add_all_ilp_cuts() == 0 :
+          break
+        self.stats["cut_rounds"] += 1
+        root.lp_stats["cut_rounds"] += 1
+        lps = root.run_dual_simplex()
+        if not isinstance(lps, Number) :
+          break
+    if not isinstance(lps, Number) :
+      return lps
+    self.stats["root_bound"] = lps
+    if root.cut_pool is not None :
+      self.stats["cut_pool"] = root.cut_pool.history
+    self.root_copy = root.copy() # for the fallback.
+
+    node = self.evaluate(root, lps, 0)
+    if node :
+      self.push(node)
+    self.report()
+    return lps
+
+  def search (self):
+    while self.open :
+      node = self.pop()
+      if self.can_prune(node.bound) :
+        self.stats["pruned"] += 1
+        continue
+      if self.stats["nodes"] >= max_nodes :
+        self.fallback(self.root_copy)
+        break
+      row = self.select_branch(node.lpd)
+      for is_up in branch_order(node.lpd.b_values[row]):
+        lpd, lps = self.make_child(node, row, is_up)
+        if lps == "LIMIT" :
+          self.push(node) # not done, and its bound still holds for best_bound.
+          self.stats["limit"] = True
+          return
+        child = self.evaluate(lpd, lps, node.depth + 1)
+        if child :
+          self.push(child)
+      node.lpd = None # done with this dictionary, release it.
+      self.report()
+
+  def result (self):
+    if self.incumbent is not None :
+      kept = dict((name, self.root.__dict__[name]) for name in ["lp_stats", "timers", "pivot_callbacks"])
+      self.root.__dict__.update(self.incumbent_lpdict().__dict__)
+      self.root.__dict__.update(kept) # of the whole solve, not only of the incumbent's dictionary.
+    self.finish()
+    if self.stats["limit"] :
+      return "limit"
+    if self.incumbent is None :
+      return "infeasible"
+    return self.incumbent_z
+
+  def finish (self):
+    self.stats["incumbent"]  = self.incumbent_z
+    self.stats["best_bound"] = self.best_bound()
+    if self.incumbent_z is not None :
+      self.stats["gap"] = self.stats["best_bound"] - self.incumbent_z
+    else :
+      self.stats["gap"] = None
+    self.stats["method"] = "bc" if self.cut_rounds else "bb"
+    self.root.ilp_stats = self.stats
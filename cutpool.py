@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+doc_str = """
+ This file implements a pool of Gomory cuts for the lpdict class.
+ Plain add_all_ilp_cuts adds a cut for every fractional row in every round, and never removes any,
+ so m keeps growing and every later pivot gets slower. With a cut pool, each round :
+  - ages the cuts whose slack variable is basic and nonbinding (b > 0), and drops the rows of those
+    that have stayed so for max_age rounds. The row of a basic slack can be dropped without changing
+    the rest of the dictionary, it is just a constraint that is not needed at the moment.
+  - drops more of the basic cuts, the oldest first, to stay within max_active_cuts.
+  - scores the candidate cuts (one per fractional row) by efficacy, the distance by which the cut
+    separates the current vertex, and adds at most max_cuts_per_round of them, skipping a candidate
+    that is nearly parallel to a cut already selected or active.
+ A cut whose row was dropped is remembered, and the same cut is not added again, so that the rounds
+ can not cycle through the same cuts. If the LP bound has not gone down by min_gain for max_stall_rounds
+ rounds, or after max_rounds rounds, or if every candidate is a cut dropped before, the pool gives up :
+ add_cuts returns 0 with stalled set, and solve_ilp goes on with branch-and-bound from the dictionary
+ as it was before the cuts.
+ Statistics for each round are kept in history.
+"""
+
+import math
+import lpdict as lpdict_module
+from   lpdict import frac
+
+# Cuts added per round, at most.
+max_cuts_per_round = 8
+
+# Rounds for which a cut can stay basic and nonbinding before its row is dropped.
+max_age = 3
+
+# Bound on the number of active cuts. Cuts with a nonbasic (tight) slack can not be dropped,
+# so this is a soft limit : at least one cut is still added per round, to make progress.
+max_active_cuts = 200
+
+# Rows whose fractional part is within min_frac of an integer give no cut. Such a small fraction is
+# mostly round-off, and a cut from it can cut off integral solutions.
+min_frac = 1e-6
+
+# Candidates whose cosine with a selected or active cut is above this are skipped.
+max_parallelism = 0.999
+
+# Rounds without the LP bound going down by min_gain (relative), and rounds in all, before giving up.
+max_stall_rounds = 20
+max_rounds       = 500
+min_gain         = 1e-4
+
+def norm (v):
+  return math.sqrt(sum(float(x)*x for x in v.values()))
+
+def cosine (u, v):
+  """ u, v are {col : value} dicts. """
+  nu = norm(u) ; nv = norm(v)
+  if nu == 0 or nv == 0 :
+    return 0.0
+  if len(u) > len(v) :
+    u, v = v, u
+  return sum(float(x) * v[j] for j, x in u.items() if j in v) / (nu * nv)
+
+def is_candidate (b):
+  return min_frac <= frac(b) <= 1 - min_frac
+
+def signature (lpd, b, f):
+  """ The cut  f.x_N >= frac(b)  of a row, over the variables of x_N, rounded : the same cut gives the same one. """
+  return (round(float(frac(b)), 9),) + tuple(sorted((lpd.nonbasic_indices[j], round(float(x), 9)) for j, x in f.items() if x != 0))
+
+class cut_pool:
+  def __init__ (self):
+    self.ages    = {} # slack variable of each active cut -> rounds it has been nonbinding.
+    self.cuts    = {} # slack variable of each active cut -> its signature.
+    self.dropped = set() # signatures of the cuts dropped so far.
+    self.rounds  = 0
+    self.history = [] # one dict of statistics per round.
+    self.best    = None # lowest LP bound so far, and the round it was reached in.
+    self.stalled = False # given up, see add_all_ilp_cuts.
+
+  def candidates (self, lpd):
+    """ (efficacy, row, f) for every fractional row that is not a dropped cut. A cut  f.x_N >= f0  has efficacy
+        f0 / |f|. """
+    cands = []
+    for i, b in enumerate(lpd.b_values):
+      if not is_candidate(b) :
+        continue
+      f  = dict((j, frac(-a)) for j, a in lpd.row_entries(i))
+      if signature(lpd, b, f) in self.dropped :
+        continue
+      nf = norm(f)
+      # A cut with f = 0 proves that there is no integral solution, so it goes first.
+      cands.append((float(frac(b)) / nf if nf > 0 else float("inf"), i, f))
+    return cands
+
+  def age_and_drop (self, lpd, need):
+    """ Update the ages, and drop the rows of old nonbinding cuts, and more to make room for need new cuts.
+        Returns the number dropped. """
+    eps  = lpdict_module.epsilon
+    rows = dict((v, i) for i, v in enumerate(lpd.basic_indices) if v in self.ages)
+    for v in self.ages:
+      if v in rows and lpd.b_values[rows[v]] > eps :
+        self.ages[v] += 1
+      else :
+        self.ages[v] = 0
+
+    drop = set(v for v in rows if self.ages[v] >= max_age)
+    # Oldest basic cuts next, till the room needed for this round is free.
+    excess = len(self.ages) - len(drop) + need - max_active_cuts
+    if excess > 0 :
+      rest = sorted((v for v in rows if v not in drop), key=lambda v: (-self.ages[v], v))
+      drop.update(rest[:excess])
+
+    for i in sorted((rows[v] for v in drop), reverse=True):
+      lpd.remove_row(i)
+    for v in drop:
+      del self.ages[v]
+      self.dropped.add(self.cuts.pop(v))
+    return len(drop)
+
+  def select (self, lpd, cands):
+    """ Rows to cut on : best efficacy first, skipping nearly parallel cuts. """
+    if not cands :
+      return []
+    room = max(1, min(max_cuts_per_round, max_active_cuts - len(self.ages)))
+    active = [dict((j, a) for j, a in lpd.row_entries(i))
+              for i, v in enumerate(lpd.basic_indices) if v in self.ages]
+    chosen = []
+    for eff, i, f in sorted(cands, key=lambda c: (-c[0], lpd.basic_indices[c[1]])):
+      if len(chosen) >= room :
+        break
+      # The best candidate is always taken, so that every round makes progress.
+      if chosen and any(cosine(f, g) > max_parallelism for g in active):
+        continue
+      chosen.append(i)
+      active.append(f)
+    return chosen
+
+  def stalling (self, lpd):
+    """ Whether to give up on the pool before this round : no progress in the bound, or too many rounds. """
+    z = lpd.z_coeffs[0]
+    if self.best is None or z < self.best[0] - min_gain * (1 + abs(self.best[0])) :
+      self.best = (z, self.rounds)
+    return self.rounds - self.best[1] >= max_stall_rounds or self.rounds >= max_rounds
+
+  def add_cuts (self, lpd):
+    """ One round of cuts on the solved dictionary lpd, in place of add_all_ilp_cuts.
+        Returns the number of cuts added, 0 if lpd is integral up to min_frac. """
+    if self.stalling(lpd) :
+      return self.give_up(lpd)
+    self.rounds += 1
+    need    = min(max_cuts_per_round, len(filter(is_candidate, lpd.b_values)))
+    removed = self.age_and_drop(lpd, need)
+    cands   = self.candidates(lpd)
+    if not cands and any(is_candidate(b) for b in lpd.b_values) : # only dropped cuts left, it would cycle.
+      return self.give_up(lpd)
+    chosen  = self.select(lpd, cands)
+    for i in chosen:
+      f = dict((j, frac(-a)) for j, a in lpd.row_entries(i))
+      sig = signature(lpd, lpd.b_values[i], f)
+      v = lpd.add_ilp_cut(i, False)
+      self.ages[v] = 0
+      self.cuts[v] = sig
+    self.history.append({ "round"      : self.rounds,
+                          "candidates" : len(cands),
+                          "added"      : len(chosen),
+                          "removed"    : removed,
+                          "active"     : len(self.ages),
+                          "m"          : lpd.m })
+    return len(chosen)
+
+  def give_up (self, lpd):
+    """ No more cuts, see solve_ilp. The active cuts stay. """
+    self.stalled = True
+    self.history.append({ "round" : self.rounds, "stalled" : True, "m" : lpd.m })
+    return 0
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+doc_str = """
+ This file implements a NumPy backed storage for the lpdict class.
+ b_values, A, z_coeffs and shdw_z_coeffs all live in one contiguous float64 array,
+ so that a pivot is a single vectorized rank-1 update instead of nested python loops.
+"""
+
+import copy
+import numpy as np
+import lpdict as lpdict_module
+from   lpdict import lpdict, on_lists, line_to_num_list, convert_to_num
+
+def line_to_array (fh, count):
+  """ The next line of fh as count float64s, converted in one go. Lines that np.fromstring does not take
+      whole (fractions, hex, ...) go through convert_to_num, one token at a time. """
+  line = fh.readline()
+  row  = np.fromstring(line, dtype=np.float64, sep=' ')
+  if len(row) != count or len(line.split()) != count : # fromstring stops at the first token it cannot read.
+    row = np.array(map(float, map(convert_to_num, line.split())), dtype=np.float64)
+    assert len(row) == count
+  return row
+
+class dense_lpdict (lpdict):
+  """
+  Layout of the tableau T, which has m+2 rows and n+1 columns :
+     row i < m : b_values[i] A[i][0] ... A[i][n-1]
+     row m     : z_coeffs
+     row m+1   : shdw_z_coeffs
+  self.b_values, self.A, self.z_coeffs and self.shdw_z_coeffs are views into T.
+  """
+  storage = "numpy"
+
+  def __init__ (self):
+    lpdict.__init__(self)
+    self.T      = None
+    self.packed = False
+    self.nb_arr = None # nonbasic_indices as an array, for vectorized pricing.
+    self.b_arr  = None # basic_indices as an array, for the vectorized ratio test.
+
+  def init_fn (self,m,n,basic_indices,nonbasic_indices,b_values,A, z_coeffs, upper=None):
+    lpdict.init_fn(self, m, n, basic_indices, nonbasic_indices, b_values, A, z_coeffs, upper)
+    self.pack()
+
+  def init_tableau (self, m, n, basic_indices, nonbasic_indices, T, upper=None):
+    """ Like init_fn, from a tableau T as it is packed, which is then used as is, see binary_dict.py """
+    lpdict.init_fn(self, m, n, basic_indices, nonbasic_indices, [], [], [], upper)
+    self.T      = T
+    self.packed = True
+    self.set_views()
+
+  def init_from_rows (self, m, n, basic_indices, nonbasic_indices, b_values, rows, z_coeffs, upper=None):
+    """ The nonzeros of each row go straight into T. """
+    T = np.zeros((m+2, n+1), dtype=np.float64)
+    T[:m,0] = b_values
+    for i, row in enumerate(rows):
+      if row :
+        T[i, np.fromiter(row.iterkeys(), np.intp, len(row)) + 1] = row.values()
+    T[m] = z_coeffs
+    self.init_tableau(m, n, basic_indices, nonbasic_indices, T, upper)
+
+  def init_from_lines (self, fh):
+    """ The text format, each row parsed with line_to_array straight into T. """
+    m, n             = line_to_num_list(fh)
+    basic_indices    = line_to_num_list(fh)
+    nonbasic_indices = line_to_num_list(fh)
+    assert len(basic_indices)    == m
+    assert len(nonbasic_indices) == n
+    T = np.zeros((m+2, n+1), dtype=np.float64)
+    T[:m,0] = line_to_array(fh, m)
+    for i in range(m):
+      T[i,1:] = line_to_array(fh, n)
+    T[m] = line_to_array(fh, n+1)
+    upper = line_to_num_list(fh)
+    if upper :
+      assert len(upper) == m + n
+      upper = dict(zip(basic_indices + nonbasic_indices, upper))
+    self.init_tableau(m, n, basic_indices, nonbasic_indices, T, upper)
+
+  def pack (self):
+    """ Move the list storage into the contiguous array. """
+    m = self.m ; n = self.n
+    T = np.zeros((m+2, n+1), dtype=np.float64)
+    if m > 0 :
+      T[:m,0]  = self.b_values
+      if n > 0 :
+        T[:m,1:] = self.A
+    T[m]   = self.z_coeffs
+    T[m+1] = self.shdw_z_coeffs
+    self.T = T
+    self.packed = True
+    self.set_views()
+
+  def unpack (self):
+    """ Move the array back into list storage, so that the base class methods can work on it. """
+    m = self.m
+    T = self.T
+    self.b_values      = T[:m,0].tolist()
+    self.A             = T[:m,1:].tolist()
+    self.z_coeffs      = T[m].tolist()
+    self.shdw_z_coeffs = T[m+1].tolist()
+    self.T      = None
+    self.packed = False
+    self.nb_arr = None
+    self.b_arr  = None
+
+  def set_views (self):
+    m = self.m
+    T = self.T
+    self.b_values      = T[:m,0]
+    self.A             = T[:m,1:]
+    self.z_coeffs      = T[m]
+    self.shdw_z_coeffs = T[m+1]
+    self.nb_arr = np.array(self.nonbasic_indices, dtype=np.int64)
+    self.b_arr  = np.array(self.basic_indices,    dtype=np.int64)
+
+  def copy (self):
+    if not self.packed :
+      return lpdict.copy(self)
+    new = copy.copy(self)
+    new.basic_indices    = list(self.basic_indices)
+    new.nonbasic_indices = list(self.nonbasic_indices)
+    new.T = self.T.copy()
+    new.upper        = dict(self.upper)
+    new.complemented = set(self.complemented)
+    new.cut_pool = copy.deepcopy(self.cut_pool)
+    new.set_views()
+    return new
+
+  def find_entering_variable (self):
+    if self.pricing.name != "blands_rule":
+      return lpdict.find_entering_variable(self)
+    zc   = self.T[self.m,1:]
+    mask = zc > lpdict_module.epsilon # eps_cmp_gt(zc,0)
+    if not mask.any():
+      return "FINAL"
+    return int(self.nb_arr[mask].min())
+
+  def complement (self, var):
+    T = self.T
+    u = self.upper[var]
+    if var in self.nonbasic_indices :
+      c = self.nonbasic_indices.index(var) + 1
+      T[:,0] += T[:,c] * u # including both objective rows.
+      T[:,c] *= -1
+    else :
+      i = self.basic_indices.index(var)
+      T[i,0]   = u - T[i,0]
+      T[i,1:] *= -1
+    self.complemented ^= set([var])
+
+  def find_leaving_variable (self, entering_var, return_bound=False):
+    if self.pricing.l_rule != "blands_rule":
+      return lpdict.find_leaving_variable(self, entering_var, return_bound)
+    eps   = lpdict_module.epsilon
+    A_col = self.nonbasic_indices.index(entering_var)
+    assert (self.T[self.m,A_col+1] >= 0)
+    m     = self.m
+    col   = self.T[:m,A_col+1]
+    b     = self.T[:m,0]
+
+    rows  = np.nonzero(col < -eps)[0]            # eps_cmp_lt(a,0)
+    bounds = -b[rows] / col[rows]
+    ok    = bounds >= -eps                       # eps_cmp_ge(bound,0)
+    rows  = rows[ok]
+    bounds = bounds[ok]
+    if len(rows) == 0 :
+      rv = "UNBOUNDED"
+      best_bound = None
+    else :
+      # Smallest bound, with Bland's rule breaking ties between bounds that are eps-equal.
+      ties = bounds < bounds.min() + eps
+      k    = np.argmin(np.where(ties, self.b_arr[rows], np.iinfo(np.int64).max))
+      rv   = int(self.b_arr[rows[k]])
+      best_bound = float(bounds[k])
+    if return_bound :
+      return (rv, best_bound)
+    else :
+      return rv
+
+  def pivot (self, entering_var, leaving_var):
+    p_col = self.nonbasic_indices.index(entering_var)
+    p_row = self.basic_indices.index(leaving_var)
+    self.pricing.update(self, p_row, p_col)
+    c = p_col + 1 # column in T
+    T = self.T
+
+    # First pivot the row with the leaving_var
+    aij = - T[p_row,c]
+    T[p_row,c] = -1
+    if aij != 1 :
+      T[p_row] /= aij
+    prow = T[p_row]
+
+    # Now pivot all the other rows, including both objective rows, as one rank-1 update.
+    col = T[:,c].copy()
+    col[p_row] = 0
+    rows = np.nonzero(col)[0]
+    T[rows,c] = 0
+    T[rows] += col[rows,np.newaxis] * prow
+
+    # And switch the lists of indices.
+    self.basic_indices[p_row]    = entering_var
+    self.nonbasic_indices[p_col] = leaving_var
+    self.b_arr[p_row]  = entering_var
+    self.nb_arr[p_col] = leaving_var
+
+    return self.z_coeffs[0]
+
+  def first_aux_pivot (self):
+    ev = 0
+    lv = self.basic_indices[int(np.argmin(self.b_values))] # var with smallest b value.
+    self.pivot(ev,lv)
+
+  def is_feasible (self):
+    if self.upper :
+      return lpdict.is_feasible(self)
+    return self.m == 0 or not lpdict_module.eps_cmp_lt(self.b_values.min(), 0)
+
+  def is_degenerate (self):
+    return self.m > 0 and bool(self.b_values.min() == 0)
+
+  def dictionary_values (self):
+    if self.solution is not None and self.solution[0] == tuple(self.basic_indices) : # see lpdict.dictionary_values
+      return self.solution[1]
+    vars = self.basic_indices + self.nonbasic_indices
+    vals = self.b_values.tolist() + [0]*(self.n)
+    vvs  = zip (vars,vals)
+    vvs.sort()
+    return self.uncomplemented(vvs)
+
+  def is_integral (self):
+    """ Is the current dictionary integral in all variable values. """
+    b = self.b_values
+    return bool((np.abs(b - np.round(b)) < lpdict_module.epsilon).all())
+
+  __str__          = on_lists(lpdict.__str__)
+  auxiliarize      = on_lists(lpdict.auxiliarize)
+  bounded_auxiliarize = on_lists(lpdict.bounded_auxiliarize)
+  unauxiliarize    = on_lists(lpdict.unauxiliarize)
+  dualize          = on_lists(lpdict.dualize)
+  add_ilp_cut      = on_lists(lpdict.add_ilp_cut)
+  add_row          = on_lists(lpdict.add_row)
+  remove_row       = on_lists(lpdict.remove_row)
+  add_all_ilp_cuts = on_lists(lpdict.add_all_ilp_cuts)
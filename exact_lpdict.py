@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+
+doc_str = """
+ This file implements an exact integer storage for the lpdict class, as a faster alternative to use_fractions.
+ The whole dictionary is kept as python integers T over one common denominator D, and a pivot is a
+ fraction-free (Bareiss) update : every new entry is (T_ij p - T_ic T_rj) / D_old, which is an exact
+ integer division, and the pivot element p becomes the new D. No gcd is needed on the way.
+ b_values, A and z_coeffs are only materialized as Fractions when they are read, e.g. to print the
+ result or to branch on, and Gomory cuts come straight from the integers, as (-T_kj mod D) / D.
+
+ The division is exact as long as the entries are the minors of an integral starting dictionary, which
+ is the case from an integral input and through pivots and (un)auxiliarize. Rows added by cuts or
+ branching, and the shape changes that go through lists, break that. Pivots then divide by the gcd of
+ the tableau instead, till it is integral again.
+
+ Run as a script, this prints a benchmark of float, use_fractions and exact storage on the given files.
+"""
+
+import sys
+import time
+import argparse
+from   itertools import izip
+from   fractions import Fraction, gcd
+import lpdict as lpdict_module
+from   lpdict import lpdict, on_lists
+
+def to_fraction (x):
+  """ The exact value of an input number. Floats are read the way they print, 0.1 is 1/10. """
+  if isinstance(x, float) :
+    return Fraction(repr(x))
+  return Fraction(x)
+
+def lcm (a, b):
+  return a * b // gcd(a, b)
+
+class exact_lpdict (lpdict):
+  """
+  Layout of the integer tableau T, which has m+2 rows and n+1 columns, all over the denominator D > 0 :
+     row i < m : b_values[i] A[i][0] ... A[i][n-1]
+     row m     : z_coeffs
+     row m+1   : shdw_z_coeffs
+  While packed, reading self.b_values, self.A, self.z_coeffs or self.shdw_z_coeffs gives Fractions,
+  cached till the next change of T. They are read-only, all changes go through T.
+  """
+  storage = "exact"
+  materialized = ("b_values", "A", "z_coeffs", "shdw_z_coeffs")
+
+  def __init__ (self):
+    lpdict.__init__(self)
+    self.T       = None
+    self.D       = 1
+    self.bareiss = True # are the entries of T minors of an integral dictionary, see doc_str.
+    self.packed  = False
+    self.cache   = {}
+
+  def __getattr__ (self, name):
+    """ Only called for attributes that are not set, i.e. the materialized lists while packed. """
+    if name not in exact_lpdict.materialized or not self.__dict__.get("packed") :
+      raise AttributeError(name)
+    if name not in self.cache :
+      self.cache[name] = self.materialize(name)
+    return self.cache[name]
+
+  def materialize (self, name):
+    m = self.m ; T = self.T ; D = self.D
+    if name == "b_values" :
+      return [Fraction(row[0], D) for row in T[:m]]
+    if name == "A" :
+      return [[Fraction(x, D) for x in row[1:]] for row in T[:m]]
+    return [Fraction(x, D) for x in T[m if name == "z_coeffs" else m+1]]
+
+  def changed (self):
+    self.cache = {}
+
+  def init_fn (self,m,n,basic_indices,nonbasic_indices,b_values,A, z_coeffs, upper=None):
+    lpdict.init_fn(self, m, n, basic_indices, nonbasic_indices, b_values, A, z_coeffs, upper)
+    self.pack()
+
+  def init_tableau (self, m, n, basic_indices, nonbasic_indices, D, T, bareiss, upper=None):
+    """ Like init_fn, from a tableau as it is packed, see parallel_bb.py """
+    lpdict.init_fn(self, m, n, basic_indices, nonbasic_indices, [], [], [], upper)
+    for name in exact_lpdict.materialized:
+      del self.__dict__[name]
+    self.T       = T
+    self.D       = D
+    self.bareiss = bareiss
+    self.packed  = True
+    self.changed()
+
+  def pack (self):
+    """ Move the list storage into T, over the least common denominator. """
+    rows = [[b] + list(a) for b, a in zip(self.b_values, self.A)]
+    rows = rows + [list(self.z_coeffs), list(self.shdw_z_coeffs)]
+    rows = [[to_fraction(x) for x in row] for row in rows]
+    D = 1
+    for row in rows:
+      for x in row:
+        if x.denominator != 1 :
+          D = lcm(D, x.denominator)
+    self.T = [[x.numerator * (D // x.denominator) for x in row] for row in rows]
+    self.D = D
+    # An integral dictionary can be taken as the starting one, see doc_str.
+    self.bareiss = (D == 1)
+    for name in exact_lpdict.materialized:
+      del self.__dict__[name]
+    self.packed = True
+    self.changed()
+
+  def unpack (self):
+    """ Move T back into lists of Fractions, so that the base class methods can work on it. """
+    for name in exact_lpdict.materialized:
+      self.__dict__[name] = self.materialize(name)
+    self.T      = None
+    self.packed = False
+    self.changed()
+
+  def column_entries (self, col):
+    if not self.packed : # inside on_lists.
+      return lpdict.column_entries(self, col)
+    D = self.D
+    return [(i, Fraction(row[col+1], D)) for i, row in enumerate(self.T[:self.m])]
+
+  def row_entries (self, row):
+    if not self.packed :
+      return lpdict.row_entries(self, row)
+    D = self.D
+    return [(j, Fraction(x, D)) for j, x in enumerate(self.T[row][1:])]
+
+  def find_entering_variable (self):
+    if self.pricing.name != "blands_rule":
+      return lpdict.find_entering_variable(self)
+    zrow = self.T[self.m]
+    cands = [var for var, zc in izip(self.nonbasic_indices, zrow[1:]) if zc > 0]
+    if not cands :
+      return "FINAL"
+    return min(cands)
+
+  def find_leaving_variable (self, entering_var, return_bound=False):
+    if self.pricing.l_rule != "blands_rule":
+      return lpdict.find_leaving_variable(self, entering_var, return_bound)
+    c = self.nonbasic_indices.index(entering_var) + 1
+    T = self.T
+    assert (T[self.m][c] >= 0)
+    # The bound of row i is b / -a. D cancels, and bounds compare by cross multiplication.
+    leaving_var = None
+    for i in range(self.m):
+      a = T[i][c]
+      b = T[i][0]
+      if a < 0 and b >= 0 :
+        var = self.basic_indices[i]
+        if leaving_var is None or b * best_a < best_b * -a or b * best_a == best_b * -a and var < leaving_var :
+          leaving_var = var
+          best_b = b ; best_a = -a
+    if leaving_var is None :
+      rv = "UNBOUNDED"
+      best_bound = None
+    else :
+      rv = leaving_var
+      best_bound = Fraction(best_b, best_a)
+    if return_bound :
+      return (rv, best_bound)
+    else :
+      return rv
+
+  def pivot (self, entering_var, leaving_var):
+    p_col = self.nonbasic_indices.index(entering_var)
+    p_row = self.basic_indices.index(leaving_var)
+    self.pricing.update(self, p_row, p_col)
+    c = p_col + 1 # column in T
+    T = self.T
+    D = self.D
+    prow = T[p_row]
+    p = prow[c]
+
+    # Row p_row :  x_e = (x_l - b - sum a_j x_j) / a_c, over the denominator p.
+    # Other rows : a_ij - a_ic a_j / a_c, over the denominator D p, and then divided by D.
+    if self.bareiss :
+      for i, row in enumerate(T):
+        if i != p_row :
+          t = row[c]
+          if t == 0 :
+            if p != D :
+              T[i] = [x * p // D for x in row]
+          else :
+            new = [(x * p - t * y) // D for x, y in izip(row, prow)]
+            new[c] = t
+            T[i] = new
+      new = [-y for y in prow]
+      new[c] = D
+      T[p_row] = new
+      D = p
+    else :
+      g = D * p
+      for i, row in enumerate(T):
+        if i != p_row :
+          t = row[c]
+          new = [x * p - t * y for x, y in izip(row, prow)]
+          new[c] = t * D
+          T[i] = new
+      new = [-y * D for y in prow]
+      new[c] = D * D
+      T[p_row] = new
+      for row in T:
+        for x in row:
+          if g == 1 or g == -1 :
+            break
+          if x != 0 :
+            g = gcd(g, x)
+      g = abs(g)
+      if g != 1 :
+        for i, row in enumerate(T):
+          T[i] = [x // g for x in row]
+      D = D * p // g
+    if D < 0 :
+      for i, row in enumerate(T):
+        T[i] = [-x for x in row]
+      D = -D
+    self.D = D
+    if D == 1 :
+      self.bareiss = True
+    self.changed()
+
+    # And switch the lists of indices.
+    self.basic_indices[p_row]    = entering_var
+    self.nonbasic_indices[p_col] = leaving_var
+
+    return Fraction(T[self.m][0], D)
+
+  def auxiliarize (self): # Convert to auxiliary dictionary
+    m = self.m ; T = self.T
+    for row in T[:m]:
+      row.append(self.D) # x0 has coefficient 1 everywhere.
+    self.nonbasic_indices.append(0)
+    T[m+1] = T[m] + [0]
+    T[m]   = [0]*(self.n+1) + [-self.D]
+    self.n += 1
+    self.large_value += 1
+    self.changed()
+
+  def unauxiliarize (self): # Convert back to regular form.
+    m = self.m ; T = self.T
+    c0 = self.nonbasic_indices.index(0) + 1
+    for row in T[:m]:
+      del row[c0]
+    del T[m+1][c0]
+    T[m]   = T[m+1]
+    T[m+1] = [0]*self.n
+    self.nonbasic_indices.remove(0)
+    self.n -= 1
+    self.large_value -= 1
+    self.changed()
+
+  def complement (self, var):
+    """ Switch var between x and u - x. With an integral u, the entries stay minors, see doc_str. """
+    u = to_fraction(self.upper[var])
+    if u.denominator != 1 :
+      return on_lists(lpdict.complement)(self, var)
+    u = u.numerator
+    T = self.T
+    if var in self.nonbasic_indices :
+      c = self.nonbasic_indices.index(var) + 1
+      for row in T: # including both objective rows.
+        row[0] += row[c] * u
+        row[c]  = -row[c]
+    else :
+      i = self.basic_indices.index(var)
+      T[i] = [u * self.D - T[i][0]] + [-x for x in T[i][1:]]
+    self.complemented ^= set([var])
+    self.changed()
+
+  def first_aux_pivot (self):
+    ev = 0
+    i  = min(range(self.m), key=lambda i: self.T[i][0]) # row with the smallest b value, the first of ties.
+    self.pivot(ev, self.basic_indices[i])
+
+  def find_dual_leaving_variable (self):
+    cands = [var for var, row in izip(self.basic_indices, self.T) if row[0] < 0]
+    if not cands :
+      return "FINAL"
+    return min(cands)
+
+  def find_dual_entering_variable (self, leaving_var):
+    """ Dual ratio test, on -z_j / a_j for a_j > 0, by cross multiplication. """
+    row  = self.T[self.basic_indices.index(leaving_var)]
+    zrow = self.T[self.m]
+    entering_var = None
+    for j in range(1, self.n+1):
+      a = row[j]
+      if a > 0 :
+        z   = -zrow[j]
+        var = self.nonbasic_indices[j-1]
+        if entering_var is None or z * best_a < best_z * a or z * best_a == best_z * a and var < entering_var :
+          entering_var = var
+          best_z = z ; best_a = a
+    if entering_var is None :
+      return "INFEASIBLE" # leaving_var can never be made >= 0.
+    return entering_var
+
+  def is_feasible (self):
+    if self.upper :
+      return lpdict.is_feasible(self)
+    return all(row[0] >= 0 for row in self.T[:self.m])
+
+  def is_degenerate (self):
+    return self.m > 0 and min(row[0] for row in self.T[:self.m]) == 0
+
+  def is_integral (self):
+    """ Is the current dictionary integral in all variable values. """
+    D = self.D
+    return all(row[0] % D == 0 for row in self.T[:self.m])
+
+  def add_ilp_cut (self, k, use_z):
+    """ k is the row based on which we need to add a cut. The cut is over the same D. """
+    D = self.D
+    if use_z:
+      src = self.T[self.m]
+    else :
+      assert k < self.m
+      src = self.T[k]
+    assert src[0] % D != 0
+    return self.add_int_row([-(src[0] % D)] + [-x % D for x in src[1:]])
+
+  def add_row (self, new_b_val, new_A_row):
+    """ The values can be any numbers. D grows to a multiple of their denominators, if needed. """
+    row = [to_fraction(x) for x in [new_b_val] + list(new_A_row)]
+    L = 1
+    for x in row:
+      L = lcm(L, x.denominator)
+    s = L // gcd(self.D, L)
+    if s != 1 :
+      self.T = [[x * s for x in trow] for trow in self.T]
+      self.D = self.D * s
+    D = self.D
+    return self.add_int_row([x.numerator * (D // x.denominator) for x in row])
+
+  def add_int_row (self, row):
+    """ add_row for a row that is already over D. """
+    new_var_num = self.next_var
+    self.basic_indices.append(new_var_num)
+    self.T.insert(self.m, row)
+    self.m += 1
+    self.next_var    += 1
+    self.large_value += 1
+    self.bareiss = False
+    self.changed()
+    return new_var_num
+
+  def remove_row (self, k):
+    """ Dropping the row of a basic variable keeps the entries minors, so bareiss stays as it is. """
+    del self.basic_indices[k]
+    del self.T[k]
+    self.m -= 1
+    self.changed()
+
+  def add_all_ilp_cuts (self):
+    """ Returns the number of cuts added. """
+    if self.cut_pool is not None : # selected cuts only, see cutpool.py
+      return self.cut_pool.add_cuts(self)
+    D = self.D
+    rows = [i for i in range(self.m) if self.T[i][0] % D != 0]
+    for i in rows:
+      self.add_ilp_cut(i, False)
+    return len(rows)
+
+  __str__             = on_lists(lpdict.__str__)
+  bounded_auxiliarize = on_lists(lpdict.bounded_auxiliarize)
+  shift               = on_lists(lpdict.shift)
+  dualize             = on_lists(lpdict.dualize)
+
+# Benchmark of the ways to do the arithmetic : (name, storage, use_fractions).
+modes = [("float", "list", False), ("fractions", "list", True), ("exact", "exact", False)]
+
+def run_mode (fname, part, storage, fractions_mode):
+  """ Solve fname in one mode. Returns (seconds, result). """
+  lpdict_module.set_use_fractions(fractions_mode)
+  try :
+    lpd = lpdict_module.new_lpdict(storage)
+    lpd.init_from_file(fname)
+    t0 = time.time()
+    if part == 4 :
+      z = lpd.solve_ilp()
+    else :
+      z = lpd.solve_lp()
+    secs = time.time() - t0
+  finally :
+    lpdict_module.set_use_fractions(False)
+  if part != 4 and not isinstance(z, str) :
+    z = (z, lpd.variable_values())
+  return secs, z
+
+def main(argv=None):
+  """ Benchmark : time of float, use_fractions and exact storage on each file, and if exact agrees with use_fractions. """
+  if argv is None:
+    argv = sys.argv
+
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('lpdicts', nargs='+', help='lpdictionary files')
+  input_parser.add_argument('-part'  , default=4, type=int, choices=[123, 4], help='123 : solve_lp, 4 : solve_ilp')
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+
+  print "%-40s %10s %10s %10s %8s %6s" % ("file", "float(s)", "frac(s)", "exact(s)", "speedup", "same")
+  totals = [0.0] * len(modes)
+  for fname in args.lpdicts:
+    times = [] ; results = []
+    for name, storage, fractions_mode in modes:
+      secs, z = run_mode(fname, args.part, storage, fractions_mode)
+      times.append(secs)
+      results.append(z)
+    totals = [t + s for t, s in zip(totals, times)]
+    print "%-40s %10.3f %10.3f %10.3f %8.2f %6s" % (fname[-40:], times[0], times[1], times[2],
+                                                    times[1] / max(times[2], 1e-9), results[1] == results[2])
+  print "%-40s %10.3f %10.3f %10.3f %8.2f" % ("total", totals[0], totals[1], totals[2], totals[1] / max(totals[2], 1e-9))
+
+if __name__ == "__main__":
+  sys.exit(main())
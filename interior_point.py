@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+doc_str = """
+ This file implements a primal-dual interior point solver for the problem held in an lpdict, with a
+ crossover to an optimal basic dictionary.
+ As in revised_simplex.py, the dictionary  x_B = b + A x_N  is read as the equality system  M x = b
+ with M = [ I | -A ] over all m+n variables, x >= 0, and the objective is  max  z_0 + c^T x.
+ Mehrotra's predictor-corrector method steps through the interior of x >= 0 : each iteration solves the
+ normal equations  M D M^T dy = r  twice with one Cholesky factorization of the m x m matrix
+ M D M^T = D_B + A D_N A^T, for the affine (predictor) direction and then for the centered and
+ corrected one. The number of iterations hardly grows with the size of the problem, and each one is a
+ few dense numpy products, where the simplex needs more pivots of O(m n) each as the problem grows.
+ The crossover then picks a basis from the interior solution : the columns in order of x_j / (x_j + s_j),
+ largest first (the variables that are well away from 0 at the optimum), skipping the ones that are
+ dependent on those before. The dictionary of that basis is written back into the lpdict as the
+ revised simplex does, and if round-off or a degenerate optimum left it short of final, the simplex
+ (or dual simplex) of the dictionary pivots it the rest of the way. So solve_lp ends with a final
+ basic dictionary either way, and variable_values, add_ilp_cut and solve_ilp keep working as usual.
+ An infeasible or unbounded problem has no optimum to converge to : the iterates then grow without
+ bound or stall, and the dictionary, still untouched, is solved with the simplex instead, which tells
+ which it is. The iterations, crossover pivots and those fallbacks go into the lp_stats of the lpdict.
+"""
+
+import numpy as np
+from   revised_simplex import revised_simplex
+
+# Relative primal and dual infeasibility and duality gap at which the interior point solve is done.
+tolerance      = 1e-8
+# Iterations before giving up, and falling back to the simplex.
+max_iterations = 100
+# Iterates larger than this (relative to the data) mean an infeasible or unbounded problem.
+divergence     = 1e10
+# Fraction of the step to the boundary of x, s >= 0 that is taken.
+step_fraction  = 0.9995
+
+class interior_point:
+  def __init__ (self, lpd):
+    self.lpd = lpd
+    self.m   = lpd.m
+    self.n   = lpd.n
+    self.rs  = revised_simplex(lpd) # the problem as M x = b, and the write back of the basis.
+    self.A0  = self.rs.A0
+
+  def times_M (self, x):
+    """ M x. """
+    return x[:self.m] - np.dot(self.A0, x[self.m:])
+
+  def times_MT (self, y):
+    """ M^T y. """
+    return np.concatenate((y, -np.dot(y, self.A0)))
+
+  def normal_solver (self, d):
+    """ A solver of the normal equations M D M^T v = r, for D = diag(d). """
+    m = self.m
+    K = np.dot(self.A0 * d[m:], self.A0.T)
+    K[np.diag_indices(m)] += d[:m]
+    reg = 0.0
+    while True :
+      try :
+        L = np.linalg.cholesky(K)
+        break
+      except np.linalg.LinAlgError : # close to singular near the optimum, regularize.
+        reg = max(1e-12, 10 * reg) * max(1.0, K.diagonal().max())
+        K[np.diag_indices(m)] += reg
+    def solve (r):
+      return np.linalg.solve(L.T, np.linalg.solve(L, r))
+    return solve
+
+  def direction (self, solve, x, s, d, rp, rd, rc):
+    """ The Newton direction for M dx = rp, M^T dy + ds = rd, S dx + X ds = rc. """
+    dy = solve(rp - self.times_M(rc / s - d * rd))
+    ds = rd - self.times_MT(dy)
+    dx = (rc - x * ds) / s
+    return dx, dy, ds
+
+  def run (self, b, c):
+    """ min c^T x with M x = b, x >= 0, from Mehrotra's starting point. Returns (x, y, s), or None if it does not
+        converge : infeasible, unbounded or too hard. "LIMIT" at the limit of the lpdict. """
+    lpd   = self.lpd
+    limit = lpd.limit
+    N     = self.m + self.n
+    solve = self.normal_solver(np.ones(N))
+    x = self.times_MT(solve(b))
+    y = solve(self.times_M(c))
+    s = c - self.times_MT(y)
+    x += max(-1.5 * x.min(), 0) ; s += max(-1.5 * s.min(), 0)
+    if np.dot(x, s) <= 0 : # e.g. a zero objective, which leaves s = 0.
+      x += 1 ; s += 1
+    xs = np.dot(x, s)
+    x += 0.5 * xs / s.sum() ; s += 0.5 * xs / x.sum()
+    scale = 1 + max(np.abs(b).max(), np.abs(c).max())
+    for it in range(max_iterations):
+      if limit is not None and limit.reached() :
+        return "LIMIT"
+      rp = b - self.times_M(x)
+      rd = c - self.times_MT(y) - s
+      mu = np.dot(x, s) / N
+      gap = abs(np.dot(c, x) - np.dot(b, y)) / (1 + abs(np.dot(c, x)))
+      if (np.linalg.norm(rp) / (1 + np.linalg.norm(b)) < tolerance and
+          np.linalg.norm(rd) / (1 + np.linalg.norm(c)) < tolerance and gap < tolerance) :
+        return x, y, s
+      if not np.isfinite(mu) or max(np.abs(x).max(), np.abs(y).max()) > divergence * scale :
+        return None
+      lpd.lp_stats["ipm_iterations"] += 1
+
+      d     = x / s
+      solve = self.normal_solver(d)
+      # Predictor : the affine scaling direction, and how far it gets to x s = 0.
+      dx, dy, ds = self.direction(solve, x, s, d, rp, rd, -x * s)
+      ap = self.step(x, dx, 1.0) ; ad = self.step(s, ds, 1.0)
+      sigma = (np.dot(x + ap * dx, s + ad * ds) / N / mu) ** 3
+      # Corrector : centered by sigma, and with the second order term of the predictor.
+      dx, dy, ds = self.direction(solve, x, s, d, rp, rd, sigma * mu - x * s - dx * ds)
+      ap = self.step(x, dx, step_fraction) ; ad = self.step(s, ds, step_fraction)
+      x = x + ap * dx ; y = y + ad * dy ; s = s + ad * ds
+    return None
+
+  def step (self, v, dv, fraction):
+    """ The step along dv that keeps v > 0, up to 1. """
+    neg = dv < 0
+    if not neg.any() :
+      return 1.0
+    return min(1.0, fraction * (-v[neg] / dv[neg]).min())
+
+  def crossover_basis (self, x, s):
+    """ The positions of m independent columns of M, those with the largest x_j / (x_j + s_j) first. """
+    rs = self.rs
+    m  = self.m
+    order = sorted(range(m + self.n), key=lambda p: (-x[p] / (x[p] + s[p]), rs.vars[p]))
+    Q = np.zeros((m, m)) # orthonormal basis of the span of the columns picked so far.
+    basis = []
+    for p in order:
+      col = rs.column(p)
+      k   = len(basis)
+      r   = col - np.dot(Q[:,:k], np.dot(Q[:,:k].T, col))
+      r  -= np.dot(Q[:,:k], np.dot(Q[:,:k].T, r)) # again, for round-off.
+      norm = np.linalg.norm(r)
+      if norm > 1e-7 * np.linalg.norm(col) :
+        Q[:,k] = r / norm
+        basis.append(p)
+        if len(basis) == m :
+          break
+    return basis
+
+  def place (self, basis):
+    """ Put the positions of basis into the rows of the revised simplex, as the pivots of lpdict.warm_start would :
+        the basic variables that stay basic keep their rows, and the nonbasic ones their columns. Each entering
+        variable, by variable index, takes the row of the leaving one with the largest pivot in its column. """
+    rs = self.rs
+    m  = self.m
+    entering = sorted((p for p in basis if p >= m), key=lambda p: rs.vars[p])
+    leaving  = sorted(set(range(m)) - set(basis))
+    C = -self.A0[leaving][:, [p - m for p in entering]] # the entering columns in the leaving rows.
+    rows = {} ; cols = {}
+    free = range(len(leaving))
+    for j, p in enumerate(entering):
+      r = max(free, key=lambda i: abs(C[i,j]))
+      free.remove(r)
+      rows[leaving[r]] = p ; cols[p] = leaving[r]
+      C -= np.outer(C[:,j] / C[r,j], C[r]) * (np.arange(len(leaving)) != r)[:,None]
+    rs.basis    = [rows.get(p, p) for p in range(m)]
+    rs.nonbasic = [cols.get(p, p) for p in range(m, m + self.n)]
+
+  def solve_lp (self):
+    """ Same results as lpdict.solve_lp, with the final dictionary written back to the lpdict. """
+    lpd = self.lpd
+    rs  = self.rs
+    if self.m == 0 or self.n == 0 :
+      return lpd.simplex_lp()
+    rv = self.run(rs.b0, -rs.cost)
+    if rv == "LIMIT" :
+      return rv
+    if rv is None : # no optimum, or no convergence : the simplex tells which.
+      lpd.lp_stats["ipm_fallbacks"] += 1
+      return lpd.simplex_lp()
+
+    x, y, s = rv
+    self.place(self.crossover_basis(x, s))
+    rs.write_back()
+    # Clean up with simplex pivots, if the basis is not quite optimal.
+    stats  = lpd.lp_stats
+    pivots = stats["pivots"] + stats["dual_pivots"]
+    if lpd.is_feasible() :
+      rv = lpd.run_simplex()
+    elif lpd.is_dual_feasible() :
+      rv = lpd.run_dual_simplex()
+    else :
+      rv = lpd.simplex_lp()
+    stats["crossover_pivots"] += stats["pivots"] + stats["dual_pivots"] - pivots
+    return rv
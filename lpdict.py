@@ -9,6 +9,11 @@ doc_str = """
 import math
 from   numbers import Number
 import fractions
+import copy
+import random
+import time
+import json
+import StringIO
 
 # Using fractions is so clean, but it is also 5x - 10x slower. Hence we have an option to control its usage.
 # If we are using fractions, we don't need epsilon comparisons, since everything is precise.
@@ -17,22 +22,78 @@ use_fractions = False
 
 # 2 ways of doing ILP. Using dual is 1x - 2x faster. Significant speedup only for large problems.
 use_dual_for_ilp = True
+# With use_dual_for_ilp, re-optimize after each round of cuts with the dual simplex method directly on
+# the dictionary, which is still dual feasible, instead of dualize + solve_lp + undualize.
+use_dual_simplex = True
 
-# Many different ways of picking entering variables. 
-# The rules other than blands_rule are not fully debugged.
+# ILP methods for solve_ilp.
+# cuts : Gomory cutting planes only.
+# bb   : branch-and-bound, see branch_and_bound.py
+# bc   : branch-and-cut, i.e. a few rounds of cuts at the root and then branch-and-bound.
+ilp_method  = "cuts"
+ilp_methods = ["cuts", "bb", "bc"]
+
+# Manage the Gomory cuts with a cut pool (selection, aging and removal), see cutpool.py
+use_cut_pool = False
+
+# Without the cut pool : rows whose value is within cut_min_frac of an integer get no Gomory cut, as its
+# fractional part is round-off, and such a cut can cut off integral points. And once the cuts have added more
+# than max_cut_rows rows, solve_ilp gives up on them for branch-and-bound, see branch_after_cuts.
+cut_min_frac = 1e-6
+max_cut_rows = 2000
+
+# Anti-degeneracy for run_simplex. After perturb_after pivots in a row without a change in the objective,
+# b_values is perturbed by small random amounts (relative size perturb_size), so that ties in the ratio
+# test go away. The perturbation is removed once run_simplex stops, with dual simplex cleanup pivots
+# if that leaves the dictionary infeasible. See perturb.
+use_perturbation = False
+perturb_after    = 25
+perturb_size     = fractions.Fraction(1, 10**6)
+perturb_seed     = 0
+
+# Many different ways of picking entering variables : blands_rule, largest_coeff, largest_step, devex
+# and steepest_edge. Each dictionary has its own pricing object, see pricing.py. These are the defaults.
 e_selector = "blands_rule"
-#e_selector = "largest_coeff"
-#e_selector = "largest_step"
 
 l_selector = "blands_rule"
 #l_selector = "opp_blands_rule"
 
+# Storage backends for the dictionary. Chosen per instance, see new_lpdict.
+# list  : plain python lists, works with fractions.
+# numpy  : one contiguous float64 array, vectorized pivots. See dense_lpdict.py
+# sparse : rows of A hold only their nonzeros, for 0/1 systems like sudoku. See sparse_lpdict.py
+# exact  : integers over a common denominator, exact like use_fractions but faster. See exact_lpdict.py
+storage_backends = ["list", "numpy", "sparse", "exact"]
+
+# The start of a dictionary file in the binary format, see binary_dict.py
+binary_magic = "LPDICTB1"
+
+# Ways of solving an LP in solve_lp.
+# dictionary : pivot the whole dictionary every step.
+# revised    : revised simplex on a factored basis, needs numpy. See revised_simplex.py
+# interior   : primal-dual interior point, then crossover to a basis, needs numpy. See interior_point.py
+lp_method = "dictionary"
+lp_methods = ["dictionary", "revised", "interior"]
+
 one = fractions.Fraction(1.0) if use_fractions else 1.0
 
 # epsilon comparisons
 # Ignore differences smaller than epsilon.
 # Centralize the code here.
 epsilon = fractions.Fraction(1e-10) if use_fractions else 1e-10
+# Smallest pivot element that the ratio test for upper bounds accepts. The long degenerate runs that
+# equality rows produce otherwise end up pivoting on round-off.
+pivot_tolerance = 0 if use_fractions else 1e-9
+
+def set_use_fractions (flag):
+  """ Switch use_fractions at run time, e.g. for a benchmark, along with the values that depend on it.
+      Modules that imported one or epsilon by name keep the old values. """
+  global use_fractions, one, epsilon, pivot_tolerance
+  use_fractions   = flag
+  one             = fractions.Fraction(1.0) if use_fractions else 1.0
+  epsilon         = fractions.Fraction(1e-10) if use_fractions else 1e-10
+  pivot_tolerance = 0 if use_fractions else 1e-9
+
 def eps_cmp_lt(a,b):
   if use_fractions :
     rv = ( (a) <  (b) )
@@ -41,7 +102,7 @@ def eps_cmp_lt(a,b):
   return rv
 def eps_cmp_eq(a,b):
   if use_fractions :
-    rv = ( (a) <= (b) )
+    rv = ( (a) == (b) )
   else :
     rv = ( ((a) - epsilon) <= (b) < ((a) + epsilon) )
   return rv
@@ -56,15 +117,21 @@ def eps_cmp_ne(a,b):
   return not eps_cmp_eq(a,b)
 
 def is_integer(n):
-  if use_fractions :
+  if use_fractions or isinstance(n, fractions.Fraction) : # Fractions also come from the exact storage.
     rv = ( (n) == round(n) )
   else :
     rv = eps_cmp_eq(n, round(n))
   return rv
 
+def is_near_integer(n):
+  """ A float within cut_min_frac of an integer. Never a Fraction, whose fractional part is exact. """
+  if use_fractions or isinstance(n, fractions.Fraction) :
+    return False
+  return abs(n - round(n)) < cut_min_frac
+
 def frac(n):
   """ positive fractional part of n """
-  if use_fractions :
+  if use_fractions or isinstance(n, fractions.Fraction) :
     return (n - fractions.Fraction(math.floor(n)))
   else :
     return (n - math.floor(n))
@@ -90,7 +157,11 @@ def convert_to_num(s):
     return s
 
 def line_to_num_list(fh, sep=None):
-  return map(convert_to_num, fh.readline().split(sep))
+  tokens = fh.readline().split(sep)
+  try :
+    return [int(s, 0) for s in tokens] # all integers, the common case, without an exception per token.
+  except ValueError :
+    return map(convert_to_num, tokens)
 
 def table_to_str(table):
   str_table = [map(str,x) for x in table]
@@ -119,7 +190,104 @@ def neg_transpose (A) :
   new_A = [[ -A[row][col] for row in range(0,ht) ] for col in range(0,wd) ]
   return new_A
 
+def new_lpdict (storage="list"):
+  """ Create an empty lpdict with the requested storage backend. """
+  assert storage in storage_backends, "Unknown storage backend " + str(storage)
+  if storage == "numpy":
+    from dense_lpdict import dense_lpdict # imported here, so that numpy is only needed if used.
+    return dense_lpdict()
+  if storage == "sparse":
+    from sparse_lpdict import sparse_lpdict
+    return sparse_lpdict()
+  if storage == "exact":
+    from exact_lpdict import exact_lpdict
+    return exact_lpdict()
+  return lpdict()
+
+def on_lists (method):
+  """ For the storage backends : run a base class method on plain list storage, then pack the result back.
+      Used for the operations that change the shape of the dictionary, which are rare compared to pivots.
+  """
+  def wrapper (self, *args, **kwargs):
+    if not self.packed : # already unpacked, e.g. add_ilp_cut called from add_all_ilp_cuts.
+      return method(self, *args, **kwargs)
+    self.unpack()
+    try :
+      rv = method(self, *args, **kwargs)
+    finally :
+      self.pack()
+    return rv
+  return wrapper
+
+class shared_stats (dict):
+  """ lp_stats and timers : shared by the copies of a dictionary, e.g. the branch-and-bound nodes, so that they
+      add up over the whole solve. """
+  def __deepcopy__ (self, memo):
+    return self
+
+  def add (self, other):
+    for key, value in other.items():
+      self[key] = self.get(key, 0) + value
+
+def new_lp_stats ():
+  return shared_stats(pivots=0, degenerate_pivots=0, phase1_pivots=0, dual_pivots=0, bound_flips=0, perturbations=0,
+                      cleanup_pivots=0, warm_start_pivots=0, cut_rounds=0, dualize_calls=0,
+                      ipm_iterations=0, crossover_pivots=0, ipm_fallbacks=0)
+
+def new_timers ():
+  """ Seconds spent in pricing (the entering variable, or the leaving one of the dual simplex), the ratio tests,
+      and the pivot updates (bound flips included), see lpdict.start_profile. """
+  return shared_stats(pricing=0.0, ratio_test=0.0, update=0.0)
+
+def stats_default (x):
+  """ For json.dumps of the statistics, which can hold Fractions. """
+  return float(x) if isinstance(x, Number) else str(x)
+
+def percentile (values, q):
+  """ The q quantile (0 <= q <= 1) of values, for the latency reports of solver_load.py and solve_sudoku.py. """
+  values = sorted(values)
+  return values[min(len(values) - 1, int(q * len(values)))]
+
+class solve_limit:
+  """ The budget of a solve, over all of its LPs : a deadline (a time.time()) and a number of pivots, either None
+      for no limit. The callback, if any, gets progress reports, see lpdict.report_progress. The dictionary
+      copies of branch-and-bound share the one limit, so that the pivots of every node count. """
+  def __init__ (self, deadline=None, max_pivots=None, callback=None):
+    self.deadline   = deadline
+    self.max_pivots = max_pivots
+    self.callback   = callback
+    self.pivots     = 0
+
+  def __deepcopy__ (self, memo):
+    return self
+
+  def reached (self):
+    if self.max_pivots is not None and self.pivots >= self.max_pivots :
+      return True
+    return self.deadline is not None and time.time() >= self.deadline
+
+def limited (method):
+  """ For the solve methods : their deadline, max_pivots and callback keyword arguments put a solve_limit on the
+      dictionary for the call. Without them, the limit of an enclosing call, if any, still holds. A solve that
+      runs out returns the status LIMIT (limit for solve_ilp), with the dictionary as far as it got.
+  """
+  def wrapper (self, *args, **kwargs):
+    limit = solve_limit(kwargs.pop("deadline", None), kwargs.pop("max_pivots", None), kwargs.pop("callback", None))
+    if limit.deadline is None and limit.max_pivots is None and limit.callback is None :
+      return method(self, *args, **kwargs)
+    outer = self.limit
+    self.limit = limit
+    try :
+      return method(self, *args, **kwargs)
+    finally :
+      self.limit = outer
+  wrapper.__name__ = method.__name__
+  wrapper.__doc__  = method.__doc__
+  return wrapper
+
 class lpdict:
+  storage = "list" # name of the storage backend, see new_lpdict.
+
   def __init__ (self):
     self.m                = 0
     self.n                = 0
@@ -130,6 +298,26 @@ class lpdict:
     self.z_coeffs         = []
     self.shdw_z_coeffs     = []
     self.large_value      = None
+    self.next_var         = 1    # index for the next variable added by add_row.
+    self.ilp_stats        = None
+    self.cut_pool         = None
+    self.postsolve        = None # maps variable_values back to the original problem, see presolve.py
+    self.solution         = None # (basic_indices, dictionary_values) from a result cache hit, see result_cache.py
+    self.upper            = {}   # var -> upper bound, for the variables that have one. See complement.
+    self.complemented     = set()
+    self.row_vars         = []   # the basic and nonbasic variables as given to init_fn, see dual_values.
+    self.column_vars      = []
+    self.perturbation     = None # var -> amount by which run_simplex raised it, see perturb.
+    self.limit            = None # solve_limit of the solve in progress, if it has one.
+    self.lp_stats         = new_lp_stats()
+    self.timers           = None # new_timers() once start_profile is called.
+    self.pivot_callbacks  = []   # callback(lpd, entering var, leaving var) after each simplex or dual simplex pivot.
+    import pricing
+    self.pricing          = pricing.new_pricing() # entering (and leaving) variable rules.
+
+  def copy (self):
+    """ An independent copy of the dictionary, e.g. to warm start a child problem from. """
+    return copy.deepcopy(self)
 
   # repr is the string form that could be used to recreate the object.
   #def __repr__ (self):
@@ -148,38 +336,64 @@ class lpdict:
     return table_to_str(table)
 
   def init_from_file (self,lpdict_filename):
-    with open(lpdict_filename, 'r') as fh:
-      m, n             = line_to_num_list(fh)
+    """ The dictionary file format, in text or binary (see binary_dict.py). """
+    with open(lpdict_filename, 'rb') as fh:
+      if fh.read(len(binary_magic)) == binary_magic :
+        import binary_dict # imported here, so that numpy is only needed if used.
+        binary_dict.load(self, lpdict_filename)
+        return
+      fh.seek(0)
+      self.init_from_lines(fh)
+
+  def init_from_string (self, text):
+    """ The dictionary file format, given as a string. """
+    if text.startswith(binary_magic) :
+      import binary_dict
+      binary_dict.read(self, text)
+      return
+    self.init_from_lines(StringIO.StringIO(text))
+
+  def init_from_lines (self, fh):
+    """ Read the dictionary file format from fh, anything with readline. """
+    m, n             = line_to_num_list(fh)
+
+    basic_indices    = line_to_num_list(fh)
+    nonbasic_indices = line_to_num_list(fh)
+    assert len(basic_indices)    == m
+    assert len(nonbasic_indices) == n
 
-      basic_indices    = line_to_num_list(fh)
-      nonbasic_indices = line_to_num_list(fh)
-      assert len(basic_indices)    == m
-      assert len(nonbasic_indices) == n
+    b_values         = line_to_num_list(fh)
+    assert len(b_values) == m
 
-      b_values         = line_to_num_list(fh)
-      assert len(b_values) == m
+    A = []
+    for i in range(int(m)):
+      l = line_to_num_list(fh)
+      assert len(l) == n
+      A.append(l)
 
-      A = []
-      for i in range(int(m)):
-        l = line_to_num_list(fh)
-        assert len(l) == n
-        A.append(l)
+    z_coeffs         = line_to_num_list(fh)
+    assert len(z_coeffs) == (n+1)
 
-      z_coeffs         = line_to_num_list(fh)
-      assert len(z_coeffs) == (n+1)
+    # assert that we reached end of file ?
 
-      # assert that we reached end of file ?
+    #print m, n
+    #print basic_indices
+    #print nonbasic_indices
+    #print b_values
+    #print A
+    #print z_coeffs
 
-      #print m, n
-      #print basic_indices
-      #print nonbasic_indices
-      #print b_values
-      #print A
-      #print z_coeffs
+    # Optional : upper bounds of the basic and then the nonbasic variables, inf for none.
+    # An upper bound of 0 on the slack variable of a row makes it an equality row.
+    upper = line_to_num_list(fh)
+    if upper :
+      assert len(upper) == m + n
+      upper = dict(zip(basic_indices + nonbasic_indices, upper))
 
-      self.init_fn (m,n,basic_indices,nonbasic_indices,b_values,A, z_coeffs)
+    self.init_fn (m,n,basic_indices,nonbasic_indices,b_values,A, z_coeffs, upper)
 
-  def init_fn (self,m,n,basic_indices,nonbasic_indices,b_values,A, z_coeffs):
+  def init_fn (self,m,n,basic_indices,nonbasic_indices,b_values,A, z_coeffs, upper=None):
+      """ upper is an optional {var : upper bound}. """
       self.m                = m               
       self.n                = n               
       self.basic_indices    = basic_indices   
@@ -188,46 +402,40 @@ class lpdict:
       self.A                = A               
       self.z_coeffs         = z_coeffs        
       self.shdw_z_coeffs    = [0]*(self.n+1)
-      self.large_value      = m + n + 10 # some value larger than all variable indices.
+      # Rows can be removed (see cutpool.py), so the indices need not be 1..m+n.
+      self.next_var         = max(list(basic_indices) + list(nonbasic_indices) + [0]) + 1
+      self.large_value      = self.next_var + 9 # some value larger than all variable indices.
+      self.upper            = dict((v, u) for v, u in (upper or {}).items() if u != float("inf"))
+      self.complemented     = set()
+      self.row_vars         = list(basic_indices)
+      self.column_vars      = list(nonbasic_indices)
+
+  def init_from_rows (self, m, n, basic_indices, nonbasic_indices, b_values, rows, z_coeffs, upper=None):
+    """ Like init_fn, with each row of A given as a {col : value} dict of its nonzeros, for models that are
+        built sparse, e.g. sudoku. The storages that can take them so do, see sparse_lpdict and dense_lpdict. """
+    A = []
+    for row in rows:
+      A_row = [0]*n
+      for j, v in row.items():
+        A_row[j] = v
+      A.append(A_row)
+    self.init_fn(m, n, basic_indices, nonbasic_indices, b_values, A, z_coeffs, upper)
 
   def find_entering_variable (self):
-    entering_var = self.large_value
-    metric       = -1
-    for i, zc in enumerate(self.z_coeffs[1:]):
-      var = self.nonbasic_indices[i]
-      if eps_cmp_gt(zc,0):
-        if e_selector == "largest_coeff":
-          if zc > metric:
-            entering_var = var
-            metric       = zc
-        elif e_selector == "largest_step":
-          lv,bound = self.find_leaving_variable(var, True)
-          if not isinstance(lv, Number) :
-            return lv
-          zchange = zc * bound
-          if zchange > metric :
-            entering_var = var
-            metric       = zchange
-        else: # elif e_selector == "blands_rule":
-          if var < entering_var:
-            entering_var = var
-    if entering_var == self.large_value:
-      return "FINAL"
-    return entering_var
+    return self.pricing.entering_variable(self)
 
   def find_leaving_variable (self, entering_var, return_bound=False):
     A_col = self.nonbasic_indices.index(entering_var)
     assert (self.z_coeffs[A_col+1] >= 0)
     leaving_var = self.large_value
     best_bound  = None
-    for i in range(self.m):
+    for i, a in self.column_entries(A_col):
       b = self.b_values[i]
-      a = self.A[i][A_col]
       if eps_cmp_lt(a,0):
         bound = -one * b / a
         if eps_cmp_ge(bound,0):
           var = self.basic_indices[i]
-          if l_selector == "opp_blands_rule":
+          if self.pricing.l_rule == "opp_blands_rule":
             if best_bound == None or eps_cmp_lt(bound, best_bound) or eps_cmp_eq(bound, best_bound) and (var == 0 or var > leaving_var and leaving_var != 0): 
               leaving_var = var
               best_bound = bound
@@ -244,9 +452,22 @@ class lpdict:
     else :
       return rv
 
+  def dense_A (self):
+    """ A as a list of dense rows, whatever the storage. """
+    return self.A
+
+  def column_entries (self, col):
+    """ (row, value) pairs for column col of A. Sparse storage only returns the nonzeros. """
+    return [(i, row[col]) for i, row in enumerate(self.A)]
+
+  def row_entries (self, row):
+    """ (column, value) pairs for row row of A. Sparse storage only returns the nonzeros. """
+    return enumerate(self.A[row])
+
   def pivot (self, entering_var, leaving_var):
     p_col = self.nonbasic_indices.index(entering_var)
     p_row = self.basic_indices.index(leaving_var)
+    self.pricing.update(self, p_row, p_col)
 
     A = self.A # short name.
     m = self.m
@@ -317,6 +538,8 @@ class lpdict:
     self.shdw_z_coeffs = [0]*(self.n+1)
   
   def dualize (self):
+    assert not self.upper, "dualize does not handle upper bounds"
+    self.lp_stats["dualize_calls"] += 1
     new_A = neg_transpose(self.A)
     new_b = [-x for x in self.z_coeffs[1:]]
     new_z = [-self.z_coeffs[0]] + [-x for x in self.b_values]
@@ -337,46 +560,392 @@ class lpdict:
     lv = self.basic_indices[self.b_values.index(min(self.b_values))] # var with smallest b value.
     self.pivot(ev,lv)
 
+  # Instrumentation : lp_stats always counts, while the timers and the pivot callbacks cost a test per step
+  # when they are off. With them on, the steps clock themselves with lap.
+
+  def start_profile (self):
+    """ Time the steps into self.timers from now on. """
+    if self.timers is None :
+      self.timers = new_timers()
+
+  def lap (self, timer, t0):
+    """ Add the time since t0 to timer, and return the time now, for the next one. """
+    t = time.time()
+    self.timers[timer] += t - t0
+    return t
+
+  def pivoted (self, ev, lv):
+    for callback in self.pivot_callbacks:
+      callback(self, ev, lv)
+
+  def stats_summary (self):
+    """ lp_stats, the timers if on, and ilp_stats if this was an ILP, as one dict. """
+    summary = { "lp" : dict(self.lp_stats), "storage" : self.storage, "pricing" : self.pricing.name,
+                "m" : self.m, "n" : self.n }
+    if self.timers is not None :
+      summary["seconds"] = dict(self.timers)
+    if self.ilp_stats is not None :
+      summary["ilp"] = self.ilp_stats
+    return summary
+
+  def write_stats (self, fh, as_json=False):
+    """ stats_summary to fh, as a JSON line or as text. """
+    summary = self.stats_summary()
+    if as_json :
+      print >> fh, json.dumps(summary, sort_keys=True, default=stats_default)
+      return
+    print >> fh, "%s storage, %s pricing, final %d x %d" % (summary["storage"], summary["pricing"], self.m, self.n)
+    print >> fh, "  " + "  ".join("%s %d" % (key, summary["lp"][key]) for key in sorted(summary["lp"]) if summary["lp"][key])
+    if "seconds" in summary :
+      print >> fh, "  seconds : " + "  ".join("%s %.4f" % (key, summary["seconds"][key]) for key in sorted(summary["seconds"]))
+    if "ilp" in summary :
+      print >> fh, "  ilp : " + json.dumps(summary["ilp"], sort_keys=True, default=stats_default)
+
   def simplex_step (self):
+    timers = self.timers
+    if timers is not None :
+      t = time.time()
     ev = self.find_entering_variable()
+    if timers is not None :
+      t = self.lap("pricing", t)
     if not isinstance(ev, Number) : # final
       return ev
 
+    if self.upper :
+      return self.bounded_simplex_step(ev)
+
     lv = self.find_leaving_variable(ev)
+    if timers is not None :
+      t = self.lap("ratio_test", t)
+    if not isinstance(lv, Number) : # unbounded
+      return lv
+
+    zn = self.pivot(ev,lv)
+    if timers is not None :
+      self.lap("update", t)
+    if self.pivot_callbacks :
+      self.pivoted(ev, lv)
+    return zn    # new objective value.
+
+  # Upper bounds.
+  # Every variable x is 0 <= x <= u, with u = inf for most. The dictionary is kept in terms of
+  # y = x, or y = u - x for the variables in self.complemented, so that a nonbasic variable at
+  # its upper bound is still at 0, and everything else about the dictionary stays the same.
+  # An equality row is a row whose slack variable has u = 0.
+
+  def complement (self, var):
+    """ Switch var between x and u - x. """
+    u = self.upper[var]
+    if var in self.nonbasic_indices :
+      j = self.nonbasic_indices.index(var)
+      for i, a in self.column_entries(j):
+        self.b_values[i] = self.b_values[i] + a * u
+        self.A[i][j]     = -a
+      for zrow in self.z_coeffs, self.shdw_z_coeffs:
+        if len(zrow) > 0:
+          zrow[0]   = zrow[0] + zrow[j+1] * u
+          zrow[j+1] = -zrow[j+1]
+    else :
+      i = self.basic_indices.index(var)
+      self.b_values[i] = u - self.b_values[i]
+      self.A[i]        = [-a for a in self.A[i]]
+    self.complemented ^= set([var])
+
+  def complement_above_upper (self):
+    """ Complement the basic variables that are above their upper bound, so that they are below 0 instead. """
+    for i, var in enumerate(self.basic_indices):
+      if var in self.upper and eps_cmp_gt(self.b_values[i], self.upper[var]):
+        self.complement(var)
+
+  def find_bounded_leaving_variable (self, entering_var):
+    """ Ratio test when some variables have upper bounds. Returns (leaving var, at_upper).
+        The leaving var is the first one to reach a bound as entering_var increases, Bland's rule among ties.
+        It is entering_var itself if that reaches its own upper bound first (a bound flip).
+        at_upper is True if the leaving var stops at its upper bound rather than at 0. """
+    A_col = self.nonbasic_indices.index(entering_var)
+    leaving_var = entering_var
+    best_bound  = self.upper.get(entering_var)
+    at_upper    = True
+    for i, a in self.column_entries(A_col):
+      b   = self.b_values[i]
+      var = self.basic_indices[i]
+      if a < -pivot_tolerance :
+        bound = -one * b / a
+        up    = False
+      elif a > pivot_tolerance and var in self.upper :
+        bound = one * (self.upper[var] - b) / a
+        up    = True
+      else :
+        continue
+      if best_bound == None or eps_cmp_lt(bound, best_bound) or eps_cmp_eq(bound, best_bound) and var < leaving_var:
+        leaving_var = var
+        best_bound  = bound
+        at_upper    = up
+    if best_bound == None :
+      return ("UNBOUNDED", False)
+    return (leaving_var, at_upper)
+
+  def bounded_simplex_step (self, ev):
+    timers = self.timers
+    if timers is not None :
+      t = time.time()
+    lv, at_upper = self.find_bounded_leaving_variable(ev)
+    if timers is not None :
+      t = self.lap("ratio_test", t)
     if not isinstance(lv, Number) : # unbounded
       return lv
+    if lv == ev : # bound flip, no pivot needed.
+      self.complement(ev)
+      self.lp_stats["bound_flips"] += 1
+      zn = self.z_coeffs[0]
+    else :
+      if at_upper : # leave at 0 as u - x instead.
+        self.complement(lv)
+      zn = self.pivot(ev,lv)
+    if timers is not None :
+      self.lap("update", t)
+    if self.pivot_callbacks :
+      self.pivoted(ev, lv)
+    return zn
+
+  def bounded_auxiliarize (self):
+    """ Auxiliary dictionary for when some variables have upper bounds.
+        With x0 = 1 the rows become feasible : x_B = b + A x_N + d x0, d_i = -b_i for the rows with b_i < 0.
+        x0 is in [0,1] and starts at 1, i.e. complemented. The aux objective is -x0. """
+    for i in range(self.m):
+      b = self.b_values[i]
+      if eps_cmp_lt(b,0) :
+        self.A[i].append(b) # -d_i for x0' = 1 - x0
+        self.b_values[i] = 0
+      else :
+        self.A[i].append(0)
+    self.nonbasic_indices.append(0)
+    self.z_coeffs.append(0)
+    self.shdw_z_coeffs = self.z_coeffs
+    self.z_coeffs = [-1] + [0]*(self.n) + [1]
+    self.n += 1
+    self.large_value += 1
+    self.upper[0] = 1
+    self.complemented.add(0)
+
+  def end_bounded_aux (self):
+    """ Make x0 a nonbasic variable at 0 without a bound, so that unauxiliarize can drop it. """
+    if 0 in self.complemented :
+      self.complement(0)
+    self.pivot_out_x0()
+    del self.upper[0]
+
+  def pivot_out_x0 (self):
+    """ At the end of a feasible auxiliary problem, x0 can still be basic at 0. Pivot it out. """
+    if 0 in self.basic_indices : # degenerate, x0 is basic at 0.
+      row   = self.basic_indices.index(0)
+      cands = [self.nonbasic_indices[j] for j, a in self.row_entries(row) if eps_cmp_ne(a,0)]
+      assert cands, "x0 is basic in an all zero row"
+      self.pivot(min(cands), 0)
+
+  def find_dual_leaving_variable (self):
+    """ Dual simplex : a basic variable with a negative value leaves. Bland's rule among those. """
+    leaving_var = self.large_value
+    for i, b in enumerate(self.b_values):
+      if eps_cmp_lt(b,0):
+        var = self.basic_indices[i]
+        if var < leaving_var:
+          leaving_var = var
+    if leaving_var == self.large_value:
+      return "FINAL"
+    return leaving_var
+
+  def find_dual_entering_variable (self, leaving_var):
+    """ Dual ratio test : keep all the z_coeffs <= 0. """
+    A_row = self.basic_indices.index(leaving_var)
+    entering_var = self.large_value
+    best_ratio   = None
+    for i, a in self.row_entries(A_row):
+      if eps_cmp_gt(a,0):
+        ratio = -one * self.z_coeffs[i+1] / a
+        var   = self.nonbasic_indices[i]
+        if best_ratio == None or eps_cmp_lt(ratio, best_ratio) or eps_cmp_eq(ratio, best_ratio) and var < entering_var:
+          entering_var = var
+          best_ratio   = ratio
+    if best_ratio == None :
+      return "INFEASIBLE" # leaving_var can never be made >= 0.
+    return entering_var
+
+  def dual_simplex_step (self):
+    if self.upper :
+      self.complement_above_upper()
+    timers = self.timers
+    if timers is not None :
+      t = time.time()
+    lv = self.find_dual_leaving_variable()
+    if timers is not None :
+      t = self.lap("pricing", t)
+    if not isinstance(lv, Number) : # final
+      return lv
+
+    ev = self.find_dual_entering_variable(lv)
+    if timers is not None :
+      t = self.lap("ratio_test", t)
+    if not isinstance(ev, Number) : # infeasible
+      return ev
 
     zn = self.pivot(ev,lv)
-    #print ev, "enters", lv, "leaves"
+    if timers is not None :
+      self.lap("update", t)
+    if self.pivot_callbacks :
+      self.pivoted(ev, lv)
     return zn    # new objective value.
 
+  def run_dual_simplex(self):
+    """ Pivot from a dual feasible dictionary (all z_coeffs <= 0) till it is also primal feasible."""
+    limit = self.limit
+    while True :
+      if limit is not None and limit.reached() :
+        return "LIMIT"
+      srv = self.dual_simplex_step()
+      if not isinstance(srv, Number) : # final or infeasible
+        if srv == "FINAL":
+          return self.z_coeffs[0]
+        else :
+          return srv
+      self.lp_stats["dual_pivots"] += 1
+      if limit is not None :
+        limit.pivots += 1
+
+  def is_dual_feasible (self):
+    for zc in self.z_coeffs[1:]:
+      if eps_cmp_gt(zc, 0):
+        return False
+    return True
+
   def run_simplex(self):
     """ Pivot till we reach a final dictionary or hit a problem"""
-    count = 0
+    stats  = self.lp_stats
+    limit  = self.limit
+    last_z = self.z_coeffs[0]
+    stalls = 0
     while True :
-      #print self
+      if limit is not None and limit.reached() :
+        if self.perturbation : # undone, without the cleanup pivots.
+          self.shift(self.perturbation)
+          self.perturbation = None
+        return "LIMIT"
       srv = self.simplex_step()
-      count += 1
-      #if count % 10 == 0:
-      #  print self.z_coeffs[0]
       if not isinstance(srv, Number) : # final or unbounded
-        #print self
+        if self.perturbation :
+          srv = self.remove_perturbation(srv)
         if srv == "FINAL":
           return self.z_coeffs[0]
         else :
           return srv
+      stats["pivots"] += 1
+      if limit is not None :
+        limit.pivots += 1
+      if eps_cmp_eq(srv, last_z) : # degenerate, no progress.
+        stats["degenerate_pivots"] += 1
+        stalls += 1
+        if use_perturbation and stalls >= perturb_after and not self.perturbation and not self.upper :
+          self.perturb()
+      else :
+        stalls = 0
+      last_z = srv
+
+  run_simplex = limited(run_simplex)
+
+  def shift (self, deltas):
+    """ Rewrite the dictionary in the variables var - d, for the {var : d} deltas, i.e. substitute var + d for
+        each var. The objective coefficients do not change. """
+    for var, d in deltas.items():
+      if var in self.nonbasic_indices :
+        j = self.nonbasic_indices.index(var)
+        for i, a in self.column_entries(j):
+          self.b_values[i] = self.b_values[i] + a * d
+        for zrow in self.z_coeffs, self.shdw_z_coeffs:
+          if len(zrow) > 0:
+            zrow[0] = zrow[0] + zrow[j+1] * d
+      else :
+        i = self.basic_indices.index(var)
+        self.b_values[i] = self.b_values[i] - d
+
+  def perturb (self):
+    """ Raise every b_i by a small random amount. Then no ratio test ties are left, except by chance.
+        The basic variables are shifted, so that remove_perturbation can undo it by shifting them back,
+        wherever they are in the dictionary by then. """
+    rng = random.Random(perturb_seed + self.lp_stats["perturbations"])
+    deltas = {}
+    for var, b in zip(self.basic_indices, self.b_values):
+      d = (1 + abs(b)) * perturb_size * fractions.Fraction(rng.randint(50, 100), 100)
+      deltas[var] = d if use_fractions or isinstance(b, fractions.Fraction) else float(d)
+    self.shift(dict((var, -d) for var, d in deltas.items()))
+    self.perturbation = deltas
+    self.lp_stats["perturbations"] += 1
+
+  def remove_perturbation (self, srv):
+    """ Undo perturb at the end of run_simplex, whose result was srv. A final dictionary stays dual
+        feasible, so dual simplex pivots make it primal feasible again. """
+    self.shift(self.perturbation)
+    self.perturbation = None
+    if srv != "FINAL" or self.is_feasible() :
+      return srv
+    while True :
+      srv = self.dual_simplex_step()
+      if not isinstance(srv, Number) :
+        return srv
+      self.lp_stats["cleanup_pivots"] += 1
+
+  def export_basis (self):
+    """ The basis of a (solved) dictionary, to warm_start a related problem with. """
+    return { "basic"        : list(self.basic_indices),
+             "nonbasic"     : list(self.nonbasic_indices),
+             "complemented" : sorted(self.complemented) }
+
+  def warm_start (self, basis):
+    """ Rebuild the dictionary for basis, from export_basis of a dictionary with the same variables, e.g.
+        this problem with other b_values or z_coeffs. Each basic variable of basis that is not yet basic
+        is pivoted in, for the largest pivot in its column, without any pricing or ratio tests.
+        Returns False if some pivot is 0, i.e. basis is not a basis here. The dictionary is then left
+        part of the way. """
+    assert set(basis["basic"]) <= set(self.basic_indices + self.nonbasic_indices), "warm_start needs the same variables"
+    for var in set(basis["complemented"]) ^ self.complemented :
+      self.complement(var)
+    target = set(basis["basic"])
+    for var in basis["basic"]:
+      if var in self.nonbasic_indices :
+        j = self.nonbasic_indices.index(var)
+        cands = [(abs(a), self.basic_indices[i]) for i, a in self.column_entries(j)
+                 if self.basic_indices[i] not in target and eps_cmp_ne(a, 0)]
+        if not cands :
+          return False
+        self.pivot(var, max(cands)[1])
+        self.lp_stats["warm_start_pivots"] += 1
+    return True
+
+  def reoptimize (self, basis=None):
+    """ solve_lp from the current basis, or from basis (see warm_start). The primal simplex if the basis is
+        still primal feasible (e.g. only z_coeffs changed), the dual simplex if it is still dual feasible
+        (e.g. only b_values changed), and solve_lp with its initialization phase otherwise. """
+    if basis is not None :
+      self.warm_start(basis)
+    if self.is_feasible() :
+      return self.run_simplex()
+    if self.is_dual_feasible() :
+      return self.run_dual_simplex()
+    return self.solve_lp()
 
   def solve_lp (self, is_primal=True):
     """ Full LP solver, including handling of initialization if needed"""
-    if not self.is_feasible():
-      self.auxiliarize()
-      self.first_aux_pivot()
-      aux_z = self.run_simplex()
-      if eps_cmp_ne (aux_z, 0):
-        return "INFEASIBLE"
-      self.unauxiliarize()
-
-    final_z = self.run_simplex()
+    # Upper bounds are only handled by the dictionary, and the revised simplex and interior point are not exact.
+    # Imported here, so that numpy is only needed if used.
+    if lp_method == "revised" and not self.upper and self.storage != "exact" :
+      from revised_simplex import revised_simplex
+      final_z = revised_simplex(self).solve_lp()
+    elif lp_method == "interior" and not self.upper and self.storage != "exact" :
+      from interior_point import interior_point
+      final_z = interior_point(self).solve_lp()
+    else :
+      final_z = self.simplex_lp()
+      if final_z == "INFEASIBLE" : # from the initialization phase, returned as is, also for the dual.
+        return final_z
     if not is_primal and not isinstance(final_z, Number) : # final or unbounded
       if final_z == "INFEASIBLE" :
         final_z = "UNBOUNDED"
@@ -384,25 +953,188 @@ class lpdict:
         final_z = "INFEASIBLE"
     return final_z
 
+  solve_lp = limited(solve_lp)
+
+  def simplex_lp (self):
+    """ solve_lp with the simplex on the dictionary : the initialization phase if it is not feasible, then the
+        simplex. Returns INFEASIBLE if the initialization phase finds no feasible point. """
+    if self.upper :
+      self.complement_above_upper()
+    if not self.is_feasible():
+      if self.upper :
+        self.bounded_auxiliarize()
+      else :
+        self.auxiliarize()
+        self.first_aux_pivot()
+      pivots = self.lp_stats["pivots"]
+      aux_z = self.run_simplex()
+      self.lp_stats["phase1_pivots"] += self.lp_stats["pivots"] - pivots
+      if aux_z == "LIMIT" :
+        return aux_z
+      if eps_cmp_ne (aux_z, 0):
+        return "INFEASIBLE"
+      if self.upper :
+        self.end_bounded_aux()
+      else :
+        self.pivot_out_x0()
+      self.unauxiliarize()
+    return self.run_simplex()
+
   def is_feasible (self):
-    if eps_cmp_lt ( min(self.b_values), 0) :
+    if self.m > 0 and eps_cmp_lt ( min(self.b_values), 0) :
       return False
-    else :
-      return True
+    for i, var in enumerate(self.basic_indices):
+      if var in self.upper and eps_cmp_gt(self.b_values[i], self.upper[var]):
+        return False
+    return True
 
   def is_degenerate (self):
-    if (min(self.b_values) == 0):
+    if self.m > 0 and (min(self.b_values) == 0):
       return True
     else :
       return False
 
   def variable_values (self):
+    vvs = self.dictionary_values()
+    if self.postsolve is not None :
+      return self.postsolve(vvs)
+    return vvs
+
+  def dictionary_values (self):
+    """ The (var, value) pairs of the dictionary as given to init_fn, which may be presolved : variable_values
+        before postsolve. """
+    if self.solution is not None and self.solution[0] == tuple(self.basic_indices) : # no pivots since.
+      return self.solution[1]
     vars = self.basic_indices + self.nonbasic_indices
     vals = self.b_values + [0]*(self.n)
     vvs  = zip (vars,vals)
     vvs.sort()
+    return self.uncomplemented(vvs)
+
+  def uncomplemented (self, vvs):
+    """ Undo complemented variables in the (var, value) pairs of dictionary_values. """
+    if self.complemented :
+      vvs = [(v, self.upper[v] - x if v in self.complemented else x) for v, x in vvs]
     return vvs
 
+  # Sensitivity analysis, read off a final dictionary of solve_lp. The rows are those of the dictionary
+  # as given to init_fn : x_r = b_r + sum a_rj x_j for the row variables x_r, and z = z_0 + sum c_j x_j
+  # over the column variables x_j. Changing b_r by d is the same as substituting x_r - d for x_r, see shift,
+  # so the final dictionary has everything about it in the column of x_r, if that is nonbasic.
+  # The ranges are those of the final basis : over them, it stays optimal (and the values and dual
+  # values change linearly). A degenerate dictionary can have ranges of 0 on one side.
+
+  def z_coefficient (self, var):
+    """ The coefficient of var in the z row, 0 if it is basic. For x (not u - x) if var is complemented. """
+    if var not in self.nonbasic_indices :
+      return 0
+    c = self.z_coeffs[self.nonbasic_indices.index(var) + 1]
+    return -c if var in self.complemented else c
+
+  def dual_values (self):
+    """ [(row var, shadow price)] : the change of the optimal objective per unit increase of b_r. """
+    return [(var, -self.z_coefficient(var)) for var in self.row_vars]
+
+  def reduced_costs (self):
+    """ [(column var, reduced cost)] : the change of the optimal objective per unit that the column variable
+        is forced up by, 0 for the basic ones. <= 0 at the optimum, unless at an upper bound. """
+    return [(var, self.z_coefficient(var)) for var in self.column_vars]
+
+  def rhs_direction (self, deltas):
+    """ The change of b_values for the change of the b_r of the row variables by the {row var : d} deltas. """
+    db = [0] * self.m
+    for var, d in deltas.items():
+      d = d if var in self.complemented else -d # substitute x_r - d for x_r, or u - x_r + d for u - x_r.
+      if var in self.nonbasic_indices :
+        j = self.nonbasic_indices.index(var)
+        for i, a in self.column_entries(j):
+          db[i] = db[i] + a * d
+      else :
+        i = self.basic_indices.index(var)
+        db[i] = db[i] - d
+    return db
+
+  def rhs_step_range (self, db):
+    """ (lo, hi, lo_row, hi_row) : the steps s <= 0 and s >= 0 as far as b_values + s * db stay within the bounds
+        of the basic variables, and the rows that reach a bound there, Bland's rule among ties (None and
+        -inf or inf if there is no limit). A row limits the steps up at its upper bound if db > 0, and at 0 if
+        db < 0, and the steps down the other way round. """
+    limits = { 1 : [float("inf"), None], -1 : [float("inf"), None] } # direction -> [|step|, row]
+    for i, d in enumerate(db):
+      if eps_cmp_eq(d, 0):
+        continue
+      b    = self.b_values[i]
+      var  = self.basic_indices[i]
+      up   = 1 if d > 0 else -1
+      ends = [(-up, -one * b / d)]
+      if var in self.upper :
+        ends.append((up, one * (self.upper[var] - b) / d))
+      for side, s in ends:
+        s    = max(0, side * s) # not past a bound that round-off has crossed.
+        best = limits[side]
+        if eps_cmp_lt(s, best[0]) or eps_cmp_eq(s, best[0]) and var < self.basic_indices[best[1]] :
+          limits[side] = [s, i]
+    (hi, hi_row), (lo, lo_row) = limits[1], limits[-1]
+    return -lo, hi, lo_row, hi_row
+
+  def rhs_ranging (self):
+    """ [(row var, lo, hi)] : b_r can change by any amount in [lo, hi] with the final basis still optimal. """
+    rv = []
+    for var in self.row_vars:
+      lo, hi = self.rhs_step_range(self.rhs_direction({var : 1}))[:2]
+      rv.append((var, lo, hi))
+    return rv
+
+  def cost_ranging (self):
+    """ [(column var, lo, hi)] : c_j can change by any amount in [lo, hi] with the final basis still optimal. """
+    inf = float("inf")
+    rv  = []
+    for var in self.column_vars:
+      sign = -1 if var in self.complemented else 1
+      if var in self.nonbasic_indices : # only its own z coefficient changes.
+        c = self.z_coeffs[self.nonbasic_indices.index(var) + 1]
+        rv.append((var, -inf, -c) if sign == 1 else (var, c, inf))
+        continue
+      # z gains g * sign * row of var, and every z coefficient has to stay <= 0.
+      lo = -inf ; hi = inf
+      for j, a in self.row_entries(self.basic_indices.index(var)):
+        a = sign * a
+        c = self.z_coeffs[j+1]
+        if eps_cmp_gt(a, 0):
+          hi = min(hi, -one * c / a)
+        elif eps_cmp_lt(a, 0):
+          lo = max(lo, -one * c / a)
+      rv.append((var, lo, hi))
+    return rv
+
+  def parametric_rhs (self, deltas, t_max=1):
+    """ Change the b_r of the row variables by t * d for the {row var : d} deltas, for t from 0 to t_max, from a
+        final dictionary of solve_lp. Each time a basic variable reaches a bound, it leaves with a dual simplex
+        pivot, onto the next basis. Returns (status, segments) with one (t_0, t_1, z(t_0), z(t_1), basic vars)
+        per basis, over which z is linear in t. The status is FINAL with the dictionary left final for t_max, or
+        INFEASIBLE if there is no basis past t_1 of the last segment. """
+    segments = []
+    t = 0
+    while True :
+      db = self.rhs_direction(deltas)
+      hi, row = self.rhs_step_range(db)[1::2]
+      step = min(hi, t_max - t)
+      if step > 0 :
+        z0 = self.z_coeffs[0]
+        self.shift(dict((var, (d if var in self.complemented else -d) * step) for var, d in deltas.items()))
+        segments.append((t, t + step, z0, self.z_coeffs[0], sorted(self.basic_indices)))
+        t = t + step
+      if not eps_cmp_lt(t, t_max) :
+        return "FINAL", segments
+      lv = self.basic_indices[row]
+      if db[row] > 0 : # at its upper bound.
+        self.complement(lv)
+      ev = self.find_dual_entering_variable(lv)
+      if not isinstance(ev, Number) :
+        return ev, segments
+      self.pivot(ev, lv)
+      self.lp_stats["dual_pivots"] += 1
+
   def is_integral (self):
     """ Is the current dictionary integral in all variable values. """
     for b in self.b_values:
@@ -413,7 +1145,6 @@ class lpdict:
   def add_ilp_cut (self, k, use_z):
     """ k is the row based on which we need to add a cut """
 
-    new_var_num = self.m + self.n + 1
     if use_z:
       assert not is_integer(self.z_coeffs[0])
       new_b_val     = -frac(self.z_coeffs[0])
@@ -424,42 +1155,131 @@ class lpdict:
       new_b_val     = -frac(self.b_values[k])
       new_A_row     = [frac(-aki) for aki in self.A[k]]
 
+    return self.add_row(new_b_val, new_A_row)
+
+  def add_row (self, new_b_val, new_A_row):
+    """ Add the constraint  new_var = new_b_val + new_A_row . x_N  with a new basic variable, and return new_var. """
+    new_var_num = self.next_var
     self.basic_indices.append(new_var_num)
     self.b_values.append(new_b_val)
     self.A.append(new_A_row)
     self.m += 1
+    self.next_var    += 1
     self.large_value += 1
+    return new_var_num
+
+  def remove_row (self, k):
+    """ Drop row k. Only valid for a constraint that is not needed any more, e.g. a slack ILP cut. """
+    del self.basic_indices[k]
+    del self.b_values[k]
+    del self.A[k]
+    self.m -= 1
 
   def add_all_ilp_cuts (self):
+    """ Returns the number of cuts added. """
+    if self.cut_pool is not None : # selected cuts only, see cutpool.py
+      return self.cut_pool.add_cuts(self)
     m = self.m
+    added = 0
     for i in range(m):
-      if not is_integer(self.b_values[i]):
+      if not is_integer(self.b_values[i]) and not is_near_integer(self.b_values[i]):
         self.add_ilp_cut(i, False)
+        added += 1
     # Not sure why adding z-cuts generates wrong results, but it creates issues both with(ilpTest10) and without Fractions(assignment part5)
     # Update : not all objective functions are integral, so adding z-cuts is not necessarily legal.
     #if not is_integer(self.z_coeffs[0]):
     #  self.add_ilp_cut(0, True)
+    return added
+
+  def report_progress (self, bound, incumbent_z=None, incumbent=None):
+    """ Give the callback of the solve limit, if any, the best LP bound and the best integral objective so far.
+        incumbent is the dictionary of that one when it is new, and then its variable values go along. """
+    if self.limit is None or self.limit.callback is None :
+      return
+    self.limit.callback({ "bound"     : bound,
+                          "incumbent" : incumbent_z,
+                          "values"    : incumbent.variable_values() if incumbent is not None else None,
+                          "pivots"    : self.limit.pivots })
 
   def solve_ilp (self):
+    """ The ILP optimum, or infeasible, unbounded or limit, see limited. """
+    if use_cut_pool and self.cut_pool is None :
+      import cutpool
+      self.cut_pool = cutpool.cut_pool()
+    if ilp_method in ["bb", "bc"] :
+      import branch_and_bound
+      cut_rounds = branch_and_bound.bc_cut_rounds if ilp_method == "bc" else 0
+      return branch_and_bound.branch_and_bound(self, cut_rounds).solve()
+
+    self.ilp_stats = { "method" : "cuts", "cut_rounds" : 0 }
+    original = None # the dictionary before the first cut, for branch_after_cuts.
+    if self.cut_pool is not None :
+      self.ilp_stats["cut_pool"] = self.cut_pool.history
     if use_dual_for_ilp :
       lps = self.solve_lp()
       while True:
-        #print self.z_coeffs[0]
+        self.ilp_stats["m"] = self.m
         if not isinstance(lps, Number) :
           return lps.lower()
+        self.ilp_stats["bound"] = lps
         if self.is_integral():
+          self.report_progress(lps, lps, self)
+          return self.z_coeffs[0]
+        self.report_progress(lps)
+        if original is None :
+          original = self.copy()
+        if self.add_all_ilp_cuts() == 0 : # integral up to round-off, see cutpool.min_frac and cut_min_frac
+          if self.cut_pool is not None and self.cut_pool.stalled :
+            return self.branch_after_cuts(original)
+          self.report_progress(lps, lps, self)
           return self.z_coeffs[0]
-        self.add_all_ilp_cuts()
-        self.dualize()
-        lps = self.solve_lp(is_primal=False)
-        self.undualize()
+        if self.cut_pool is None and self.m - original.m > max_cut_rows :
+          return self.branch_after_cuts(original)
+        self.ilp_stats["cut_rounds"] += 1
+        self.lp_stats["cut_rounds"] += 1
+        if use_dual_simplex or self.upper : # dualize does not handle upper bounds.
+          lps = self.run_dual_simplex()
+        else :
+          self.dualize()
+          lps = self.solve_lp(is_primal=False)
+          self.undualize()
     else :
       while True :
         lps = self.solve_lp()
+        self.ilp_stats["m"] = self.m
         if not isinstance(lps, Number) :
           return lps.lower()
+        self.ilp_stats["bound"] = lps
         if self.is_integral():
+          self.report_progress(lps, lps, self)
+          return self.z_coeffs[0]
+        self.report_progress(lps)
+        if original is None :
+          original = self.copy()
+        if self.add_all_ilp_cuts() == 0 : # integral up to round-off, see cutpool.min_frac and cut_min_frac
+          if self.cut_pool is not None and self.cut_pool.stalled :
+            return self.branch_after_cuts(original)
+          self.report_progress(lps, lps, self)
           return self.z_coeffs[0]
-        self.add_all_ilp_cuts()
+        if self.cut_pool is None and self.m - original.m > max_cut_rows :
+          return self.branch_after_cuts(original)
+        self.ilp_stats["cut_rounds"] += 1
+        self.lp_stats["cut_rounds"] += 1
 
+  solve_ilp = limited(solve_ilp)
 
+  def branch_after_cuts (self, original):
+    """ The end of solve_ilp when the cut pool gives up (see cutpool.py), or the plain cuts grow past max_cut_rows
+        rows : branch-and-bound from original, the dictionary before any cut. Not from the one the cuts left, as
+        many rounds of floating point cuts can cut off the optimum. The lpdict ends up holding the best integral dictionary, as after branch_and_bound. """
+    import branch_and_bound
+    pool, cut_stats = self.cut_pool, self.ilp_stats
+    # The statistics, limit and callbacks are those of the whole solve.
+    for name in ["lp_stats", "timers", "pivot_callbacks", "limit"]:
+      original.__dict__[name] = self.__dict__[name]
+    original.cut_pool = None
+    rv = branch_and_bound.branch_and_bound(original, 0).solve()
+    self.__dict__.update(original.__dict__)
+    self.cut_pool = pool
+    self.ilp_stats["cuts_before"] = cut_stats
+    return rv
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+doc_str = """
+ Parallel branch-and-bound for the lpdict class, on a pool of worker processes.
+ Each round takes up to batch_size open nodes, and the LP relaxations of their children
+ are solved by the workers. Node dictionaries travel in a compact packed form.
+ The incumbent objective at the start of the round goes out with every task, so that workers
+ can prune a child without sending its dictionary back.
+ The batches do not depend on the number of workers, and results are merged in task order,
+ so the search, and the answer, is the same whatever the worker count.
+ A solve limit is checked between rounds, and each child LP of a round gets the pivots left at its start.
+ The lp_stats of the workers, and their timers if the root has them on, are added into the root's.
+
+ Run as a script, this prints a scaling report of wall time against number of workers.
+"""
+
+import sys
+import time
+import argparse
+import multiprocessing
+from   array   import array
+from   numbers import Number
+import lpdict as lpdict_module
+import branch_and_bound
+import pricing
+from   lpdict import new_lpdict, storage_backends, eps_cmp_le, solve_limit
+from   branch_and_bound import add_branch_row, branch_order
+
+# Number of open nodes expanded per round. Fixed, so that the search does not depend on the worker count.
+batch_size = 16
+
+def pack_numbers (values):
+  """ Doubles as raw bytes. Fractions are kept as they are. """
+  if lpdict_module.use_fractions :
+    return list(values)
+  return array('d', values).tostring()
+
+def unpack_numbers (packed):
+  if isinstance(packed, list) :
+    return packed
+  a = array('d')
+  a.fromstring(packed)
+  return a.tolist()
+
+def pack_ints (values):
+  return array('l', values).tostring()
+
+def unpack_ints (packed):
+  a = array('l')
+  a.fromstring(packed)
+  return a.tolist()
+
+def pack_lpdict (lpd):
+  """ Compact picklable form of a solved dictionary (the shadow objective is not kept). """
+  m = lpd.m ; n = lpd.n
+  upper = (pack_ints(lpd.upper.keys()), pack_numbers(lpd.upper.values()), pack_ints(sorted(lpd.complemented)))
+  rules = (lpd.pricing.name, lpd.pricing.l_rule) # the pricing weights are not kept.
+  if lpd.storage == "exact" : # the integer tableau as it is, b and z included.
+    return (lpd.storage, m, n, pack_ints(lpd.basic_indices), pack_ints(lpd.nonbasic_indices),
+            None, None, (lpd.D, lpd.T, lpd.bareiss), upper, rules)
+  if lpd.storage == "sparse" : # CSR
+    rowptr = [0] ; cols = [] ; vals = []
+    for row in lpd.rows :
+      for j in sorted(row):
+        cols.append(j)
+        vals.append(row[j])
+      rowptr.append(len(cols))
+    A = (pack_ints(rowptr), pack_ints(cols), pack_numbers(vals))
+  elif lpd.storage == "numpy" :
+    A = lpd.A.tostring()
+  else :
+    A = pack_numbers([a for row in lpd.A for a in row])
+  return (lpd.storage, m, n, pack_ints(lpd.basic_indices), pack_ints(lpd.nonbasic_indices),
+          pack_numbers(lpd.b_values), pack_numbers(lpd.z_coeffs), A, upper, rules)
+
+def unpack_lpdict (packed):
+  storage, m, n, basic, nonbasic, b, z, A, upper, rules = packed
+  lpd = new_lpdict(storage)
+  lpd.pricing = pricing.new_pricing(*rules)
+  upper_dict = dict(zip(unpack_ints(upper[0]), unpack_numbers(upper[1])))
+  if storage == "exact" :
+    D, T, bareiss = A
+    T = [list(row) for row in T] # without a pool, the tasks share the packed parent.
+    lpd.init_tableau(m, n, unpack_ints(basic), unpack_ints(nonbasic), D, T, bareiss, upper_dict)
+    lpd.complemented = set(unpack_ints(upper[2]))
+    return lpd
+  if storage == "sparse" :
+    rowptr, cols, vals = unpack_ints(A[0]), unpack_ints(A[1]), unpack_numbers(A[2])
+    rows = [dict(zip(cols[rowptr[i]:rowptr[i+1]], vals[rowptr[i]:rowptr[i+1]])) for i in range(m)]
+  else :
+    flat = unpack_numbers(A)
+    rows = [flat[i*n:(i+1)*n] for i in range(m)]
+  lpd.init_fn(m, n, unpack_ints(basic), unpack_ints(nonbasic), unpack_numbers(b), rows, unpack_numbers(z), upper_dict)
+  lpd.complemented = set(unpack_ints(upper[2]))
+  return lpd
+
+def solve_child (task):
+  """ Worker : add the branch row to the parent and re-optimize.
+      Returns (lps, packed child, is integral, (lp_stats, timers)) """
+  packed_parent, row, is_up, incumbent_z, limit, timing = task
+  lpd = unpack_lpdict(packed_parent)
+  add_branch_row(lpd, row, is_up)
+  if limit is not None : # (deadline, pivots left)
+    lpd.limit = solve_limit(*limit)
+  if timing :
+    lpd.start_profile()
+  lps = lpd.run_dual_simplex()
+  stats = (dict(lpd.lp_stats), dict(lpd.timers) if timing else None)
+  if not isinstance(lps, Number) :
+    return (lps, None, False, stats)
+  if incumbent_z is not None and eps_cmp_le(lps, incumbent_z) : # pruned, no need to send it back.
+    return (lps, None, False, stats)
+  return (lps, pack_lpdict(lpd), lpd.is_integral(), stats)
+
+class parallel_branch_and_bound (branch_and_bound.branch_and_bound):
+  def __init__ (self, lpd, cut_rounds=0, jobs=1):
+    branch_and_bound.branch_and_bound.__init__(self, lpd, cut_rounds)
+    self.jobs = jobs
+    self.stats["jobs"]   = jobs
+    self.stats["rounds"] = 0
+
+  def search (self):
+    pool  = multiprocessing.Pool(self.jobs) if self.jobs > 1 else None
+    limit = self.root.limit
+    try :
+      while self.open :
+        if limit is not None and limit.reached() :
+          self.stats["limit"] = True
+          break
+        if self.stats["nodes"] >= branch_and_bound.max_nodes :
+          self.fallback(self.root_copy)
+          break
+        parents = []
+        while self.open and len(parents) < batch_size :
+          node = self.pop()
+          if self.can_prune(node.bound) :
+            self.stats["pruned"] += 1
+          else :
+            parents.append(node)
+
+        task_limit = None
+        if limit is not None :
+          task_limit = (limit.deadline, limit.max_pivots - limit.pivots if limit.max_pivots is not None else None)
+        tasks = [] ; infos = []
+        for node in parents :
+          lpd = node.lpd if not isinstance(node.lpd, tuple) else unpack_lpdict(node.lpd)
+          row = self.select_branch(lpd)
+          b   = lpd.b_values[row]
+          packed = pack_lpdict(lpd)
+          for is_up in branch_order(b):
+            tasks.append((packed, row, is_up, self.incumbent_z, task_limit, self.root.timers is not None))
+            infos.append((node, lpd.basic_indices[row], b, is_up))
+          node.lpd = None # done with this dictionary, release it.
+
+        if pool :
+          results = pool.map(solve_child, tasks, chunksize=1)
+        else :
+          results = map(solve_child, tasks)
+        self.stats["rounds"] += 1
+
+        unfinished = []
+        for (node, var, b, is_up), (lps, packed, integral, (lp_stats, timers)) in zip(infos, results):
+          self.root.lp_stats.add(lp_stats)
+          if timers is not None :
+            self.root.timers.add(timers)
+          if limit is not None :
+            limit.pivots += lp_stats["dual_pivots"]
+          if lps == "LIMIT" :
+            if node not in unfinished :
+              unfinished.append(node)
+            continue
+          self.update_pseudo_cost(node.bound, var, b, is_up, lps)
+          child = self.evaluate(packed, lps, node.depth + 1, integral)
+          if child :
+            self.push(child)
+        if unfinished : # their bounds still hold for best_bound.
+          for node in unfinished :
+            self.push(node)
+          self.stats["limit"] = True
+          break
+        self.report()
+    finally :
+      if pool :
+        pool.close()
+        pool.join()
+
+  def incumbent_lpdict (self):
+    if isinstance(self.incumbent, tuple) :
+      self.incumbent = unpack_lpdict(self.incumbent)
+      self.incumbent.postsolve = self.root.postsolve
+    return self.incumbent
+
+def solve_ilp (lpd, jobs):
+  """ Like lpdict.solve_ilp, with branch-and-bound (or branch-and-cut for ilp_method bc) on jobs workers.
+      Also takes the deadline, max_pivots and callback of lpdict.limited. """
+  cut_rounds = branch_and_bound.bc_cut_rounds if lpdict_module.ilp_method == "bc" else 0
+  if lpdict_module.use_cut_pool and lpd.cut_pool is None :
+    import cutpool
+    lpd.cut_pool = cutpool.cut_pool()
+  return parallel_branch_and_bound(lpd, cut_rounds, jobs).solve()
+
+solve_ilp = lpdict_module.limited(solve_ilp)
+
+def main(argv=None):
+  """ Scaling report : wall time against number of workers. """
+  if argv is None:
+    argv = sys.argv
+
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('-lpdict', help='lpdictionary file')
+  input_parser.add_argument('-sfile' , help='sudoku file, instead of -lpdict')
+  input_parser.add_argument('-sN'    , default=2, type=int, help='sudoku size param, with -sfile')
+  input_parser.add_argument('-jobs'  , default='1,2,4', help='comma separated worker counts')
+  input_parser.add_argument('-storage', default='list', choices=storage_backends, help='dictionary storage backend')
+  input_parser.add_argument('-ilp_method', default='bb', choices=['bb', 'bc'], help='branch-and-bound or branch-and-cut')
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+  lpdict_module.ilp_method = args.ilp_method
+
+  def make_lpd():
+    lpd = new_lpdict(args.storage)
+    if args.sfile :
+      from solve_sudoku import sudoku
+      s = sudoku(args.sN)
+      s.init_from_file(args.sfile, None)
+      s.init_lpdict(lpd)
+    else :
+      lpd.init_from_file(args.lpdict)
+    return lpd
+
+  print "%5s %10s %8s %8s %12s" % ("jobs", "wall(s)", "speedup", "nodes", "objective")
+  base = None
+  for jobs in [int(j) for j in args.jobs.split(',')]:
+    lpd = make_lpd()
+    t0  = time.time()
+    z   = solve_ilp(lpd, jobs)
+    wall = time.time() - t0
+    if base is None :
+      base = wall
+    print "%5d %10.3f %8.2f %8d %12s" % (jobs, wall, base / wall, lpd.ilp_stats["nodes"], z)
+
+if __name__ == "__main__":
+  sys.exit(main())
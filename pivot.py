@@ -2,32 +2,99 @@
 
 doc_str = """
  File for solving the linear programming course assignments using the lpdict class.
+ With -batch, many dictionaries are solved in one process (or on -jobs worker processes), and one
+ JSON line per file is printed, see run_batch.
+ -stats prints the lp_stats (and ilp_stats) of the solve of part 123 or 4 to stderr, or appends them
+ as a JSON line to the given file, -profile adds the seconds spent in pricing, ratio tests and
+ updates, and -trace prints each pivot to stderr. See lpdict.stats_summary.
 """
 
 import sys, os
 import argparse
+import glob
+import json
+import re
+import time
+import traceback
+import multiprocessing
+from   StringIO import StringIO
+import lpdict as lpdict_module
+import branch_and_bound
+import parallel_bb
+import presolve
+import pricing
+import result_cache
 from   numbers import Number
-from   lpdict import lpdict
+from   lpdict import new_lpdict, storage_backends
 
-def main(argv=None):
-  """main function"""
+# Suffixes of the expected output files, see batch_expected.
+expected_suffixes = [".output", ".out"]
 
-  if argv is None:
-    argv = sys.argv
-  prog_path = os.path.dirname(argv[0])     
-  prog_abspath = os.path.abspath(prog_path)
-  
-  input_parser = argparse.ArgumentParser(description=doc_str)
-  input_parser.add_argument('-lpdict', default='part1.lpdict', help='lpdictionary file')
-  input_parser.add_argument('-part'  , default=123, type=int, help='1, 2, 3, 123, 4')
-  input_parser.add_argument('-debug')
-  try :
-    args = input_parser.parse_args(argv[1:])
-  except SystemExit :
-    return 1
+def set_options (args):
+  """ Module options from the command line. Also the pool initializer for -batch. """
+  lpdict_module.lp_method     = args.lp_method
+  lpdict_module.ilp_method    = args.ilp_method
+  lpdict_module.use_cut_pool  = args.cut_pool
+  lpdict_module.use_perturbation = args.perturb
+  branch_and_bound.node_selection = args.node_selection
+  branch_and_bound.branching      = args.branching
+
+def cached_solve (args, lpd, kind, solve):
+  """ solve(), or with -cache, through the result cache, see result_cache.py """
+  if args.cache is None :
+    return solve()
+  return result_cache.cached_solve(lpd, kind, args.cache or None, solve)
+
+def solve_limits (args, err):
+  """ The deadline, max_pivots and callback keyword arguments for the solves of parts 123 and 4, see lpdict.limited. """
+  limits = {}
+  if args.time_limit is not None :
+    limits["deadline"] = time.time() + args.time_limit
+  if args.max_pivots is not None :
+    limits["max_pivots"] = args.max_pivots
+  if args.progress :
+    def callback (progress):
+      print >> err, "bound %s incumbent %s pivots %d" % (progress["bound"], progress["incumbent"], progress["pivots"])
+    limits["callback"] = callback
+  return limits
 
-  mylpd = lpdict()
-  mylpd.init_from_file(args.lpdict)
+def instrument (args, lpd, err):
+  """ Turn on the -profile timers and the -trace pivot callback of lpd. """
+  if args.profile :
+    lpd.start_profile()
+  if args.trace :
+    def trace (lpd, ev, lv):
+      print >> err, ev, "enters", lv, "leaves", lpd.z_coeffs[0]
+    lpd.pivot_callbacks.append(trace)
+
+def write_stats (args, lpd, err):
+  """ -stats : the statistics of lpd as text to err, or as a JSON line appended to the -stats file.
+      -batch (and solver_daemon.py) put them in their JSON lines instead, see solve_task. """
+  if args.stats :
+    with open(args.stats, 'a') as fh:
+      lpd.write_stats(fh, as_json=True)
+  else :
+    lpd.write_stats(err)
+
+def solve_file (args, fname, out=None, err=None, text=None):
+  """ Run -part args.part on the dictionary in fname (or in the string text), printing to out and the statistics to err.
+      Returns (dictionary, status, objective). The status is what the part ended with :
+      FINAL, UNBOUNDED, INFEASIBLE or a pivot (part 1), and SOLVED for a solved part 123 or 4.
+      A part 4 that stops at -time_limit or -max_pivots has status limit, and the best integral objective found, if any. """
+  out = out or sys.stdout
+  err = err or sys.stderr
+  status = None ; objective = None
+  limits = solve_limits(args, err)
+  mylpd = new_lpdict(args.storage)
+  mylpd.pricing = pricing.new_pricing(args.pricing)
+  instrument(args, mylpd, err)
+  if text is None :
+    mylpd.init_from_file(fname)
+  else :
+    mylpd.init_from_string(text)
+  if args.presolve and args.part in [123, 4] : # parts 1-3 check single pivots of the given dictionary.
+    ps = presolve.presolve(mylpd, integral=(args.part == 4))
+    print >> err, ps.report()
 
   # part 1 : Just do one pivot.
   if args.part == 1 :
@@ -35,31 +102,35 @@ def main(argv=None):
     lv = mylpd.find_leaving_variable(ev)
 
     if not isinstance(ev, Number) :
-      print ev
+      print >> out, ev
+      status = ev
     elif not isinstance(lv, Number) :
-      print lv
+      print >> out, lv
+      status = lv
     else :
-      print ev
-      print lv
+      print >> out, ev
+      print >> out, lv
       zp = mylpd.pivot(ev, lv)
+      status = "PIVOT"
+      objective = zp
       if zp != None :
         if int(zp) == zp:
-          print "%.1f"%(zp)
+          print >> out, "%.1f"%(zp)
         else :
-          print "%.4f"%(zp)
-    
+          print >> out, "%.4f"%(zp)
+
 
   # Part 2 : solve LP where the initial state is feasible.
   # Part 3 : solve initialization phase simplex.
   if args.part == 3 :
     if args.debug :
-      print mylpd
+      print >> out, mylpd
 
     # Set up aux problem
     mylpd.auxiliarize()
 
     if args.debug :
-      print mylpd
+      print >> out, mylpd
 
     mylpd.first_aux_pivot()
 
@@ -67,22 +138,25 @@ def main(argv=None):
     pivot_count = 0
     while True :
       if args.debug :
-        print mylpd
+        print >> out, mylpd
 
       ev = mylpd.find_entering_variable()
       if args.debug :
-        print ev
+        print >> out, ev
       if not isinstance(ev, Number) : # final
-        print "%.6f"%(mylpd.z_coeffs[0])
+        print >> out, "%.6f"%(mylpd.z_coeffs[0])
         if args.part == 2 :
-          print pivot_count
+          print >> out, pivot_count
+        status = ev
+        objective = mylpd.z_coeffs[0]
         break
 
       lv = mylpd.find_leaving_variable(ev)
       if args.debug :
-        print lv
+        print >> out, lv
       if not isinstance(lv, Number) : # unbounded
-        print lv
+        print >> out, lv
+        status = lv
         break
 
       mylpd.pivot(ev,lv)
@@ -90,22 +164,177 @@ def main(argv=None):
 
   # Part 123 (my own) : Put parts 1,2,3, together and clean up everything to create a full solver.
   if args.part == 123: # Full solver.
-    final_z = mylpd.solve_lp()
+    final_z = cached_solve(args, mylpd, "lp", lambda: mylpd.solve_lp(**limits))
     if not isinstance(final_z, Number) :
-      print "Unable to solve."
-      print final_z
+      print >> out, "Unable to solve."
+      print >> out, final_z
+      status = final_z
     else :
-      print "SOLVED!!!"
-      print final_z
-      print mylpd.variable_values()
-    return
+      print >> out, "SOLVED!!!"
+      print >> out, final_z
+      print >> out, mylpd.variable_values()
+      status = "SOLVED"
+      objective = final_z
+    if args.lp_stats :
+      print >> err, mylpd.lp_stats
 
   if args.part == 4: # Full ILP solver.
-    final_z = mylpd.solve_ilp()
+    if args.jobs and not args.batch and args.ilp_method in ["bb", "bc"] : # the cutting plane rounds are sequential.
+      final_z = cached_solve(args, mylpd, "ilp", lambda: parallel_bb.solve_ilp(mylpd, args.jobs, **limits))
+    else :
+      final_z = cached_solve(args, mylpd, "ilp", lambda: mylpd.solve_ilp(**limits))
     if not isinstance(final_z, Number) :
-      print final_z
+      print >> out, final_z
+      status = final_z
+      if final_z == "limit" :
+        objective = mylpd.ilp_stats.get("incumbent")
     else :
-      print "%.1f"%(final_z)
+      print >> out, "%.1f"%(final_z)
+      status = "SOLVED"
+      objective = final_z
+    if args.ilp_stats :
+      print >> err, mylpd.ilp_stats
+    if args.lp_stats :
+      print >> err, mylpd.lp_stats
+
+  if args.cache_stats and args.cache is not None :
+    print >> err, result_cache.get_cache(args.cache or None).stats
+  return mylpd, status, objective
+
+def batch_files (spec):
+  """ The dictionary files of -batch : a glob pattern, or else a file listing one path per line.
+      An expected output file stands for its dictionary, as in the Makefile, e.g. 'ilpTests/unitTests/*.output'. """
+  if glob.has_magic(spec) :
+    files = sorted(glob.glob(spec))
+  else :
+    with open(spec) as f:
+      files = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+  for suffix in expected_suffixes:
+    files = [fname[:-len(suffix)] if fname.endswith(suffix) else fname for fname in files]
+  return files
+
+def batch_expected (fname, output):
+  """ True or False for whether output matches the expected output file of fname, compared like
+      diff -w does. None if fname has no expected output file. """
+  for suffix in expected_suffixes:
+    if os.path.exists(fname + suffix) :
+      with open(fname + suffix) as f:
+        expected = f.read()
+      strip = lambda text: [re.sub(r'\s+', '', line) for line in text.splitlines()]
+      return strip(expected) == strip(output)
+  return None
+
+def solve_task (args, fname, text=None):
+  """ solve_file, with the output caught. Returns a dict of the results, see run_batch. """
+  out = StringIO() ; err = StringIO()
+  t0  = time.time()
+  hits = result_cache.get_cache(args.cache or None).stats["hits"] if args.cache is not None else None
+  stats = None
+  try :
+    lpd, status, objective = solve_file(args, fname, out, err, text)
+    pivots = lpd.lp_stats["pivots"] + lpd.lp_stats["dual_pivots"] # of every lp_method, unlike pricing.pivots.
+    if args.stats is not None :
+      stats = lpd.stats_summary()
+  except Exception :
+    status = "error" ; objective = None ; pivots = None
+    print >> err, traceback.format_exc()
+  wall   = time.time() - t0
+  output = out.getvalue()
+  if isinstance(objective, Number) :
+    objective = float(objective)
+  rv = { "status"    : str(status),
+         "objective" : objective,
+         "pivots"    : pivots,
+         "wall"      : round(wall, 6),
+         "output"    : output }
+  if status == "error" :
+    rv["error"] = err.getvalue()
+  if hits is not None :
+    rv["cached"] = result_cache.get_cache(args.cache or None).stats["hits"] > hits
+  if stats is not None :
+    rv["stats"] = stats
+  return rv
+
+def batch_task (task):
+  """ Worker : solve one file. Returns its JSON line. """
+  args, fname = task
+  rv = solve_task(args, fname)
+  rv["file"]  = fname
+  rv["match"] = batch_expected(fname, rv["output"])
+  return json.dumps(rv, sort_keys=True, default=lpdict_module.stats_default)
+
+def run_batch (args):
+  """ Solve every file of -batch, on args.jobs worker processes, and print one JSON line per file in
+      the order of the files, as soon as it is done. Returns 1 if any file failed or did not match
+      its expected output, for make. """
+  tasks = [(args, fname) for fname in batch_files(args.batch)]
+  pool  = multiprocessing.Pool(args.jobs, set_options, (args,)) if args.jobs > 1 else None
+  failed = 0
+  try :
+    results = pool.imap(batch_task, tasks, chunksize=1) if pool else (batch_task(t) for t in tasks)
+    for line in results:
+      print line
+      sys.stdout.flush()
+      rv = json.loads(line)
+      if rv["status"] == "error" or rv["match"] is False :
+        failed += 1
+  finally :
+    if pool :
+      pool.close()
+      pool.join()
+  if failed :
+    print >> sys.stderr, "%d of %d files failed or did not match" % (failed, len(tasks))
+  return 1 if failed else 0
+
+def arg_parser ():
+  """ The command line options. solver_daemon.py takes the same options with each request. """
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('-lpdict', default='part1.lpdict', help='lpdictionary file')
+  input_parser.add_argument('-batch' , help='glob pattern, or a file listing dictionary files : solve all of them and print JSON lines')
+  input_parser.add_argument('-part'  , default=123, type=int, help='1, 2, 3, 123, 4')
+  input_parser.add_argument('-storage', default='list', choices=storage_backends, help='dictionary storage backend')
+  input_parser.add_argument('-lp_method', default=lpdict_module.lp_method, choices=lpdict_module.lp_methods, help='how solve_lp solves each LP')
+  input_parser.add_argument('-ilp_method', default=lpdict_module.ilp_method, choices=lpdict_module.ilp_methods, help='how solve_ilp solves the ILP')
+  input_parser.add_argument('-node_selection', default=branch_and_bound.node_selection, choices=branch_and_bound.node_selections, help='node order for -ilp_method bb/bc')
+  input_parser.add_argument('-branching', default=branch_and_bound.branching, choices=branch_and_bound.branchings, help='branching rule for -ilp_method bb/bc')
+  input_parser.add_argument('-jobs', default=None, type=int, help='with -ilp_method bb or bc, solve the ILP with parallel branch-and-bound on this many worker processes (-ilp_method cuts runs on one). With -batch, the number of files solved at once')
+  input_parser.add_argument('-pricing', default=lpdict_module.e_selector, choices=pricing.rules, help='entering variable rule, see pricing.py')
+  input_parser.add_argument('-cut_pool', action='store_true', help='select, age and drop Gomory cuts with a cut pool')
+  input_parser.add_argument('-presolve', action='store_true', help='reduce the problem with presolve first, and report what each rule removed to stderr')
+  input_parser.add_argument('-perturb', action='store_true', help='perturb b_values when the simplex stalls on degenerate pivots')
+  input_parser.add_argument('-time_limit', default=None, type=float, help='seconds for the solve of part 123 or 4, which then ends with status LIMIT (limit for part 4)')
+  input_parser.add_argument('-max_pivots', default=None, type=int, help='pivots for the solve of part 123 or 4, over all its LPs')
+  input_parser.add_argument('-progress', action='store_true', help='print the best bound and incumbent of the solve to stderr as it goes')
+  input_parser.add_argument('-cache', nargs='?', const='', default=None, help='look up and keep the results of parts 123 and 4 in a result cache, in memory or also in the given directory')
+  input_parser.add_argument('-cache_stats', action='store_true', help='print the result cache hits and misses to stderr')
+  input_parser.add_argument('-ilp_stats', action='store_true', help='print ILP statistics to stderr')
+  input_parser.add_argument('-lp_stats', action='store_true', help='print pivot counts to stderr')
+  input_parser.add_argument('-stats', nargs='?', const='', default=None, help='print the solve statistics to stderr, or append them as a JSON line to the given file. With -batch, a "stats" entry of each JSON line')
+  input_parser.add_argument('-profile', action='store_true', help='time pricing, ratio tests and updates, for -stats')
+  input_parser.add_argument('-trace', action='store_true', help='print each simplex and dual simplex pivot to stderr')
+  input_parser.add_argument('-debug')
+  return input_parser
+
+def main(argv=None):
+  """main function"""
+
+  if argv is None:
+    argv = sys.argv
+  prog_path = os.path.dirname(argv[0])
+  prog_abspath = os.path.abspath(prog_path)
+
+  input_parser = arg_parser()
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+
+  set_options(args)
+  if args.batch :
+    return run_batch(args)
+  lpd, status, objective = solve_file(args, args.lpdict)
+  if args.stats is not None and args.part in [123, 4] : # parts 1-3 pivot by hand.
+    write_stats(args, lpd, sys.stderr)
 
 if __name__ == "__main__":
   sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+
+doc_str = """
+ This file implements a presolve stage for the lpdict class.
+ The dictionary  x_B = b + A x_N  is read as the rows  a . x_N <= b  (a = -A[i]), with x_N >= 0.
+ The rules below are applied till none of them changes anything :
+  empty_rows     : a row without coefficients is dropped (or proves the LP infeasible).
+  duplicate_rows : of the rows that are positive multiples of each other, only the tightest is kept.
+  equality_rows  : once the other rules are done, of two rows  a . x <= b  and  -a . x <= -b, which
+                   pin a . x to b, only the first is kept, as an equality row (its slack gets upper
+                   bound 0). If the two can not both hold, the LP is infeasible.
+  singleton_rows : a row with one coefficient becomes a bound on its variable.
+  fixed_vars     : a variable whose bounds meet is substituted into the rows and the objective.
+  dominated_rows : a row that holds for every x within the bounds is dropped.
+  forcing_rows   : a row that only holds with every variable at a bound fixes all of them.
+  empty_cols     : a variable in no row is fixed at the bound that the objective prefers.
+ The remaining rows and variables make the reduced dictionary. Variables with a lower bound are
+ shifted to it, and upper bounds are passed on as lpdict upper bounds. Rows of basic variables with
+ an upper bound (e.g. equality rows) are split into a <= row for each side.
+ postsolve maps a solution of the reduced dictionary back to the original variable indices.
+"""
+
+import math
+import fractions
+import lpdict as lpdict_module
+from   lpdict import eps_cmp_lt, eps_cmp_le, eps_cmp_gt, eps_cmp_eq
+
+inf = float("inf")
+
+rules = ["empty_rows", "duplicate_rows", "equality_rows", "singleton_rows", "fixed_vars",
+         "dominated_rows", "forcing_rows", "empty_cols"]
+
+class presolver:
+  def __init__ (self, lpd, integral=False):
+    """ With integral, all variables are taken to be integers (for solve_ilp), and bounds are rounded. """
+    self.integral = integral
+    # The 1 that divisions start from : exact for the exact storage, else lpdict's one, read here and not at
+    # import time, so that a later set_use_fractions counts.
+    self.one      = fractions.Fraction(1) if lpd.storage == "exact" else lpdict_module.one
+    self.status   = None # "INFEASIBLE" if presolve found the problem to be infeasible.
+    self.stats    = dict((r, [0, 0]) for r in rules) # rule -> [rows removed, columns removed]
+
+    # Original problem, kept for postsolve.
+    self.basic    = list(lpd.basic_indices)
+    self.nonbasic = list(lpd.nonbasic_indices)
+    self.orig_b   = list(lpd.b_values)
+    self.orig_A   = [dict((self.nonbasic[j], a) for j, a in lpd.row_entries(i) if a != 0) for i in range(lpd.m)]
+
+    # Working copy : rows[var] = [{col var : a}, b] for  a . x <= b, keyed by the basic variable.
+    self.rows     = dict((v, [dict((j, -a) for j, a in self.orig_A[i].items()), self.orig_b[i]])
+                         for i, v in enumerate(self.basic))
+    self.col_rows = dict((j, set()) for j in self.nonbasic)
+    for v, (a, b) in self.rows.items():
+      for j in a:
+        self.col_rows[j].add(v)
+    self.c        = dict(zip(self.nonbasic, lpd.z_coeffs[1:]))
+    self.z0       = lpd.z_coeffs[0]
+    self.lo       = dict((j, 0 * self.one) for j in self.nonbasic)
+    self.up       = dict((j, lpd.upper.get(j, inf)) for j in self.nonbasic)
+
+    # A basic variable with an upper bound, s = b + A x <= u, is one more row  A x <= u - b,
+    # keyed by a new variable number. It is only used inside presolve.
+    assert not lpd.complemented, "presolve needs a dictionary without complemented variables"
+    self.next_var = max(self.basic + self.nonbasic + [0]) + 1
+    self.order    = dict((v, i) for i, v in enumerate(self.basic))
+    for i, v in enumerate(self.basic):
+      if v in lpd.upper :
+        self.rows[self.next_var] = [dict(self.orig_A[i]), lpd.upper[v] - self.orig_b[i]]
+        for j in self.orig_A[i]:
+          self.col_rows[j].add(self.next_var)
+        self.order[self.next_var] = len(self.order)
+        self.next_var += 1
+    self.fixed    = {} # var -> value, for the variables that have been substituted.
+    self.equal    = set() # rows kept as equality rows, see equality_pass.
+
+  def __deepcopy__ (self, memo):
+    return self # never changes after run, so copies of the dictionary can share it.
+
+  def remove_row (self, v, rule):
+    for j in self.rows[v][0]:
+      self.col_rows[j].discard(v)
+    del self.rows[v]
+    self.stats[rule][0] += 1
+
+  def fix (self, j, val, rule):
+    """ Substitute x_j = val everywhere. """
+    for v in self.col_rows.pop(j):
+      row = self.rows[v]
+      row[1] = row[1] - row[0].pop(j) * val
+    self.z0 = self.z0 + self.c.pop(j) * val
+    self.fixed[j] = val
+    self.stats[rule][1] += 1
+
+  def set_bound (self, j, bound, is_upper):
+    """ Tighten a bound of x_j. Returns False if the bounds cross. """
+    eps = lpdict_module.epsilon
+    if is_upper :
+      if self.integral :
+        bound = self.one * int(math.floor(bound + eps))
+      self.up[j] = min(self.up[j], bound)
+    else :
+      if self.integral :
+        bound = self.one * int(math.ceil(bound - eps))
+      self.lo[j] = max(self.lo[j], bound)
+    return not eps_cmp_gt(self.lo[j], self.up[j])
+
+  def activity (self, a):
+    """ Smallest and largest a . x with x within its bounds. """
+    lo = self.lo ; up = self.up
+    amin = sum(aj * (lo[j] if aj > 0 else up[j]) for j, aj in a.items())
+    amax = sum(aj * (up[j] if aj > 0 else lo[j]) for j, aj in a.items())
+    return amin, amax
+
+  def row_pass (self):
+    """ One pass of the row rules. Returns True if anything changed, or "INFEASIBLE". """
+    changed = False
+    for v in sorted(self.rows):
+      if v not in self.rows :
+        continue
+      a, b = self.rows[v]
+      if len(a) == 0 :
+        if eps_cmp_lt(b, 0) :
+          return "INFEASIBLE"
+        self.remove_row(v, "empty_rows")
+      elif len(a) == 1 :
+        j, aj = a.items()[0]
+        self.remove_row(v, "singleton_rows")
+        if not self.set_bound(j, self.one * b / aj, aj > 0) :
+          return "INFEASIBLE"
+        if eps_cmp_eq(self.lo[j], self.up[j]) :
+          self.fix(j, self.lo[j], "fixed_vars")
+      else :
+        amin, amax = self.activity(a)
+        if eps_cmp_gt(amin, b) :
+          return "INFEASIBLE"
+        if eps_cmp_le(amax, b) :
+          self.remove_row(v, "dominated_rows")
+        elif eps_cmp_eq(amin, b) :
+          bounds = [(j, self.lo[j] if aj > 0 else self.up[j]) for j, aj in a.items()]
+          self.remove_row(v, "forcing_rows")
+          for j, val in bounds:
+            self.fix(j, val, "forcing_rows")
+        else :
+          continue
+      changed = True
+    return changed
+
+  def normalized (self, v):
+    """ The coefficients of row v scaled to a first one of +-1, and its b on the same scale. """
+    a, b  = self.rows[v]
+    scale = self.one * abs(a[min(a)])
+    return tuple(sorted((j, aj / scale) for j, aj in a.items())), b / scale
+
+  def duplicate_pass (self):
+    """ Keep the tightest of the rows that are positive multiples of each other. """
+    changed = False
+    best = {} # normalized coefficients -> (scaled b, row)
+    for v in sorted(self.rows):
+      if len(self.rows[v][0]) == 0 : # left for the next row_pass.
+        continue
+      key, sb = self.normalized(v)
+      if key not in best :
+        best[key] = (sb, v)
+        continue
+      changed = True
+      if eps_cmp_lt(sb, best[key][0]) :
+        self.remove_row(best[key][1], "duplicate_rows")
+        best[key] = (sb, v)
+      else :
+        self.remove_row(v, "duplicate_rows")
+    return changed
+
+  def equality_pass (self):
+    """ Keep one row, as an equality row, of each pair of rows that pins a . x to one value. Returns
+        "INFEASIBLE" if a pair of opposite rows can not both hold, or None. After duplicate_pass, there
+        is at most one row for each normalized key. The other rules only know <= rows, so this comes last. """
+    first = {} # normalized coefficients -> (scaled b, row)
+    for v in sorted(self.rows):
+      if len(self.rows[v][0]) == 0 :
+        continue
+      key, sb = self.normalized(v)
+      neg = tuple((j, -aj) for j, aj in key)
+      if neg in first : # a . x <= sb, and a . x >= -nb from the other row.
+        nb, u = first[neg]
+        if eps_cmp_lt(sb, -nb) :
+          return "INFEASIBLE"
+        if eps_cmp_eq(sb, -nb) :
+          self.remove_row(v, "equality_rows")
+          self.equal.add(u)
+          continue
+      first[key] = (sb, v)
+    return None
+
+  def col_pass (self):
+    changed = False
+    for j in sorted(self.col_rows):
+      if len(self.col_rows[j]) == 0 :
+        if not eps_cmp_gt(self.c[j], 0) :
+          self.fix(j, self.lo[j], "empty_cols")
+        elif self.up[j] < inf :
+          self.fix(j, self.up[j], "empty_cols")
+        else :
+          continue # unbounded, left for the solver to find.
+        changed = True
+    return changed
+
+  def run (self):
+    """ Apply the rules till nothing changes. Returns "INFEASIBLE" or None. """
+    while True :
+      changed = self.row_pass()
+      if changed == "INFEASIBLE" :
+        self.status = changed
+        return changed
+      changed = self.duplicate_pass() or changed
+      changed = self.col_pass() or changed
+      if not changed :
+        self.status = self.equality_pass()
+        return self.status
+
+  def reduce (self, lpd):
+    """ Put the reduced problem into lpd, and hook up postsolve for variable_values. """
+    cols  = [j for j in self.nonbasic if j not in self.fixed]
+    pos   = dict((j, k) for k, j in enumerate(cols))
+    shift = dict((j, self.lo[j]) for j in cols if self.lo[j] != 0)
+
+    basic = [] ; b_values = [] ; A = []
+    for v in sorted(self.rows, key=self.order.get):
+      a, b  = self.rows[v]
+      row   = [0]*len(cols)
+      for j, aj in a.items():
+        row[pos[j]] = -aj
+        b = b - aj * shift.get(j, 0)
+      basic.append(v)
+      b_values.append(b)
+      A.append(row)
+
+    upper    = dict((j, self.up[j] - self.lo[j]) for j in cols if self.up[j] < inf)
+    upper.update((v, 0) for v in self.equal)
+    z_coeffs = [self.z0 + sum(self.c[j] * s for j, s in shift.items())] + [self.c[j] for j in cols]
+    self.shift = shift
+    lpd.init_fn(len(basic), len(cols), basic, cols, b_values, A, z_coeffs, upper)
+    lpd.postsolve = self.postsolve
+
+  def postsolve (self, vvs):
+    """ (var, value) pairs of the reduced dictionary -> (var, value) pairs of the original one. """
+    vals = dict(vvs)
+    x = {}
+    for j in self.nonbasic:
+      x[j] = self.fixed[j] if j in self.fixed else vals[j] + self.shift.get(j, 0)
+    rv = [(j, x[j]) for j in self.nonbasic]
+    for i, v in enumerate(self.basic):
+      rv.append((v, self.orig_b[i] + sum(a * x[j] for j, a in self.orig_A[i].items())))
+    rv.sort()
+    return rv
+
+  def report (self):
+    lines = ["presolve : %-15s removed %5d rows %5d columns" % (r, self.stats[r][0], self.stats[r][1]) for r in rules]
+    return "\n".join(lines)
+
+def presolve (lpd, integral=False):
+  """ Replace lpd by its presolved form, in place. Returns the presolver, for status, stats and report.
+      If presolve finds the problem infeasible, lpd is left as it is, for the solver to report. """
+  p = presolver(lpd, integral)
+  if p.run() is None :
+    p.reduce(lpd)
+  return p
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+
+doc_str = """
+ This file implements the pricing rules of the lpdict class, i.e. how the entering variable is picked
+ among the nonbasic variables with a positive objective coefficient d_j :
+  blands_rule   : the smallest variable index. Never cycles, but takes many pivots.
+  largest_coeff : the largest d_j (Dantzig's rule).
+  largest_step  : the largest gain d_j * step_j, with a ratio test for every candidate.
+  devex         : the largest d_j^2 / w_j, with Devex reference weights w_j.
+  steepest_edge : the largest d_j^2 / g_j, g_j = 1 + |A column j|^2 the squared length of the edge.
+ Every dictionary has its own pricing object, lpd.pricing, which also holds the leaving variable rule.
+ The weights of devex and steepest_edge are updated in pivot, from the pivot row and column, and
+ computed afresh whenever the dictionary changes shape (auxiliarize, cuts, dualize).
+ The rules other than blands_rule can cycle on degenerate dictionaries, so after max_stalls pricing
+ steps without any gain in the objective, Bland's rule takes over till the objective moves again.
+
+ Run as a script, this prints the pivot counts of each rule on the given dictionaries.
+"""
+
+import sys
+import argparse
+from   numbers import Number
+import lpdict as lpdict_module
+
+rules   = ["blands_rule", "largest_coeff", "largest_step", "devex", "steepest_edge"]
+l_rules = ["blands_rule", "opp_blands_rule"]
+
+# Pricing steps without a gain in the objective before Bland's rule takes over.
+max_stalls = 50
+
+class pricing_rule:
+  name = None
+
+  def __init__ (self, l_rule=None):
+    self.l_rule = l_rule or lpdict_module.l_selector # leaving variable rule, see lpdict.find_leaving_variable
+    self.last_z = None
+    self.stalls = 0
+    self.pivots = 0
+    self.bland_steps = 0 # pricing steps done by the Bland fallback.
+
+  def candidates (self, lpd):
+    """ (column, var, d_j) for the nonbasic variables that can enter. """
+    eps_cmp_gt = lpdict_module.eps_cmp_gt
+    nb = lpd.nonbasic_indices
+    return [(j, nb[j], zc) for j, zc in enumerate(lpd.z_coeffs[1:]) if eps_cmp_gt(zc, 0)]
+
+  def stalled (self, lpd):
+    z = lpd.z_coeffs[0]
+    if self.last_z is not None and not lpdict_module.eps_cmp_gt(z, self.last_z):
+      self.stalls += 1
+    else :
+      self.stalls = 0
+    self.last_z = z
+    return self.stalls >= max_stalls
+
+  def entering_variable (self, lpd):
+    cands = self.candidates(lpd)
+    if not cands :
+      return "FINAL"
+    if self.stalled(lpd):
+      self.bland_steps += 1
+      return min(var for j, var, d in cands)
+    return self.choose(lpd, cands)
+
+  def update (self, lpd, p_row, p_col):
+    """ Called by pivot, before the dictionary changes. """
+    self.pivots += 1
+
+class blands_rule (pricing_rule):
+  name = "blands_rule"
+
+  def entering_variable (self, lpd):
+    cands = self.candidates(lpd)
+    if not cands :
+      return "FINAL"
+    return min(var for j, var, d in cands)
+
+class largest_coeff (pricing_rule):
+  name = "largest_coeff"
+
+  def choose (self, lpd, cands):
+    j, var, d = max(cands, key=lambda c: c[2]) # the first of ties.
+    return var
+
+class largest_step (pricing_rule):
+  name = "largest_step"
+
+  def choose (self, lpd, cands):
+    entering_var = None
+    metric       = -1
+    for j, var, d in cands:
+      lv, bound = lpd.find_leaving_variable(var, True)
+      if not isinstance(lv, Number) :
+        return lv
+      if d * bound > metric :
+        entering_var = var
+        metric       = d * bound
+    return entering_var
+
+class weighted_rule (pricing_rule):
+  """ Pricing on d_j^2 / w_j, with the weights kept by variable index. """
+  def __init__ (self, l_rule=None):
+    pricing_rule.__init__(self, l_rule)
+    self.w     = {}
+    self.shape = None # basic and nonbasic indices the weights are for.
+    self.resets = 0
+
+  def check (self, lpd):
+    shape = (tuple(lpd.basic_indices), tuple(lpd.nonbasic_indices))
+    if shape != self.shape :
+      self.w = self.initial_weights(lpd)
+      self.shape  = shape
+      self.resets += 1
+
+  def choose (self, lpd, cands):
+    self.check(lpd)
+    w = self.w
+    best = max(cands, key=lambda c: float(c[2]) * float(c[2]) / w[c[1]])
+    return best[1]
+
+  def update (self, lpd, p_row, p_col):
+    pricing_rule.update(self, lpd, p_row, p_col)
+    self.check(lpd)
+    nb  = lpd.nonbasic_indices
+    ev  = nb[p_col]
+    lv  = lpd.basic_indices[p_row]
+    row = [(j, float(a)) for j, a in lpd.row_entries(p_row) if a != 0]
+    arq = dict(row)[p_col]
+    self.update_weights(lpd, row, p_row, p_col, arq)
+    # After the pivot, lv is nonbasic in the column of ev.
+    basic = list(lpd.basic_indices) ; basic[p_row] = ev
+    nonbasic = list(nb) ; nonbasic[p_col] = lv
+    self.shape = (tuple(basic), tuple(nonbasic))
+
+class devex (weighted_rule):
+  """ Reference weights : w_j = max(w_j, (a_rj/a_rq)^2 w_q), and max(w_q / a_rq^2, 1) for the leaving var. """
+  name = "devex"
+
+  def initial_weights (self, lpd):
+    return dict((var, 1.0) for var in lpd.nonbasic_indices)
+
+  def update_weights (self, lpd, row, p_row, p_col, arq):
+    nb = lpd.nonbasic_indices
+    w  = self.w
+    wq = w.pop(nb[p_col])
+    for j, a in row:
+      if j != p_col :
+        r = a / arq
+        w[nb[j]] = max(w[nb[j]], r * r * wq)
+    w[lpd.basic_indices[p_row]] = max(wq / (arq * arq), 1.0)
+
+class steepest_edge (weighted_rule):
+  """ Exact edge lengths g_j = 1 + sum_i A_ij^2, with the update
+        g_j = max(g_j - 2 r_j (A_q . A_j) + r_j^2 g_q, 1 + r_j^2),  r_j = a_rj / a_rq
+        g   = g_q / a_rq^2 for the leaving var.
+      A_q . A_j needs the rows with a nonzero in the pivot column, which the pivot goes over anyway. """
+  name = "steepest_edge"
+
+  def initial_weights (self, lpd):
+    g = [1.0] * lpd.n
+    for i in range(lpd.m):
+      for j, a in lpd.row_entries(i):
+        if a != 0 :
+          g[j] += float(a) * a
+    return dict(zip(lpd.nonbasic_indices, g))
+
+  def update_weights (self, lpd, row, p_row, p_col, arq):
+    nb   = lpd.nonbasic_indices
+    dots = [0.0] * lpd.n
+    for i, aq in lpd.column_entries(p_col):
+      if aq != 0 :
+        aq = float(aq)
+        for j, a in lpd.row_entries(i):
+          if a != 0 :
+            dots[j] += aq * a
+    g  = self.w
+    gq = g.pop(nb[p_col])
+    for j, a in row:
+      if j != p_col :
+        r = a / arq
+        g[nb[j]] = max(g[nb[j]] - 2 * r * dots[j] + r * r * gq, 1 + r * r)
+    g[lpd.basic_indices[p_row]] = max(gq / (arq * arq), 1.0)
+
+def new_pricing (name=None, l_rule=None):
+  """ A pricing object for a dictionary, by rule name. The default is lpdict.e_selector. """
+  name = name or lpdict_module.e_selector
+  assert name in rules, "Unknown pricing rule " + str(name)
+  assert (l_rule or lpdict_module.l_selector) in l_rules, "Unknown leaving variable rule " + str(l_rule)
+  return globals()[name](l_rule)
+
+def main(argv=None):
+  """ Pivot counts of each rule : solve_lp on each dictionary, as pivot.py -part 123 does. """
+  if argv is None:
+    argv = sys.argv
+
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('lpdicts', nargs='+', help='lpdictionary files')
+  input_parser.add_argument('-rules', default=",".join(rules), help='comma separated pricing rules')
+  input_parser.add_argument('-storage', default='list', choices=lpdict_module.storage_backends, help='dictionary storage backend')
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+  names = args.rules.split(',')
+
+  print "%-32s" % "file" + "".join("%15s" % name for name in names)
+  totals = dict((name, 0) for name in names)
+  for fname in args.lpdicts:
+    counts = [] ; results = []
+    for name in names:
+      lpd = lpdict_module.new_lpdict(args.storage)
+      lpd.init_from_file(fname)
+      lpd.pricing = new_pricing(name)
+      z = lpd.solve_lp()
+      counts.append(lpd.pricing.pivots)
+      results.append(z if not isinstance(z, Number) else round(float(z), 6))
+      totals[name] += lpd.pricing.pivots
+    same = "" if len(set(results)) == 1 else "  objectives differ : " + str(results)
+    print "%-32s" % fname[-32:] + "".join("%15d" % c for c in counts) + same
+  print "%-32s" % "total" + "".join("%15d" % totals[name] for name in names)
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+doc_str = """
+ A result cache for the lpdict solvers, for dictionaries that are solved again and again, e.g. the
+ same test runs or sudoku puzzles. cached_solve stands in front of solve_lp or solve_ilp.
+ The key is a hash of the dictionary as parsed (m, n, indices, b, A, z, upper bounds) and of the
+ solver options that can change the answer (use_fractions, use_dual_for_ilp, the ILP method, the
+ pricing rules, the perturbation, cut pool, branch-and-bound and revised simplex tunables, ...).
+ An entry keeps the result, the final basis and the values of the dictionary's own variables
+ (dictionary_values). For a presolved dictionary, that is the reduced problem : two inputs that
+ presolve to the same dictionary share the entry, and each one's postsolve maps the values back.
+ On a hit for an LP, the dictionary is pivoted straight to the final basis with lpdict.warm_start,
+ so it ends up as solve_lp would have left it. The final dictionary of an ILP also has
+ cut or branch rows, so that one is not rebuilt. Either way, dictionary_values then returns the kept
+ values (and variable_values their postsolve), till the next pivot, so that a hit gives the same answer
+ to the last bit as the first solve.
+ Entries are kept in an LRU in memory, and optionally in a directory, one pickle file per entry,
+ with the least recently used files removed once the directory grows past max_disk_bytes.
+"""
+
+import os
+import hashlib
+import tempfile
+import collections
+import cPickle as pickle
+from   numbers import Number
+import lpdict as lpdict_module
+import branch_and_bound
+import cutpool
+import pricing
+from   lpdict import eps_cmp_eq
+
+# Entries kept in memory.
+max_entries    = 1024
+# Bytes of entry files kept in a cache directory.
+max_disk_bytes = 64 * 2**20
+
+def canon (x):
+  """ A number as text, the same for the same value read from the same file. """
+  return repr(x) if isinstance(x, float) else str(x)
+
+def dictionary_key (lpd, kind):
+  """ Hash of the dictionary and of the solver options, for solving it as kind "lp" or "ilp". """
+  h = hashlib.sha1()
+  def add (*items):
+    h.update(" ".join(canon(x) for x in items))
+    h.update("\n")
+  options = [kind, lpd.storage, lpdict_module.use_fractions, lpdict_module.use_dual_for_ilp,
+             lpdict_module.use_dual_simplex, lpdict_module.lp_method, lpdict_module.use_perturbation,
+             lpdict_module.perturb_after, lpdict_module.perturb_size, lpdict_module.perturb_seed,
+             lpd.pricing.name, lpd.pricing.l_rule, pricing.max_stalls]
+  if lpdict_module.lp_method in ["revised", "interior"] : # imported here, so that numpy is only needed if used.
+    import revised_simplex
+    options += [revised_simplex.refactor_period]
+  if lpdict_module.lp_method == "interior" :
+    import interior_point
+    options += [interior_point.tolerance, interior_point.max_iterations, interior_point.divergence,
+                interior_point.step_fraction]
+  if kind == "ilp" :
+    options += [lpdict_module.ilp_method, lpdict_module.use_cut_pool, lpdict_module.cut_min_frac, lpdict_module.max_cut_rows,
+                branch_and_bound.node_selection, branch_and_bound.branching,
+                branch_and_bound.bc_cut_rounds, branch_and_bound.max_nodes,
+                cutpool.max_cuts_per_round, cutpool.max_age, cutpool.max_active_cuts, cutpool.min_frac,
+                cutpool.max_parallelism, cutpool.max_stall_rounds, cutpool.max_rounds, cutpool.min_gain]
+  add(*options)
+  add(lpd.m, lpd.n)
+  add(*lpd.basic_indices)
+  add(*lpd.nonbasic_indices)
+  add(*lpd.b_values)
+  for i in range(lpd.m):
+    add(*[x for entry in lpd.row_entries(i) if entry[1] != 0 for x in entry])
+  add(*lpd.z_coeffs)
+  add(*[x for var in sorted(lpd.upper) for x in (var, lpd.upper[var])])
+  add(*sorted(lpd.complemented))
+  return h.hexdigest()
+
+class result_cache:
+  def __init__ (self, directory=None, max_entries=max_entries, max_disk_bytes=max_disk_bytes):
+    self.directory      = directory
+    self.max_entries    = max_entries
+    self.max_disk_bytes = max_disk_bytes
+    self.entries        = collections.OrderedDict() # key -> entry, least recently used first.
+    self.stats          = { "hits" : 0, "memory_hits" : 0, "disk_hits" : 0, "misses" : 0, "stores" : 0,
+                            "evictions" : 0, "disk_evictions" : 0, "restore_failures" : 0 }
+    if directory and not os.path.isdir(directory) :
+      os.makedirs(directory)
+
+  def path (self, key):
+    return os.path.join(self.directory, key + ".pickle")
+
+  def lookup (self, key):
+    """ The entry for key, or None. """
+    if key in self.entries :
+      entry = self.entries.pop(key)
+      self.entries[key] = entry
+      self.stats["memory_hits"] += 1
+      return entry
+    if self.directory :
+      try :
+        with open(self.path(key), 'rb') as f:
+          entry = pickle.load(f)
+        os.utime(self.path(key), None) # recently used.
+      except (IOError, OSError, EOFError, pickle.UnpicklingError) :
+        return None
+      self.remember(key, entry)
+      self.stats["disk_hits"] += 1
+      return entry
+    return None
+
+  def remember (self, key, entry):
+    self.entries[key] = entry
+    while len(self.entries) > self.max_entries :
+      self.entries.popitem(last=False)
+      self.stats["evictions"] += 1
+
+  def store (self, key, entry):
+    self.remember(key, entry)
+    self.stats["stores"] += 1
+    if self.directory :
+      # Written to a temporary file and renamed, so that other processes on the same directory never see half an entry.
+      fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+      with os.fdopen(fd, 'wb') as f:
+        pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+      os.rename(tmp, self.path(key))
+      self.evict_files()
+
+  def evict_files (self):
+    """ Remove the least recently used entry files till the directory is within max_disk_bytes. """
+    files = []
+    for name in os.listdir(self.directory):
+      if name.endswith(".pickle") :
+        try :
+          st = os.stat(os.path.join(self.directory, name))
+        except OSError : # removed by another process.
+          continue
+        files.append((st.st_mtime, st.st_size, name))
+    total = sum(size for mtime, size, name in files)
+    for mtime, size, name in sorted(files):
+      if total <= self.max_disk_bytes :
+        break
+      try :
+        os.remove(os.path.join(self.directory, name))
+        self.stats["disk_evictions"] += 1
+      except OSError :
+        pass
+      total -= size
+
+  def solve (self, lpd, kind, solve=None):
+    """ Solve lpd as kind "lp" (solve_lp) or "ilp" (solve_ilp), or with solve() if given, through the cache. """
+    key   = dictionary_key(lpd, kind)
+    entry = self.lookup(key)
+    if entry is not None :
+      self.restore(lpd, kind, entry)
+      self.stats["hits"] += 1
+      return entry["result"]
+    self.stats["misses"] += 1
+    if solve is None :
+      solve = lpd.solve_lp if kind == "lp" else lpd.solve_ilp
+    result = solve()
+    if result in ["LIMIT", "limit"] : # stopped short, see lpdict.limited.
+      return result
+    self.store(key, { "result" : result,
+                      "basis"  : lpd.export_basis(),
+                      "values" : lpd.dictionary_values() if isinstance(result, Number) else None })
+    return result
+
+  def restore (self, lpd, kind, entry):
+    """ Put the cached solution into lpd. """
+    if kind == "ilp" :
+      lpd.ilp_stats = { "method" : "cache" }
+    if not isinstance(entry["result"], Number) : # infeasible or unbounded, nothing more to restore.
+      return
+    if kind == "lp" :
+      if not (lpd.warm_start(entry["basis"]) and eps_cmp_eq(lpd.z_coeffs[0], entry["result"])) :
+        self.stats["restore_failures"] += 1 # round-off on the way.
+    lpd.solution = (tuple(lpd.basic_indices), list(entry["values"]))
+
+# One cache per directory (None for memory only) in each process, so that it lives across solves.
+caches = {}
+
+def get_cache (directory=None):
+  if directory not in caches :
+    caches[directory] = result_cache(directory)
+  return caches[directory]
+
+def cached_solve (lpd, kind, directory=None, solve=None):
+  """ result_cache.solve on the cache of this process for directory. """
+  return get_cache(directory).solve(lpd, kind, solve)
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+
+doc_str = """
+ This file implements a revised simplex solver for the problem held in an lpdict.
+ The dictionary  x_B = b + A x_N  is read as the equality system  x_B - A x_N = b,
+ whose constraint matrix M = [ I | -A ] is kept read-only.
+ Only a factored basis is maintained : an LU factorization plus an eta file
+ (product form updates), refactorized every refactor_period pivots.
+ Each iteration computes just the reduced costs (one btran and one pricing pass)
+ and the entering column (one ftran), instead of rewriting the whole dictionary.
+ The final dictionary is written back into the lpdict, so that variable_values,
+ add_ilp_cut and solve_ilp keep working as usual.
+ The pivots go into the lp_stats of the lpdict, and into its timers if it has them on, but the
+ pivot callbacks are not called : there is no dictionary to show them till the write back.
+"""
+
+import time
+import numpy as np
+import lpdict as lpdict_module
+
+# Number of eta updates before the basis is factorized again from scratch.
+refactor_period = 50
+
+class basis_factor:
+  """ LU factorization P B = L U of a basis matrix, followed by a file of eta updates. """
+  def __init__ (self, B=None, m=0):
+    self.etas = []
+    if B is None : # identity basis, no factorization needed.
+      self.m  = m
+      self.LU = None
+      return
+    m  = len(B)
+    LU = np.array(B, dtype=np.float64)
+    perm = np.arange(m)
+    for k in range(m):
+      p = k + int(np.argmax(np.abs(LU[k:,k])))
+      assert LU[p,k] != 0, "singular basis"
+      if p != k :
+        LU[[k,p]]   = LU[[p,k]]
+        perm[[k,p]] = perm[[p,k]]
+      LU[k+1:,k] /= LU[k,k]
+      LU[k+1:,k+1:] -= np.outer(LU[k+1:,k], LU[k,k+1:])
+    self.m    = m
+    self.LU   = LU
+    self.perm = perm
+
+  def ftran (self, v):
+    """ Solve B x = v. v can be a vector or a matrix of columns. """
+    x = np.array(v, dtype=np.float64)
+    if self.LU is not None :
+      LU = self.LU
+      x  = x[self.perm]
+      for i in range(1, self.m):
+        x[i] -= np.dot(LU[i,:i], x[:i])
+      for i in reversed(range(self.m)):
+        x[i] = (x[i] - np.dot(LU[i,i+1:], x[i+1:])) / LU[i,i]
+    for r, alpha in self.etas :
+      xr = x[r] / alpha[r]
+      x -= np.multiply.outer(alpha, xr)
+      x[r] = xr
+    return x
+
+  def btran (self, v):
+    """ Solve B^T y = v. """
+    y = np.array(v, dtype=np.float64)
+    for r, alpha in reversed(self.etas):
+      y[r] = (y[r] - (np.dot(alpha, y) - alpha[r] * y[r])) / alpha[r]
+    if self.LU is not None :
+      LU = self.LU
+      for i in range(self.m):
+        y[i] = (y[i] - np.dot(LU[:i,i], y[:i])) / LU[i,i]
+      for i in reversed(range(self.m - 1)):
+        y[i] -= np.dot(LU[i+1:,i], y[i+1:])
+      t = y
+      y = np.empty_like(t)
+      y[self.perm] = t
+    return y
+
+  def update (self, r, alpha):
+    """ Column r of the basis is replaced by the column whose ftran is alpha. """
+    self.etas.append((r, alpha))
+
+class revised_simplex:
+  def __init__ (self, lpd, period=None):
+    m = lpd.m ; n = lpd.n
+    self.lpd = lpd
+    self.m   = m
+    self.n   = n
+    self.refactor_period = refactor_period if period is None else period
+
+    # Columns are addressed by position : 0..m-1 are the current basic variables (identity columns),
+    # m..m+n-1 are the current nonbasic variables (columns of -A), and m+n is x0 once it is added.
+    self.vars  = np.array(list(lpd.basic_indices) + list(lpd.nonbasic_indices), dtype=np.int64)
+    self.A0    = np.array(lpd.dense_A(), dtype=np.float64).reshape(m, n) # read-only.
+    self.b0    = np.array(lpd.b_values, dtype=np.float64)
+    self.cost  = np.zeros(m+n)
+    self.cost[m:] = lpd.z_coeffs[1:]
+    self.z0    = lpd.z_coeffs[0]
+    self.has_x0 = False
+
+    self.basis    = range(m)        # position of the basic variable of each row.
+    self.nonbasic = range(m, m+n)   # positions of the nonbasic variables, in dictionary column order.
+    self.factor   = basis_factor(m=m)
+    self.xB       = self.b0.copy()
+    self.pivots   = 0
+
+  def column (self, p):
+    """ Column of M for position p. """
+    m = self.m
+    if p < m :
+      col = np.zeros(m)
+      col[p] = 1
+      return col
+    elif p < m + self.n :
+      return -self.A0[:,p-m]
+    else : # x0
+      return -np.ones(m)
+
+  def columns (self, positions):
+    return np.array([self.column(p) for p in positions]).reshape(len(positions), self.m).T
+
+  def prices (self, y):
+    """ y^T M for every position. """
+    pr = np.concatenate((y, -np.dot(y, self.A0)))
+    if self.has_x0 :
+      pr = np.append(pr, -y.sum())
+    return pr
+
+  def refactor (self):
+    self.factor = basis_factor(self.columns(self.basis))
+    self.xB     = self.factor.ftran(self.b0)
+
+  def do_pivot (self, q, r, alpha):
+    """ position q enters the basis, in place of the basic variable of row r. """
+    t = self.xB[r] / alpha[r]
+    self.xB -= t * alpha
+    self.xB[r] = t
+    p = self.basis[r]
+    self.basis[r] = q
+    self.nonbasic[self.nonbasic.index(q)] = p
+    self.factor.update(r, alpha)
+    self.pivots += 1
+    if len(self.factor.etas) >= self.refactor_period :
+      self.refactor()
+
+  def objective (self, cost, z0=0):
+    return z0 + np.dot(cost[self.basis], self.xB)
+
+  def run (self, cost):
+    """ Primal simplex with Bland's rule, for the objective given by cost. """
+    eps    = lpdict_module.epsilon
+    lpd    = self.lpd
+    limit  = lpd.limit
+    timers = lpd.timers
+    while True :
+      if limit is not None and limit.reached() :
+        return "LIMIT"
+      if timers is not None :
+        t = time.time()
+      y = self.factor.btran(cost[self.basis])
+      d = cost - self.prices(y)
+
+      # Pricing : smallest variable index with a positive reduced cost.
+      nb   = np.array(self.nonbasic, dtype=np.int64)
+      cand = nb[d[nb] > eps]
+      if timers is not None :
+        t = lpd.lap("pricing", t)
+      if len(cand) == 0 :
+        return "FINAL"
+      entering = int(min(cand, key=lambda p: self.vars[p]))
+
+      # Ratio test on the entering column only.
+      alpha = self.factor.ftran(self.column(entering))
+      rows  = np.nonzero(alpha > eps)[0]
+      if len(rows) == 0 :
+        return "UNBOUNDED"
+      bounds = self.xB[rows] / alpha[rows]
+      ok     = bounds >= -eps
+      rows   = rows[ok] ; bounds = bounds[ok]
+      if len(rows) == 0 :
+        return "UNBOUNDED"
+      ties = rows[bounds < bounds.min() + eps]
+      r    = min(ties, key=lambda i: self.vars[self.basis[i]])
+      if timers is not None :
+        t = lpd.lap("ratio_test", t)
+      self.do_pivot(entering, r, alpha)
+      if timers is not None :
+        lpd.lap("update", t)
+      lpd.lp_stats["pivots"] += 1
+      if bounds.min() <= eps : # degenerate, no progress.
+        lpd.lp_stats["degenerate_pivots"] += 1
+      if limit is not None :
+        limit.pivots += 1
+
+  def add_x0 (self):
+    """ Add the auxiliary variable x0 and do the first aux pivot, like lpdict.auxiliarize + first_aux_pivot """
+    self.has_x0 = True
+    x0 = self.m + self.n
+    self.vars = np.append(self.vars, 0)
+    self.nonbasic.append(x0)
+    self.cost = np.append(self.cost, 0)
+    aux_cost  = np.zeros(len(self.cost))
+    aux_cost[x0] = -1
+    r = int(np.argmin(self.xB))
+    self.do_pivot(x0, r, self.factor.ftran(self.column(x0)))
+    return aux_cost
+
+  def drop_x0 (self):
+    """ Make sure x0 is nonbasic, then remove it. """
+    x0 = self.m + self.n
+    if x0 in self.basis : # degenerate, x0 is basic at 0.
+      r   = self.basis.index(x0)
+      rho = self.prices(self.factor.btran(np.eye(self.m)[r]))
+      cands = [p for p in self.nonbasic if p != x0 and abs(rho[p]) > lpdict_module.epsilon]
+      q   = min(cands, key=lambda p: self.vars[p])
+      self.do_pivot(q, r, self.factor.ftran(self.column(q)))
+    self.nonbasic.remove(x0)
+
+  def solve_lp (self):
+    """ Same results as lpdict.solve_lp, with the final dictionary written back to the lpdict. """
+    m = self.m
+    if m > 0 and lpdict_module.eps_cmp_lt(self.xB.min(), 0) :
+      aux_cost = self.add_x0()
+      stats    = self.lpd.lp_stats
+      pivots   = stats["pivots"]
+      rv       = self.run(aux_cost)
+      stats["phase1_pivots"] += stats["pivots"] - pivots
+      if rv == "LIMIT" :
+        return "LIMIT"
+      if lpdict_module.eps_cmp_ne(self.objective(aux_cost), 0):
+        return "INFEASIBLE"
+      self.drop_x0()
+    rv = self.run(self.cost)
+    if rv != "FINAL":
+      return rv
+    self.write_back()
+    return self.lpd.z_coeffs[0]
+
+  def write_back (self):
+    """ Rebuild the dictionary for the final basis inside the lpdict. """
+    self.refactor()
+    m = self.m ; n = self.n
+    cols = self.factor.ftran(self.columns(self.nonbasic)).reshape(m, n)
+    y    = self.factor.btran(self.cost[self.basis])
+    zc   = self.cost[self.nonbasic] - self.prices(y)[self.nonbasic]
+    z0   = self.objective(self.cost, self.z0)
+    row_vars, column_vars = self.lpd.row_vars, self.lpd.column_vars
+    self.lpd.init_fn(m, n,
+                     [int(self.vars[p]) for p in self.basis],
+                     [int(self.vars[p]) for p in self.nonbasic],
+                     self.xB.tolist(),
+                     (-cols).tolist(),
+                     [float(z0)] + zc.tolist())
+    self.lpd.row_vars, self.lpd.column_vars = row_vars, column_vars # of the problem as given, see dual_values.
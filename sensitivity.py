@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+doc_str = """
+ Sensitivity analysis with lpdict.dual_values, reduced_costs, rhs_ranging, cost_ranging and
+ parametric_rhs, all read off the final dictionary of one solve. Run as a script, this prints them
+ for each given dictionary. With -check, each of them is also checked against cold solves of changed
+ copies of the problem : b_r or c_j moved inside its range has to change the objective by the dual
+ value or by the variable value times the change, and the objective of the parametric sweep along a
+ random direction has to match at every breakpoint. It then prints the solves and pivots that the
+ sweep took against those of the cold solves at the breakpoints.
+"""
+
+import sys
+import random
+import argparse
+from   numbers import Number
+import lpdict as lpdict_module
+from   lpdict import new_lpdict, storage_backends
+from   warm_start import new_variant
+
+def close (a, b):
+  if not (isinstance(a, Number) and isinstance(b, Number)) :
+    return a == b
+  return abs(a - b) <= 1e-6 * (1 + abs(b))
+
+def inside (lo, hi):
+  """ Changes to try within the range [lo, hi] : halfway to each end, at most 1 away. """
+  return [s * min(abs(end), 2) / 2 for s, end in [(-1, lo), (1, hi)] if end != 0]
+
+def cold_solve (base, storage, db=None, dc=None):
+  """ solve_lp of base with b_values + db and z_coeffs + dc, for the {var : change} db and dc. Returns (z, pivots). """
+  b = list(base.b_values)
+  z = list(base.z_coeffs)
+  for var, d in (db or {}).items():
+    i = base.basic_indices.index(var)
+    b[i] = b[i] + d
+  for var, d in (dc or {}).items():
+    j = base.nonbasic_indices.index(var) + 1
+    z[j] = z[j] + d
+  lpd = new_variant(base, storage, b, z)
+  return lpd.solve_lp(), lpd.pricing.pivots
+
+def check (base, final, z, storage, rng, t_max):
+  """ Check final (solved) against cold solves. Returns (checks, failures, sweep pivots, cold pivots). """
+  checks = [] # (what, expected, got)
+  values = dict(final.variable_values())
+  duals  = dict(final.dual_values())
+  for var, lo, hi in final.rhs_ranging():
+    for d in inside(lo, hi):
+      checks.append((("b", var, d), z + duals[var] * d, cold_solve(base, storage, db={var : d})[0]))
+  for var, lo, hi in final.cost_ranging():
+    for d in inside(lo, hi):
+      checks.append((("c", var, d), z + values[var] * d, cold_solve(base, storage, dc={var : d})[0]))
+
+  deltas = dict((var, rng.randint(-3, 3)) for var in final.row_vars)
+  sweep  = final.copy()
+  dual_pivots = sweep.lp_stats["dual_pivots"] # lp_stats is shared with final.
+  status, segments = sweep.parametric_rhs(deltas, t_max)
+  cold_pivots = 0
+  for t0, t1, z0, z1, basic in segments:
+    r, pivots = cold_solve(base, storage, db=dict((var, d * t1) for var, d in deltas.items()))
+    checks.append((("t", t1), z1, r))
+    cold_pivots += pivots
+  if status != "FINAL" : # infeasible a bit further on.
+    t = (segments[-1][1] if segments else 0) + 1e-3
+    checks.append((("t", t), status, cold_solve(base, storage, db=dict((var, d * t) for var, d in deltas.items()))[0]))
+  failures = [(what, expected, got) for what, expected, got in checks if not close(got, expected)]
+  for what, expected, got in failures[:5]:
+    print "  %s : expected %s, got %s" % (what, expected, got)
+  return len(checks), len(failures), len(segments), sweep.lp_stats["dual_pivots"] - dual_pivots, cold_pivots
+
+def report (final):
+  values = dict(final.variable_values())
+  print "  %8s %14s %14s %14s %14s" % ("row var", "dual value", "b down", "b up", "value")
+  for (var, y), (v, lo, hi) in zip(final.dual_values(), final.rhs_ranging()):
+    print "  %8d %14.6g %14.6g %14.6g %14.6g" % (var, y, lo, hi, values[var])
+  print "  %8s %14s %14s %14s %14s" % ("col var", "reduced cost", "c down", "c up", "value")
+  for (var, c), (v, lo, hi) in zip(final.reduced_costs(), final.cost_ranging()):
+    print "  %8d %14.6g %14.6g %14.6g %14.6g" % (var, c, lo, hi, values[var])
+
+def main(argv=None):
+  if argv is None:
+    argv = sys.argv
+
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('lpdicts', nargs='+', help='lpdictionary files')
+  input_parser.add_argument('-check'  , action='store_true', help='check against cold solves, and only print a line per file')
+  input_parser.add_argument('-t_max'  , default=3, type=float, help='how far the -check sweep goes along its direction')
+  input_parser.add_argument('-storage', default='list', choices=storage_backends, help='dictionary storage backend')
+  input_parser.add_argument('-lp_method', default=lpdict_module.lp_method, choices=lpdict_module.lp_methods, help='how solve_lp solves each LP')
+  input_parser.add_argument('-seed'   , default=0, type=int, help='random seed of the -check sweep directions')
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+  rng = random.Random(args.seed)
+  lpdict_module.lp_method = args.lp_method
+
+  if args.check :
+    print "%-32s %8s %8s %8s %12s %12s" % ("file", "checks", "failed", "bases", "sweep pivots", "cold pivots")
+  failed = 0
+  for fname in args.lpdicts:
+    base = new_lpdict("list") # plain lists, to make the changed copies from.
+    base.init_from_file(fname)
+    final = new_variant(base, args.storage, list(base.b_values), list(base.z_coeffs))
+    z = final.solve_lp()
+    if not isinstance(z, Number) :
+      print "%-32s skipped, %s" % (fname[-32:], z)
+      continue
+    if not args.check :
+      print "%s : z = %s" % (fname, z)
+      report(final)
+      continue
+    checks, failures, bases, sweep_pivots, cold_pivots = check(base, final, z, args.storage, rng, args.t_max)
+    failed += failures
+    print "%-32s %8d %8d %8d %12d %12d" % (fname[-32:], checks, failures, bases, sweep_pivots, cold_pivots)
+  return 1 if failed else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -2,12 +2,57 @@
 
 doc_str = """
  Solve sudoku.
+ The model is built from the nonzeros of its rows, so that it fits in memory up to -sN 5 (25x25) with
+ -storage sparse. -timing prints the time it takes to build, next to the time of the solve.
+ With -propagate, the cells that naked and hidden singles force are filled in first, and the ILP only
+ gets the candidate values of the cells left open, if any, see sudoku.propagate.
+ With -stream, the puzzles of a file or stdin are read one at a time and solved on -jobs worker processes,
+ each of which builds the parts of the model that are the same for every puzzle once, see template. The
+ solutions are printed in the order of the puzzles as they are done, and the puzzles per second and the
+ percentiles of the solve time of a puzzle go to stderr.
 """
 
 import sys, os
+import time
 import argparse
+import collections
+import multiprocessing
+import lpdict as lpdict_module
+import branch_and_bound
+import parallel_bb
+import pivot
+import presolve
+import pricing
+import result_cache
 from   numbers import Number
-from   lpdict import lpdict, convert_to_num, table_to_str, line_to_num_list
+from   StringIO import StringIO
+from   lpdict import new_lpdict, storage_backends, convert_to_num, table_to_str, line_to_num_list, eps_cmp_eq, percentile
+
+# The values of the line format of -stream, 1 to 25. 0 or . is an empty cell.
+line_digits = "123456789ABCDEFGHIJKLMNOP"
+
+# The parts of the model that are the same for every puzzle of a size, built once per process, see template.
+templates = {}
+
+def template (sN):
+  """ The units, the peers of each cell, and the variables and the rows of rules 1 to 4 of the full model, for size sN. """
+  if sN not in templates :
+    N = sN * sN ; NN = N * N
+    rows    = [[(r, c) for c in range(N)] for r in range(N)]
+    cols    = [[(r, c) for r in range(N)] for c in range(N)]
+    squares = [[((sq // sN) * sN + r, (sq % sN) * sN + c) for r in range(sN) for c in range(sN)] for sq in range(N)]
+    units   = rows + cols + squares
+    peers   = {}
+    for unit in units:
+      for cell in unit:
+        peers.setdefault(cell, set()).update(unit)
+    for cell in peers:
+      peers[cell].discard(cell)
+    A_rows  = [[r*NN + c*N + val for val in range(N)] for r in range(N) for c in range(N)]
+    A_rows += [[r*NN + c*N + val for (r, c) in unit] for unit in units for val in range(N)]
+    templates[sN] = { "units" : units, "peers" : peers, "rows" : A_rows,
+                      "variables" : [(i // NN, (i % NN) // N, i % N) for i in range(N*NN)] }
+  return templates[sN]
 
 class sudoku :
   def __init__ (self, sN=2):
@@ -23,6 +68,8 @@ class sudoku :
 
     self.A = []
     self.b = []
+    self.variables   = None # (row, col, val) of each column of A, see create_Ab.
+    self.propagation = None # what propagate removed.
 
   def __str__ (self):
     table = []
@@ -44,16 +91,30 @@ class sudoku :
 
     return table_to_str(table)
 
+  def line (self):
+    """ The sudoku as a line of N*N characters, see line_digits. """
+    return "".join(line_digits[x-1] if x else '.' for row in self.sarray for x in row)
+
+  def read_rows (self, fh, sffmt):
+    """ Read the N rows of the sudoku from fh, in fmt 1 or 2, see init_from_file. Returns self.sarray. """
+    N = self.N
+    for i in range(N):
+      if sffmt == 2 :
+        fh.readline() # discard h-line.
+        line = line_to_num_list(fh, '|')[1:-1]
+      else :
+        line = line_to_num_list(fh, None)
+      self.sarray[i] = [x if 1 <= x <= N else 0 for x in line]
+    if sffmt == 2 :
+      fh.readline() # discard h-line.
+    return self.sarray
+
   def init_from_file (self,sfile,sffmt):
     N = self.N
     # First fmt is just a list of numbers, one line per row, whitespace separators.
     if sffmt == None or sffmt == 1:
-      sep = None
       with open(sfile, 'r') as fh:
-        for i in range(N):
-          line = line_to_num_list(fh, sep)
-          line = [x if 1 <= x <= N else 0 for x in line]
-          self.sarray[i] = line
+        self.read_rows(fh, 1)
         s = fh.readline() # Try to read past end.
         if s == "":
           return
@@ -62,149 +123,346 @@ class sudoku :
 
     # second fmt is the output we print being read back in.
     if sffmt == None or sffmt == 2:
-      sep = '|'
       with open(sfile, 'r') as fh:
-        for i in range(N):
-          fh.readline() # discard h-line.
-          line = line_to_num_list(fh, sep)
-          line = line[1:-1]
-          line = [x if 1 <= x <= N else 0 for x in line]
-          self.sarray[i] = line
-        fh.readline() # discard h-line.
+        self.read_rows(fh, 2)
         s = fh.readline() # Try to read past end.
         if s == "":
           return
         elif sffmt == 2:
           assert 0, "Characters left over while using sffmt = 2"
 
+  def units (self):
+    """ The cells of each row, then of each col, then of each square. """
+    return template(self.sN)["units"]
+
+  def propagate (self):
+    """ Fill in the cells that are forced : naked singles (a cell with one candidate value left) and hidden
+        singles (a value with one cell left in a row, col or square), till there are none. The LP then only
+        gets the candidate values of the cells still open, see create_Ab. Returns False if the puzzle turns
+        out to have no solution. self.propagation counts what was removed, see propagation_report. """
+    N = self.N
+    units = self.units()
+    peers = template(self.sN)["peers"]
+
+    sarray = self.sarray
+    stats  = { "givens" : 0, "naked_singles" : 0, "hidden_singles" : 0 }
+    cands  = {}
+    for (r, c) in peers:
+      if sarray[r][c] == 0 :
+        cands[(r, c)] = set(range(1, N+1)) - set(sarray[pr][pc] for (pr, pc) in peers[(r, c)])
+      else :
+        stats["givens"] += 1
+        if sarray[r][c] in [sarray[pr][pc] for (pr, pc) in peers[(r, c)]] :
+          return self.propagated(False, stats, cands)
+
+    def place (cell, val):
+      sarray[cell[0]][cell[1]] = val
+      del cands[cell]
+      for peer in peers[cell]:
+        if peer in cands :
+          cands[peer].discard(val)
+
+    changed = True
+    while changed :
+      changed = False
+      for cell in sorted(cands):
+        if cell not in cands :
+          continue
+        if len(cands[cell]) == 0 :
+          return self.propagated(False, stats, cands)
+        if len(cands[cell]) == 1 :
+          place(cell, iter(cands[cell]).next())
+          stats["naked_singles"] += 1
+          changed = True
+      for unit in units:
+        placed = set(sarray[r][c] for (r, c) in unit)
+        for val in range(1, N+1):
+          if val in placed :
+            continue
+          cells = [cell for cell in unit if cell in cands and val in cands[cell]]
+          if len(cells) == 0 :
+            return self.propagated(False, stats, cands)
+          if len(cells) == 1 :
+            place(cells[0], val)
+            placed.add(val)
+            stats["hidden_singles"] += 1
+            changed = True
+    return self.propagated(True, stats, cands)
+
+  def propagated (self, feasible, stats, cands):
+    """ The end of propagate : keep the candidate values of the open cells as the variables of the LP. """
+    N = self.N
+    stats["open_cells"] = len(cands)
+    stats["feasible"]   = feasible
+    self.propagation = stats
+    self.variables   = [(r, c, val-1) for (r, c) in sorted(cands) for val in sorted(cands[(r, c)])]
+    return feasible
+
+  def is_solved (self):
+    """ Whether every row, col and square has each value once. """
+    full = set(range(1, self.N+1))
+    return all(set(self.sarray[r][c] for (r, c) in unit) == full for unit in self.units())
+
+  def propagation_report (self):
+    p = self.propagation
+    if not p["feasible"] :
+      return "propagation : no solution, %d cells filled in before that" % (p["naked_singles"] + p["hidden_singles"])
+    return "propagation : %d givens, %d naked singles, %d hidden singles, %d cells left open, %d of %d variables left" % (
+      p["givens"], p["naked_singles"], p["hidden_singles"], p["open_cells"], len(self.variables), self.NNN)
+
   def create_Ab (self):
     """ Create the A and b matrices that represent the constraints with Ax = b"
         x is defined using N variables for each position, 
         i.e. each variable is xij_eq_k and can only take values 0 and 1.
+        Every coefficient of A is 1, so each row is kept as the list of the columns of its nonzeros.
+        The columns are those of self.variables : every xij_eq_k, at column i*NN + j*N + k, or after
+        propagate only the candidate values of the open cells. Then the cells that are filled in have
+        no variables, and neither do the values that are already in a row, col or square.
     """
     A  = [] ; b  = []
     N   = self.N   ; NN  = self.NN  ; 
     NNN = self.NNN ; sN  = self.sN  ; 
+    if self.variables is None :
+      self.variables = template(sN)["variables"]
+    full   = len(self.variables) == NNN
+
+    def add_rows (cells):
+      """ Each value once over cells : a row for each value that has a variable in cells, or if none does and
+          none of cells has it, an empty row, which makes the LP infeasible. """
+      placed = set(self.sarray[r][c] for (r, c) in cells)
+      for val in range(N):
+        cols = [column[(r, c, val)] for (r, c) in cells if (r, c, val) in column]
+        if cols or val+1 not in placed :
+          A.append(cols)
+          b.append(1)
 
     # Rule 1 : Each position can have only one value.
     # So, summation over k xij_eq_k = 1
-    for i in range(NN):
-      A_row = [0]*(i*N) + [1]*N + [0]*((NN-i-1)*N)
-      A.append(A_row)
-      b.append(1)
-
-    # NOTE : val in the following 4 loops is 0-based, not 1-based.
-
     # Rule 2 : Each row can have only one of each value.
-    for row in range(N):
-      for val in range(N):
-        A_row = [0]*NNN
-        for i in range(NNN):
-          irow = i // NN
-          if irow == row and i % N == val:
-            A_row[i] = 1
-        A.append(A_row)
-        b.append(1)
-
     # Rule 3 : Each col can have only one of each value.
-    for col in range(N):
-      for val in range(N):
-        A_row = [0]*NNN
-        for i in range(NNN):
-          icol = (i % NN) // N
-          if icol == col and i % N == val:
-            A_row[i] = 1
-        A.append(A_row)
-        b.append(1)
-
     # Rule 4 : Each square can have only one of each value.
-    for sq in range(N):
-      for val in range(N):
-        A_row = [0]*NNN
-        for i in range(NNN):
-          irow = i // NN
-          icol = (i % NN) // N
-          isq  = (irow // sN) * sN + (icol // sN)
-          if isq == sq and i % N == val:
-            A_row[i] = 1
-        A.append(A_row)
-        b.append(1)
+    # NOTE : val in these and rule 5 is 0-based, not 1-based.
+    if full : # the same rows for every puzzle of this size.
+      A = list(template(sN)["rows"])
+      b = [1] * len(A)
+    else :
+      column = dict((v, j) for j, v in enumerate(self.variables))
+      for r in range(N):
+        for c in range(N):
+          cols = [column[(r, c, val)] for val in range(N) if (r, c, val) in column]
+          if cols :
+            A.append(cols)
+            b.append(1)
+      for unit in self.units():
+        add_rows(unit)
 
     # Rule 5 : The specified values must be respected.
-    for row in range(N):
-      for col in range(N):
-        sval = self.sarray[row][col]
-        if sval != 0 :
-          for val in range(N):
-            pos = row*NN + col*N + val
-            A_row = [0]*(pos) + [1] + [0]*(NNN - pos - 1)
-            b_val = 1 if (sval == val+1) else 0
-            A.append(A_row)
-            b.append(b_val)
+    # Only for the full model : otherwise the cells that are filled in have no variables.
+    if full :
+      for row in range(N):
+        for col in range(N):
+          sval = self.sarray[row][col]
+          if sval != 0 :
+            for val in range(N):
+              A.append([row*NN + col*N + val])
+              b.append(1 if (sval == val+1) else 0)
 
     self.A = A
     self.b = b
 
-    #Ab = zip(A,b)
-    #for x in Ab:
-    #  print x
-
-  def init_lpdict (self, lpd):
+  def init_lpdict (self, lpd, use_bounds=False):
     """ 
     Our constraints are Ax = b, but our ILP solver only handles <= constraints.
     So we convert Ax = b into Ax <= b ; -Ax <= -b .
     And hence our dictionary will look like
      b -A
     -b  A
+    With use_bounds, each row is an equality row instead (its slack variable has upper bound 0),
+    and every xij_eq_k has upper bound 1.
+    The rows go to lpd as their nonzeros, see lpdict.init_from_rows.
+    Variable j is self.variables[j-1], all NNN of them unless propagate left fewer.
     """
     self.create_Ab()
+    if use_bounds :
+      return self.init_bounded_lpdict(lpd)
 
-    NNN = self.NNN
-
-    m = 2*len(self.A) # number of constraints.
-    n = NNN           # number of variables.
-    #print m,n
-
-    nonbasic_indices = range(    1, NNN+1)   # decision variables
-    basic_indices    = range(NNN+1, NNN+1+m) # slack variables
-
-    def minus(x): return -x
+    m = 2*len(self.A)         # number of constraints.
+    n = len(self.variables)   # number of variables.
 
-    b        = self.b
-    minus_b  = map(minus, b)
-    b_values = b + minus_b
-    #print b_values
+    nonbasic_indices = range(  1, n+1)     # decision variables
+    basic_indices    = range(n+1, n+1+m)   # slack variables
 
-    A        = self.A
-    minus_A  = [map(minus,row) for row in A]
-    A_values = minus_A + A
-    #print A_values
+    b_values = self.b + [-x for x in self.b]
+    A_rows   = [dict.fromkeys(cols, -1) for cols in self.A] + [dict.fromkeys(cols, 1) for cols in self.A]
 
     # Set up some objective - doesn't really matter, since it will be replaced by the feasibility objective -x0
-    z_coeffs = [1] + [0]*(NNN)
+    z_coeffs = [1] + [0]*(n)
 
-    lpd.init_fn(m, n, basic_indices, nonbasic_indices, b_values, A_values, z_coeffs)
+    lpd.init_from_rows(m, n, basic_indices, nonbasic_indices, b_values, A_rows, z_coeffs)
+
+  def init_bounded_lpdict (self, lpd):
+    n   = len(self.variables)
+    m   = len(self.A)
+    nonbasic_indices = range(  1, n+1)
+    basic_indices    = range(n+1, n+1+m)
+    A_rows   = [dict.fromkeys(cols, -1) for cols in self.A]
+    z_coeffs = [1] + [0]*(n)
+    upper    = dict([(v, 1) for v in nonbasic_indices] + [(v, 0) for v in basic_indices])
+    lpd.init_from_rows(m, n, basic_indices, nonbasic_indices, list(self.b), A_rows, z_coeffs, upper)
 
   def lpsoln_to_sudoku_format (self, lpd):
     sarray = self.sarray
-    N      = self.N  
-    NN     = self.NN 
-    NNN    = self.NNN
+    n      = len(self.variables)
 
     self.old_sarray = sarray # save off input.
     vvs = lpd.variable_values()
     for var , val in vvs:
-      if var <= NNN and val == 1:
-        i = var - 1
-        irow = i // NN
-        icol = (i % NN) // N
-        ival = (i % N) + 1
+      if var <= n and eps_cmp_eq(val, 1):
+        irow, icol, ival = self.variables[var - 1]
+        ival = ival + 1
         if sarray[irow][icol] == 0:
           sarray[irow][icol] = ival
         else : 
           assert (sarray[irow][icol] == ival)
 
 
+def set_options (args):
+  """ Module options from the command line. Also the pool initializer for -stream. """
+  lpdict_module.lp_method     = args.lp_method
+  lpdict_module.ilp_method    = args.ilp_method
+  lpdict_module.use_cut_pool  = args.cut_pool
+  lpdict_module.use_perturbation = args.perturb
+  branch_and_bound.node_selection = args.node_selection
+  branch_and_bound.branching      = args.branching
+
+def solve (mysudoku, args, err):
+  """ Fill in mysudoku as args say, with the statistics to err. Returns its status : solved, infeasible,
+      limit (at -time_limit or -max_pivots), or wrong, if what the ILP gave is not a solution. """
+  if args.propagate :
+    feasible = mysudoku.propagate()
+    print >> err, mysudoku.propagation_report()
+    if not feasible :
+      return "infeasible"
+    if mysudoku.propagation["open_cells"] == 0 : # solved, no ILP needed.
+      return "solved" if mysudoku.is_solved() else "wrong"
+
+  mylpd = new_lpdict(args.storage)
+  mylpd.pricing = pricing.new_pricing(args.pricing)
+  pivot.instrument(args, mylpd, err)
+  t0 = time.time()
+  mysudoku.init_lpdict(mylpd, args.bounds)
+  build = time.time() - t0
+  shape = (mylpd.m, mylpd.n, (1 if args.bounds else 2) * sum(len(cols) for cols in mysudoku.A))
+  if args.presolve :
+    ps = presolve.presolve(mylpd, integral=True)
+    print >> err, ps.report()
+  if args.debug :
+    print "Start lp"
+    print mylpd
+
+  limits = pivot.solve_limits(args, err)
+  if args.jobs and not args.stream and args.ilp_method in ["bb", "bc"] : # the cutting plane rounds are sequential.
+    run = lambda: parallel_bb.solve_ilp(mylpd, args.jobs, **limits)
+  else :
+    run = lambda: mylpd.solve_ilp(**limits)
+  t0 = time.time()
+  if args.cache is not None :
+    fz = result_cache.cached_solve(mylpd, "ilp", args.cache or None, run)
+  else :
+    fz = run()
+  if args.timing :
+    print >> err, "build %.3f s (%d x %d, %d nonzeros), solve %.3f s" % ((build,) + shape + (time.time() - t0,))
+  if args.ilp_stats :
+    print >> err, mylpd.ilp_stats
+  if args.lp_stats :
+    print >> err, mylpd.lp_stats
+  if args.stats is not None :
+    pivot.write_stats(args, mylpd, err)
+  if args.cache_stats and args.cache is not None :
+    print >> err, result_cache.get_cache(args.cache or None).stats
+  #assert (fz == mysudoku.NN)
+  if not isinstance(fz, Number) : # limit or infeasible, no solution to show.
+    return fz
+
+  mysudoku.lpsoln_to_sudoku_format(mylpd)
+  return "solved" if mysudoku.is_solved() else "wrong"
+
+def read_puzzles (fh, sN):
+  """ The puzzles of a -stream from fh, one at a time as (line number, rows) : each one either a line of
+      N*N characters, each 0 or . for an empty cell or one of the first N of line_digits, or in format 1 or 2
+      of init_from_file. Blank lines and lines that start with # are skipped. rows is None for a line that is
+      one word, but not a puzzle in the line format. """
+  N = sN * sN
+  cells  = "0." + line_digits[:N]
+  lineno = 0
+  while True :
+    line = fh.readline()
+    lineno += 1
+    if line == "" :
+      return
+    text = line.strip()
+    if text == "" or text.startswith('#') :
+      continue
+    if len(text.split()) == 1 and not text.startswith('-') :
+      if len(text) != N*N or any(ch.upper() not in cells for ch in text) :
+        yield lineno, None
+      else :
+        yield lineno, [[line_digits.find(ch.upper()) + 1 for ch in text[r*N:(r+1)*N]] for r in range(N)]
+    elif text.startswith('-') : # the first h-line of format 2.
+      yield lineno, sudoku(sN).read_rows(StringIO(line + "".join(fh.readline() for i in range(2*N))), 2)
+      lineno += 2*N
+    else :
+      yield lineno, sudoku(sN).read_rows(StringIO(line + "".join(fh.readline() for i in range(N-1))), 1)
+      lineno += N-1
+
+def stream_task (task):
+  """ Worker : solve one puzzle of a -stream. Returns (its output line, status, seconds, statistics). """
+  args, lineno, rows = task
+  if rows is None :
+    N = args.sN * args.sN
+    return "invalid", "invalid", 0.0, "line %d : not %d cells of 0, . or %s\n" % (lineno, N*N, line_digits[:N])
+  mysudoku = sudoku(args.sN)
+  mysudoku.sarray = rows
+  err = StringIO()
+  t0  = time.time()
+  status = solve(mysudoku, args, err)
+  seconds = time.time() - t0
+  line = mysudoku.line() if status in ["solved", "wrong"] else status
+  return line, status, seconds, err.getvalue()
+
+def run_stream (args):
+  """ Solve each puzzle of -stream on args.jobs worker processes, and print a line for each, in the order
+      of the puzzles, as soon as it is done : the solution as a line of N*N characters, or its status.
+      A line that is not a puzzle (see read_puzzles) gets status invalid, and its line number goes to stderr.
+      Then the puzzles per second and the percentiles of the solve time of a puzzle go to stderr.
+      Returns 1 if an ILP gave a wrong solution or a line was invalid. """
+  fh    = sys.stdin if args.stream == '-' else open(args.stream)
+  tasks = ((args, lineno, rows) for lineno, rows in read_puzzles(fh, args.sN))
+  pool  = multiprocessing.Pool(args.jobs, set_options, (args,)) if args.jobs > 1 else None
+  t0 = time.time()
+  latencies = [] ; statuses = collections.Counter()
+  try :
+    results = pool.imap(stream_task, tasks, chunksize=1) if pool else (stream_task(t) for t in tasks)
+    for line, status, seconds, err in results:
+      print line
+      sys.stdout.flush()
+      sys.stderr.write(err)
+      statuses[status] += 1
+      if status != "invalid" :
+        latencies.append(seconds)
+  finally :
+    if pool :
+      pool.close()
+      pool.join()
+    if fh is not sys.stdin :
+      fh.close()
+  wall = time.time() - t0
+  if latencies :
+    print >> sys.stderr, "%d puzzles in %.3f s, %.1f puzzles/s, %s   solve p50 %.2f ms   p90 %.2f ms   p99 %.2f ms   max %.2f ms" % (
+      len(latencies), wall, len(latencies) / wall, " ".join("%s %d" % item for item in sorted(statuses.items())),
+      1000 * percentile(latencies, 0.5), 1000 * percentile(latencies, 0.9), 1000 * percentile(latencies, 0.99), 1000 * max(latencies))
+  return 1 if statuses["wrong"] or statuses["invalid"] else 0
+
 def main(argv=None):
   """main function"""
 
@@ -217,30 +475,55 @@ def main(argv=None):
   input_parser.add_argument('-sN', default=2, type=int, help='sudoku size param. 2 = 4x4 sudoku, 3 = 9x9 sudoku.')
   input_parser.add_argument('-sfile', help='file specifying the sudoku array.')
   input_parser.add_argument('-sffmt', default=None, type=int, help='specify the fmt of the sfile')
+  input_parser.add_argument('-storage', default='list', choices=storage_backends, help='dictionary storage backend')
+  input_parser.add_argument('-lp_method', default=lpdict_module.lp_method, choices=lpdict_module.lp_methods, help='how solve_lp solves each LP')
+  input_parser.add_argument('-ilp_method', default=lpdict_module.ilp_method, choices=lpdict_module.ilp_methods, help='how solve_ilp solves the ILP')
+  input_parser.add_argument('-node_selection', default=branch_and_bound.node_selection, choices=branch_and_bound.node_selections, help='node order for -ilp_method bb/bc')
+  input_parser.add_argument('-branching', default=branch_and_bound.branching, choices=branch_and_bound.branchings, help='branching rule for -ilp_method bb/bc')
+  input_parser.add_argument('-jobs', default=None, type=int, help='with -ilp_method bb or bc, solve the ILP with parallel branch-and-bound on this many worker processes (-ilp_method cuts runs on one), or with -stream, the puzzles')
+  input_parser.add_argument('-stream', nargs='?', const='-', default=None, help='solve each puzzle of the given file, or of stdin, and print its solution as a line, see read_puzzles')
+  input_parser.add_argument('-pricing', default=lpdict_module.e_selector, choices=pricing.rules, help='entering variable rule, see pricing.py')
+  input_parser.add_argument('-cut_pool', action='store_true', help='select, age and drop Gomory cuts with a cut pool')
+  input_parser.add_argument('-bounds', action='store_true', help='equality rows and 0/1 variable bounds, instead of pairs of <= rows')
+  input_parser.add_argument('-propagate', action='store_true', help='fill in the forced cells first, and report what that removed to stderr')
+  input_parser.add_argument('-presolve', action='store_true', help='reduce the problem with presolve first, and report what each rule removed to stderr')
+  input_parser.add_argument('-perturb', action='store_true', help='perturb b_values when the simplex stalls on degenerate pivots')
+  input_parser.add_argument('-cache', nargs='?', const='', default=None, help='look up and keep the solution in a result cache, in memory or also in the given directory')
+  input_parser.add_argument('-cache_stats', action='store_true', help='print the result cache hits and misses to stderr')
+  input_parser.add_argument('-ilp_stats', action='store_true', help='print ILP statistics to stderr')
+  input_parser.add_argument('-lp_stats', action='store_true', help='print pivot counts to stderr')
+  input_parser.add_argument('-stats', nargs='?', const='', default=None, help='print the solve statistics to stderr, or append them as a JSON line to the given file')
+  input_parser.add_argument('-profile', action='store_true', help='time pricing, ratio tests and updates, for -stats')
+  input_parser.add_argument('-trace', action='store_true', help='print each simplex and dual simplex pivot to stderr')
+  input_parser.add_argument('-time_limit', default=None, type=float, help='seconds for the solve, which then prints limit')
+  input_parser.add_argument('-max_pivots', default=None, type=int, help='pivots for the solve, over all its LPs')
+  input_parser.add_argument('-progress', action='store_true', help='print the best bound and incumbent of the solve to stderr as it goes')
+  input_parser.add_argument('-timing', action='store_true', help='print the seconds to build the model and to solve it to stderr')
   input_parser.add_argument('-debug')
   try :
     args = input_parser.parse_args(argv[1:])
   except SystemExit :
     return 1
 
+  set_options(args)
+  if args.stream :
+    return run_stream(args)
+
   mysudoku = sudoku(args.sN)
   mysudoku.init_from_file(args.sfile, args.sffmt)
   if args.debug :
     print "Input sudoku"
     print mysudoku
 
-  mylpd = lpdict()
-  mysudoku.init_lpdict(mylpd)
-  if args.debug :
-    print "Start lp"
-    print mylpd
-
-  fz = mylpd.solve_ilp()
-  #assert (fz == mysudoku.NN)
-
-  mysudoku.lpsoln_to_sudoku_format(mylpd)
-
-  print mysudoku
+  status = solve(mysudoku, args, sys.stderr)
+  if status in ["solved", "wrong"] :
+    print mysudoku
+  else : # no solution to show.
+    print status
+  if status == "wrong" :
+    print >> sys.stderr, "not a solution"
+    return 1
+  return 0
 
 
 if __name__ == "__main__":
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+doc_str = """
+ A long running solver server for the lpdict class, so that many small dictionaries can be solved
+ without paying for process startup and imports each time.
+ The front end is a threaded socket server, on a unix domain socket or a localhost TCP port, and the
+ solves run on a pool of worker processes.
+ A request is a JSON header line followed by the dictionary, in the text or binary (binary_dict.py)
+ dictionary file format :
+   {"id" : any, "length" : bytes of the dictionary, "args" : [pivot.py options], "timeout" : seconds}
+ and the reply is one JSON line, with the id and the fields of pivot.py -batch (status, objective,
+ pivots, wall, output). The timeout is also the -time_limit of the solve, unless the args give a shorter
+ one, so that it stops with status LIMIT (limit for part 4) and whatever it found by then. A solve that
+ is still running alarm_grace later, outside the pivot loops, is cut off with status TIMEOUT.
+ A connection can send requests without waiting for the replies (pipelining), and the replies come
+ back in request order. At most max_queue requests are waiting or running at a time. Past that, the
+ server stops reading requests till a slot frees up, so that clients slow down instead of the queue
+ growing. A client has to read its replies as it goes, or it can stall its own connection.
+
+ Run as a script, this serves on -address till it is killed, or with -solve, it is a small client.
+ solver_load.py is a load generator.
+"""
+
+import sys, os
+import json
+import signal
+import socket
+import argparse
+import threading
+import Queue
+import SocketServer
+import multiprocessing
+import pivot
+
+# Requests waiting or running at a time, over all connections.
+max_queue       = 64
+# Seconds for a solve, unless the request gives its own timeout. None for no limit.
+default_timeout = 60.0
+# Requests the -solve client keeps in flight on its connection.
+pipeline_depth  = 8
+# Seconds past the timeout before the alarm cuts a solve off.
+alarm_grace     = 1.0
+# Seconds the front end waits for a worker past the timeout, before it gives up on the reply.
+timeout_grace   = 5.0
+
+class solve_timeout (BaseException):
+  """ Raised in a worker by the timeout alarm. Not an Exception, so that solve_task does not catch it. """
+  pass
+
+def on_alarm (signum, frame):
+  raise solve_timeout()
+
+def init_worker ():
+  signal.signal(signal.SIGINT, signal.SIG_IGN) # the server shuts the pool down.
+  signal.signal(signal.SIGALRM, on_alarm)
+
+def solve_request (task):
+  """ Worker : solve one dictionary. Returns the reply, without the id. """
+  argv, text, timeout = task
+  try :
+    args = pivot.arg_parser().parse_args(argv)
+  except SystemExit :
+    return { "status" : "error", "error" : "bad pivot.py options " + " ".join(argv) }
+  pivot.set_options(args)
+  if timeout :
+    args.time_limit = min(args.time_limit or timeout, timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout + alarm_grace)
+  try :
+    rv = pivot.solve_task(args, None, text)
+  except solve_timeout :
+    rv = { "status" : "TIMEOUT", "objective" : None, "pivots" : None, "wall" : timeout, "output" : "" }
+  finally :
+    signal.setitimer(signal.ITIMER_REAL, 0)
+  return rv
+
+class request_handler (SocketServer.StreamRequestHandler):
+  """ One thread per connection reads the requests, and a second one writes the replies in order. """
+
+  def handle (self):
+    replies = Queue.Queue()
+    writer  = threading.Thread(target=self.write_replies, args=(replies,))
+    writer.start()
+    try :
+      while True :
+        line = self.rfile.readline()
+        if not line :
+          break
+        try :
+          header = json.loads(line)
+          text   = self.rfile.read(header["length"])
+        except (ValueError, KeyError, TypeError) :
+          replies.put(({ "status" : "error", "error" : "bad request header" }, None, None))
+          break
+        self.server.slots.acquire() # backpressure : no more reading till a slot is free.
+        timeout = header.get("timeout", self.server.default_timeout)
+        result  = self.server.pool.apply_async(solve_request, ((header.get("args", []), text, timeout),))
+        replies.put((header.get("id"), result, timeout))
+    finally :
+      replies.put(None)
+      writer.join()
+
+  def write_replies (self, replies):
+    while True :
+      item = replies.get()
+      if item is None :
+        return
+      rid, result, timeout = item
+      if result is None : # the reply is rid itself.
+        rv = rid
+      else :
+        try :
+          rv = result.get(timeout + timeout_grace if timeout else None)
+        except multiprocessing.TimeoutError :
+          rv = { "status" : "TIMEOUT" }
+        except Exception as e :
+          rv = { "status" : "error", "error" : repr(e) }
+        finally :
+          self.server.slots.release()
+        rv["id"] = rid
+      try :
+        self.wfile.write(json.dumps(rv, sort_keys=True) + "\n")
+        self.wfile.flush()
+      except socket.error : # the client has gone, but the slots still have to be released.
+        pass
+
+class tcp_server (SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+  daemon_threads      = True
+  allow_reuse_address = True
+
+class unix_server (SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+  daemon_threads = True
+
+def parse_address (address):
+  """ host:port for TCP, or the path of a unix domain socket (anything with a /). """
+  if "/" in address :
+    return socket.AF_UNIX, address
+  host, port = address.rsplit(":", 1)
+  return socket.AF_INET, (host, int(port))
+
+def make_server (address, jobs=None, timeout=default_timeout, queue=max_queue):
+  """ A server on address, with a pool of jobs workers (one per cpu by default). """
+  pool = multiprocessing.Pool(jobs, init_worker) # before the socket, so that the workers do not hold it.
+  family, addr = parse_address(address)
+  if family == socket.AF_UNIX :
+    if os.path.exists(addr) :
+      os.unlink(addr)
+    server = unix_server(addr, request_handler)
+  else :
+    server = tcp_server(addr, request_handler)
+  server.pool            = pool
+  server.slots           = threading.BoundedSemaphore(queue)
+  server.default_timeout = timeout
+  return server
+
+def serve (server):
+  """ Serve till SIGTERM or SIGINT, then shut the workers down. """
+  def on_term (signum, frame):
+    raise KeyboardInterrupt()
+  signal.signal(signal.SIGTERM, on_term)
+  try :
+    server.serve_forever()
+  except KeyboardInterrupt :
+    pass
+  finally :
+    signal.signal(signal.SIGTERM, signal.SIG_IGN) # a second signal must not cut the shutdown short.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    server.server_close()
+    server.pool.terminate()
+    server.pool.join()
+    if server.address_family == socket.AF_UNIX and os.path.exists(server.server_address) :
+      os.unlink(server.server_address)
+
+class solver_client:
+  """ Requests go out with send, and their replies come back in the same order with receive. """
+
+  def __init__ (self, address):
+    family, addr = parse_address(address)
+    self.sock    = socket.socket(family, socket.SOCK_STREAM)
+    self.sock.connect(addr)
+    self.rfile   = self.sock.makefile('rb')
+    self.next_id = 0
+
+  def send (self, text, args=None, timeout=None):
+    """ Send a dictionary, given as a string, to be solved with the pivot.py options args. Returns the id. """
+    rid = self.next_id
+    self.next_id += 1
+    header = { "id" : rid, "length" : len(text), "args" : args or [] }
+    if timeout is not None :
+      header["timeout"] = timeout
+    self.sock.sendall(json.dumps(header) + "\n" + text)
+    return rid
+
+  def receive (self):
+    line = self.rfile.readline()
+    assert line, "the solver server closed the connection"
+    return json.loads(line)
+
+  def solve (self, text, args=None, timeout=None):
+    self.send(text, args, timeout)
+    return self.receive()
+
+  def close (self):
+    self.rfile.close()
+    self.sock.close()
+
+def main(argv=None):
+  """ Serve, or with -solve, send the files to a server and print the replies like pivot.py does. """
+  if argv is None:
+    argv = sys.argv
+
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('-address', default='127.0.0.1:7707', help='host:port, or the path of a unix domain socket')
+  input_parser.add_argument('-jobs'   , default=None, type=int, help='solver worker processes, one per cpu by default')
+  input_parser.add_argument('-timeout', default=default_timeout, type=float, help='seconds for each solve, 0 for no limit')
+  input_parser.add_argument('-max_queue', default=max_queue, type=int, help='requests waiting or running at a time')
+  input_parser.add_argument('-solve'  , nargs='+', help='client : dictionary files to solve on the server')
+  input_parser.add_argument('-args'   , default='', help='client : pivot.py options for the -solve files, e.g. "-part 4"')
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+
+  if args.solve :
+    client = solver_client(args.address)
+    failed = 0
+    for done, fname in enumerate(args.solve):
+      while client.next_id < len(args.solve) and client.next_id - done < pipeline_depth :
+        with open(args.solve[client.next_id], 'rb') as f:
+          client.send(f.read(), args.args.split())
+      rv = client.receive()
+      sys.stdout.write(rv.get("output", ""))
+      if rv["status"] in ["error", "TIMEOUT"] :
+        print >> sys.stderr, fname, rv["status"], rv.get("error", "")
+        failed += 1
+    client.close()
+    return 1 if failed else 0
+
+  serve(make_server(args.address, args.jobs, args.timeout or None, args.max_queue))
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+doc_str = """
+ Load generator for solver_daemon.py : sends the given dictionaries, round robin, over a number of
+ connections with a number of requests in flight on each, and reports the latency percentiles
+ (from send to reply) and the throughput. The replies are checked against the expected output files,
+ as pivot.py -batch does. With -spawn, it starts its own server, and stops it at the end.
+ With -baseline, the same requests are also run as one pivot.py process each, for comparison.
+"""
+
+import sys, os
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+import collections
+import pivot
+import solver_daemon
+from   lpdict import percentile
+
+def run_connection (address, texts, count, depth, args, timeout, results):
+  """ Send count requests, keeping depth of them in flight. Appends (text index, latency, reply) to results. """
+  client = solver_daemon.solver_client(address)
+  sent_at = {}
+  for done in range(count):
+    while client.next_id < count and client.next_id - done < depth :
+      k = client.next_id
+      sent_at[k] = time.time()
+      client.send(texts[k % len(texts)], args, timeout)
+    rv = client.receive()
+    results.append((rv["id"] % len(texts), time.time() - sent_at.pop(rv["id"]), rv))
+  client.close()
+
+def run_processes (files, count, args):
+  """ The -baseline : count pivot.py runs, one process each. Returns the latencies. """
+  latencies = []
+  pivot_py  = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pivot.py")
+  with open(os.devnull, "w") as devnull:
+    for k in range(count):
+      t0 = time.time()
+      subprocess.call([sys.executable, pivot_py] + args + ["-lpdict", files[k % len(files)]], stdout=devnull)
+      latencies.append(time.time() - t0)
+  return latencies
+
+def report (name, latencies, wall):
+  print "%-10s %8d requests %8.3f s %10.1f req/s   p50 %8.2f ms   p99 %8.2f ms   max %8.2f ms" % (
+    name, len(latencies), wall, len(latencies) / wall,
+    1000 * percentile(latencies, 0.5), 1000 * percentile(latencies, 0.99), 1000 * max(latencies))
+
+def spawn_server (address, jobs):
+  """ Start solver_daemon.py on address, and wait till it takes connections. """
+  cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "solver_daemon.py"), "-address", address]
+  if jobs :
+    cmd += ["-jobs", str(jobs)]
+  proc = subprocess.Popen(cmd)
+  for i in range(100):
+    try :
+      solver_daemon.solver_client(address).close()
+      return proc
+    except Exception :
+      time.sleep(0.1)
+  proc.terminate()
+  raise RuntimeError("solver_daemon.py did not start on " + address)
+
+def main(argv=None):
+  if argv is None:
+    argv = sys.argv
+
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('-address' , default=None, help='server address, see solver_daemon.py. A temporary unix socket with -spawn')
+  input_parser.add_argument('-files'   , default='ilpTests/unitTests/*.output', help='dictionaries, as for pivot.py -batch')
+  input_parser.add_argument('-args'    , default='-part 4', help='pivot.py options for each request')
+  input_parser.add_argument('-requests', default=1000, type=int, help='requests in all')
+  input_parser.add_argument('-connections', default=4, type=int, help='client connections')
+  input_parser.add_argument('-depth'   , default=8, type=int, help='requests in flight on each connection')
+  input_parser.add_argument('-timeout' , default=None, type=float, help='seconds for each solve')
+  input_parser.add_argument('-spawn'   , action='store_true', help='start a server for the run')
+  input_parser.add_argument('-jobs'    , default=None, type=int, help='workers of the spawned server')
+  input_parser.add_argument('-baseline', default=0, type=int, help='also run this many requests as pivot.py processes')
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+
+  files = pivot.batch_files(args.files)
+  texts = []
+  for fname in files:
+    with open(fname, 'rb') as f: # text or binary dictionaries.
+      texts.append(f.read())
+  solve_args = args.args.split()
+  address = args.address
+  if address is None :
+    address = os.path.join(tempfile.gettempdir(), "solver_load.%d.sock" % os.getpid()) if args.spawn else "127.0.0.1:7707"
+  proc = spawn_server(address, args.jobs) if args.spawn else None
+
+  try :
+    results = [] # list.append is atomic, so the threads share it.
+    per_connection = [args.requests // args.connections + (c < args.requests % args.connections) for c in range(args.connections)]
+    threads = [threading.Thread(target=run_connection,
+                                args=(address, texts, count, args.depth, solve_args, args.timeout, results))
+               for count in per_connection if count]
+    t0 = time.time()
+    for t in threads:
+      t.start()
+    for t in threads:
+      t.join()
+    wall = time.time() - t0
+  finally :
+    if proc :
+      proc.terminate()
+      proc.wait()
+
+  statuses = collections.Counter(rv["status"] for k, latency, rv in results)
+  wrong    = sum(1 for k, latency, rv in results if pivot.batch_expected(files[k], rv.get("output", "")) is False)
+  report("daemon", [latency for k, latency, rv in results], wall)
+  if args.baseline :
+    t0 = time.time()
+    latencies = run_processes(files, args.baseline, solve_args)
+    report("processes", latencies, time.time() - t0)
+  print "statuses :", dict(statuses), "  wrong output :", wrong
+  if len(results) != args.requests or wrong or statuses["error"] or statuses["TIMEOUT"] :
+    return 1
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main())
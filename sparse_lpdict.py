@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+doc_str = """
+ This file implements a sparse storage for the lpdict class.
+ Each row of A is a dict from column number to value, holding only the nonzeros,
+ and each column keeps the set of rows in which it is nonzero.
+ A pivot then only touches the nonzeros of the pivot row and the pivot column.
+ The fill-in (growth of the number of nonzeros) is tracked, e.g. across Gomory cut rounds.
+"""
+
+from   lpdict import lpdict, on_lists, one, frac, is_integer
+
+class sparse_lpdict (lpdict):
+  storage = "sparse"
+
+  def __init__ (self):
+    lpdict.__init__(self)
+    self.rows        = [] # rows[i] is {col : value} for the nonzeros of A[i]
+    self.cols        = [] # cols[j] is the set of rows i with a nonzero in column j
+    self.packed      = False
+    self.nnz         = 0
+    self.initial_nnz = 0
+    self.max_nnz     = 0
+    self.nnz_history = [] # nnz after each round of ILP cuts.
+
+  def init_fn (self,m,n,basic_indices,nonbasic_indices,b_values,A, z_coeffs, upper=None):
+    """ Rows of A can be given either as dense lists, or directly as {col : value} dicts. """
+    lpdict.init_fn(self, m, n, basic_indices, nonbasic_indices, b_values, A, z_coeffs, upper)
+    self.pack()
+    self.initial_nnz = self.nnz
+
+  def init_from_rows (self, m, n, basic_indices, nonbasic_indices, b_values, rows, z_coeffs, upper=None):
+    self.init_fn(m, n, basic_indices, nonbasic_indices, b_values, rows, z_coeffs, upper)
+
+  def pack (self):
+    """ Move the dense list storage of A into rows and cols. """
+    self.rows = []
+    self.cols = [set() for j in range(self.n)]
+    for i, row in enumerate(self.A):
+      if isinstance(row, dict):
+        srow = dict((j,v) for j,v in row.items() if v != 0)
+      else :
+        srow = dict((j,v) for j,v in enumerate(row) if v != 0)
+      for j in srow:
+        self.cols[j].add(i)
+      self.rows.append(srow)
+    self.A      = None
+    self.packed = True
+    self.count_nnz()
+
+  def unpack (self):
+    """ Move A back into dense lists, so that the base class methods can work on it. """
+    self.A      = self.dense_A()
+    self.rows   = []
+    self.cols   = []
+    self.packed = False
+
+  def dense_A (self):
+    n = self.n
+    A = []
+    for srow in self.rows:
+      row = [0]*n
+      for j,v in srow.items():
+        row[j] = v
+      A.append(row)
+    return A
+
+  def count_nnz (self):
+    self.nnz     = sum(len(r) for r in self.rows)
+    self.max_nnz = max(self.max_nnz, self.nnz)
+
+  def density (self):
+    if self.m == 0 or self.n == 0:
+      return 0.0
+    return float(self.nnz) / (self.m * self.n)
+
+  def fill_in_stats (self):
+    return { "nnz"         : self.nnz,
+             "initial_nnz" : self.initial_nnz,
+             "max_nnz"     : self.max_nnz,
+             "fill_in"     : self.nnz - self.initial_nnz,
+             "density"     : self.density(),
+             "nnz_history" : self.nnz_history }
+
+  def column_entries (self, col):
+    return [(i, self.rows[i][col]) for i in sorted(self.cols[col])]
+
+  def row_entries (self, row):
+    return sorted(self.rows[row].items())
+
+  def pivot (self, entering_var, leaving_var):
+    p_col = self.nonbasic_indices.index(entering_var)
+    p_row = self.basic_indices.index(leaving_var)
+    self.pricing.update(self, p_row, p_col)
+
+    rows = self.rows # short names.
+    cols = self.cols
+
+    # First pivot the row with the leaving_var
+    prow = rows[p_row]
+    aij = - prow[p_col]
+    prow[p_col] = -1
+    if aij != 1 :
+      for i in prow:
+        prow[i] = one * prow[i] / aij
+      self.b_values[p_row] = one * self.b_values[p_row] / aij
+    prow_items = prow.items()
+    b_p = self.b_values[p_row]
+
+    # Now pivot the rows that have a nonzero in the pivot column.
+    # The pivot column stays nonzero in exactly those rows, so cols[p_col] does not change.
+    for j in list(cols[p_col]):
+      if j != p_row :
+        row = rows[j]
+        ajp = row.pop(p_col)
+        for i, v in prow_items:
+          if i in row :
+            nv = row[i] + ajp * v
+            if nv == 0 : # cancellation
+              del row[i]
+              cols[i].discard(j)
+              self.nnz -= 1
+            else :
+              row[i] = nv
+          else : # fill-in
+            row[i] = ajp * v
+            cols[i].add(j)
+            self.nnz += 1
+        self.nnz -= 1 # for p_col, which was popped and then added back above.
+        self.b_values[j] = self.b_values[j] + ajp * b_p
+    self.max_nnz = max(self.max_nnz, self.nnz)
+
+    # And switch the lists of indices.
+    self.basic_indices[p_row]    = entering_var
+    self.nonbasic_indices[p_col] = leaving_var
+
+    # Finally pivot the objective rows, which are kept dense.
+    for zrow in self.z_coeffs, self.shdw_z_coeffs:
+      if len(zrow) > 0:
+        ajp = zrow[p_col+1]
+        zrow[p_col+1] = 0
+        if ajp != 0 :
+          for i, v in prow_items:
+            zrow[i+1] = zrow[i+1] + ajp * v
+          zrow[0] = zrow[0] + ajp * b_p
+
+    return self.z_coeffs[0]
+
+  def complement (self, var):
+    u = self.upper[var]
+    if var in self.nonbasic_indices :
+      j = self.nonbasic_indices.index(var)
+      for i in self.cols[j]:
+        a = self.rows[i][j]
+        self.b_values[i] = self.b_values[i] + a * u
+        self.rows[i][j]  = -a
+      for zrow in self.z_coeffs, self.shdw_z_coeffs:
+        if len(zrow) > 0:
+          zrow[0]   = zrow[0] + zrow[j+1] * u
+          zrow[j+1] = -zrow[j+1]
+    else :
+      i = self.basic_indices.index(var)
+      self.b_values[i] = u - self.b_values[i]
+      self.rows[i]     = dict((j, -a) for j, a in self.rows[i].items())
+    self.complemented ^= set([var])
+
+  bounded_auxiliarize = on_lists(lpdict.bounded_auxiliarize)
+
+  def auxiliarize (self): # Convert to auxiliary dictionary
+    n = self.n
+    for row in self.rows:
+      row[n] = 1
+    self.cols.append(set(range(self.m)))
+    self.nnz += self.m
+    self.nonbasic_indices.append(0)
+    self.z_coeffs.append(0)
+    self.shdw_z_coeffs = self.z_coeffs
+    self.z_coeffs = [0]*(self.n+1) + [-1]
+    self.n += 1
+    self.large_value += 1
+
+  def unauxiliarize (self): # Convert back to regular form.
+    c0 = self.nonbasic_indices.index(0)
+    self.nnz -= len(self.cols[c0])
+    del self.cols[c0]
+    for i, row in enumerate(self.rows):
+      row.pop(c0, None)
+      self.rows[i] = dict((j if j < c0 else j-1, v) for j,v in row.items())
+    self.z_coeffs      = self.z_coeffs[:c0+1]      + self.z_coeffs[c0+2:]
+    self.shdw_z_coeffs = self.shdw_z_coeffs[:c0+1] + self.shdw_z_coeffs[c0+2:]
+    self.nonbasic_indices.remove(0)
+    self.n -= 1
+    self.large_value -= 1
+    self.z_coeffs = self.shdw_z_coeffs
+    self.shdw_z_coeffs = [0]*(self.n+1)
+
+  def dualize (self):
+    assert not self.upper, "dualize does not handle upper bounds"
+    self.lp_stats["dualize_calls"] += 1
+    new_rows = [dict() for j in range(self.n)]
+    for i, row in enumerate(self.rows):
+      for j, v in row.items():
+        new_rows[j][i] = -v
+    new_cols = [set(row) for row in self.rows]
+    new_b = [-x for x in self.z_coeffs[1:]]
+    new_z = [-self.z_coeffs[0]] + [-x for x in self.b_values]
+
+    self.m, self.n = self.n, self.m
+    self.nonbasic_indices, self.basic_indices = self.basic_indices, self.nonbasic_indices
+    self.b_values         = new_b
+    self.rows             = new_rows
+    self.cols             = new_cols
+    self.z_coeffs         = new_z
+    self.shdw_z_coeffs    = [0]*(self.n+1)
+
+  def add_ilp_cut (self, k, use_z):
+    """ k is the row based on which we need to add a cut """
+    if use_z:
+      assert not is_integer(self.z_coeffs[0])
+      new_b_val = -frac(self.z_coeffs[0])
+      src_items = [(j, zc) for j, zc in enumerate(self.z_coeffs[1:]) if zc != 0]
+    else :
+      assert k < self.m
+      assert not is_integer(self.b_values[k])
+      new_b_val = -frac(self.b_values[k])
+      src_items = self.rows[k].items()
+    return self.add_row(new_b_val, dict((j, frac(-akj)) for j, akj in src_items))
+
+  def add_row (self, new_b_val, new_A_row):
+    """ new_A_row can be a dense list or a {col : value} dict. """
+    new_var_num = self.next_var
+    if not isinstance(new_A_row, dict):
+      new_A_row = dict(enumerate(new_A_row))
+    new_row = dict((j,v) for j,v in new_A_row.items() if v != 0)
+    for j in new_row:
+      self.cols[j].add(self.m)
+
+    self.basic_indices.append(new_var_num)
+    self.b_values.append(new_b_val)
+    self.rows.append(new_row)
+    self.nnz += len(new_row)
+    self.max_nnz = max(self.max_nnz, self.nnz)
+    self.m += 1
+    self.next_var    += 1
+    self.large_value += 1
+    return new_var_num
+
+  def remove_row (self, k):
+    self.nnz -= len(self.rows[k])
+    for j in self.rows[k]:
+      self.cols[j].discard(k)
+    del self.rows[k]
+    del self.basic_indices[k]
+    del self.b_values[k]
+    self.m -= 1
+    for j, col in enumerate(self.cols):
+      if any(i > k for i in col):
+        self.cols[j] = set(i if i < k else i-1 for i in col)
+
+  def add_all_ilp_cuts (self):
+    added = lpdict.add_all_ilp_cuts(self)
+    self.nnz_history.append(self.nnz)
+    return added
+
+  __str__ = on_lists(lpdict.__str__)
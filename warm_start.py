@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+doc_str = """
+ Warm starts for families of related LPs, with lpdict.export_basis, warm_start and reoptimize.
+ Run as a script, this solves each given dictionary, and then random variants of it, with small
+ integer changes to b_values (-vary b), z_coeffs (-vary z) or both, once from the slack basis
+ (solve_lp) and once from the basis of the first solve (reoptimize). It prints the average pivots
+ of each way : the warm ones split into the pivots that rebuild the dictionary for the basis, and
+ the simplex pivots after that. The objectives of the two ways are checked to agree.
+"""
+
+import sys
+import random
+import argparse
+from   numbers import Number
+from   lpdict import new_lpdict, storage_backends, eps_cmp_eq
+
+def variant (base, rng, vary):
+  """ (b_values, z_coeffs) of base, with small integer changes to those in vary. """
+  b = list(base.b_values)
+  z = list(base.z_coeffs)
+  if "b" in vary :
+    b = [x + rng.randint(-2, 2) for x in b]
+  if "z" in vary :
+    z = z[:1] + [x + rng.randint(-2, 2) for x in z[1:]]
+  return b, z
+
+def new_variant (base, storage, b, z):
+  lpd = new_lpdict(storage)
+  lpd.init_fn(base.m, base.n, list(base.basic_indices), list(base.nonbasic_indices), list(b),
+              [list(row) for row in base.A], list(z), dict(base.upper))
+  return lpd
+
+def same_result (r1, r2):
+  if isinstance(r1, Number) and isinstance(r2, Number) :
+    return eps_cmp_eq(r1, r2)
+  return r1 == r2
+
+def main(argv=None):
+  if argv is None:
+    argv = sys.argv
+
+  input_parser = argparse.ArgumentParser(description=doc_str)
+  input_parser.add_argument('lpdicts', nargs='+', help='lpdictionary files')
+  input_parser.add_argument('-variants', default=20, type=int, help='variants of each dictionary')
+  input_parser.add_argument('-vary'    , default='b', choices=['b', 'z', 'bz'], help='what the variants change')
+  input_parser.add_argument('-storage' , default='list', choices=storage_backends, help='dictionary storage backend')
+  input_parser.add_argument('-seed'    , default=0, type=int, help='random seed of the variants')
+  try :
+    args = input_parser.parse_args(argv[1:])
+  except SystemExit :
+    return 1
+  rng = random.Random(args.seed)
+
+  print "%-32s %8s %10s %10s %10s %8s" % ("file", "variants", "cold", "rebuild", "warm", "differ")
+  failed = 0
+  for fname in args.lpdicts:
+    base = new_lpdict("list") # plain lists, to make the variants from.
+    base.init_from_file(fname)
+    first = new_variant(base, args.storage, list(base.b_values), list(base.z_coeffs))
+    first_z = first.solve_lp()
+    if not isinstance(first_z, Number) :
+      print "%-32s skipped, %s" % (fname[-32:], first_z)
+      continue
+    basis = first.export_basis()
+
+    cold = 0 ; rebuild = 0 ; warm = 0 ; differ = 0
+    for k in range(args.variants):
+      b, z = variant(base, rng, args.vary)
+      lpd = new_variant(base, args.storage, b, z)
+      r1  = lpd.solve_lp()
+      cold += lpd.pricing.pivots
+      lpd = new_variant(base, args.storage, b, z)
+      r2  = lpd.reoptimize(basis)
+      rebuild += lpd.lp_stats["warm_start_pivots"]
+      warm    += lpd.pricing.pivots - lpd.lp_stats["warm_start_pivots"]
+      if not same_result(r1, r2) :
+        differ += 1
+    failed += differ
+    v = float(args.variants)
+    print "%-32s %8d %10.1f %10.1f %10.1f %8d" % (fname[-32:], args.variants, cold / v, rebuild / v, warm / v, differ)
+  return 1 if failed else 0
+
+if __name__ == "__main__":
+  sys.exit(main())